@@ -0,0 +1,37 @@
+import argparse
+import asyncio
+import httpx
+
+from typing import List
+from src import api, db
+from src.util import log
+from bench.vector_tile_bench import fetch
+
+
+async def bench_alert_clusters(sw: str, ne: str, zooms: List[int]):
+    """Compare the response size and time of all alerts in a wide bounding box with their clusters."""
+
+    await api.load_alert_index()
+    log.msg(f"Alerts in ({sw}) - ({ne}), {len(api.alert_index)} alerts in the index")
+
+    # Individual alerts are only compared without the limit
+    api.MAX_ALERTS = len(api.alert_index)
+    transport = httpx.ASGITransport(app=api.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=600) as client:
+        size, ms = await fetch(client, [f"/vegetation/alerts?sw={sw}&ne={ne}"])
+        log.info(f"Alerts:          {size / 1024:9.1f} KiB in {ms:7.1f} ms")
+        for z in zooms:
+            size, ms = await fetch(client, [f"/vegetation/alerts/clusters?sw={sw}&ne={ne}&zoom={z}"])
+            log.info(f"Clusters z={z:<2}:   {size / 1024:9.1f} KiB in {ms:7.1f} ms")
+
+    await db.ASYNC_ENGINE.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare individual alerts and alert clusters for a wide viewport.")
+    parser.add_argument("--sw", default="24,-125", help="southwest bounding box corner (default: 24,-125)")
+    parser.add_argument("--ne", default="50,-66", help="northeast bounding box corner (default: 50,-66)")
+    parser.add_argument("--zooms", type=int, nargs="+", default=[4, 6, 8, 10], help="zoom levels (default: 4 6 8 10)")
+    args = parser.parse_args()
+
+    asyncio.run(bench_alert_clusters(args.sw, args.ne, args.zooms))
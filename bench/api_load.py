@@ -0,0 +1,65 @@
+import argparse
+import asyncio
+import httpx
+import time
+
+from typing import List
+from src.util import log
+
+
+async def run_client(client: httpx.AsyncClient, paths: List[str], deadline: float, latencies: List[float]) -> int:
+    """Request the paths in a loop until the deadline and return the number of failed requests."""
+
+    errors = 0
+    i = 0
+    while time.perf_counter() < deadline:
+        t = time.perf_counter()
+        res = await client.get(paths[i % len(paths)])
+        latencies.append(time.perf_counter() - t)
+        errors += res.status_code != 200
+        i += 1
+    return errors
+
+
+async def load_test(url: str, paths: List[str], concurrency: int, duration: float):
+    """Send requests from `concurrency` parallel clients for `duration` seconds and log throughput and latency."""
+
+    latencies: List[float] = []
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=60) as client:
+        # Warm up connections and caches
+        await asyncio.gather(*[client.get(p) for p in paths])
+        deadline = time.perf_counter() + duration
+        errors = await asyncio.gather(*[run_client(client, paths, deadline, latencies) for _ in range(concurrency)])
+
+    latencies.sort()
+    p50 = latencies[len(latencies) // 2] * 1e3
+    p95 = latencies[int(len(latencies) * 0.95)] * 1e3
+    log.info(
+        f"{concurrency:>3} clients: {len(latencies) / duration:7.1f} req/s",
+        f" (p50 {p50:.1f} ms, p95 {p95:.1f} ms, {sum(errors)} errors)",
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load test a running API server with concurrent clients.")
+    parser.add_argument("--url", default="http://localhost:8000", help="API base URL (default: http://localhost:8000)")
+    parser.add_argument("--duration", type=float, default=10, help="seconds per concurrency level (default: 10)")
+    parser.add_argument(
+        "--concurrency", type=int, nargs="+", default=[1, 8, 32, 64], help="concurrency levels (default: 1 8 32 64)"
+    )
+    parser.add_argument(
+        "paths",
+        nargs="*",
+        default=[
+            "/regions",
+            "/power-lines?sw=35.0,-90.1&ne=35.2,-89.9",
+            "/vegetation/alerts?sw=35.0,-90.1&ne=35.2,-89.9",
+        ],
+        help="request paths, cycled by every client",
+    )
+    args = parser.parse_args()
+
+    log.msg(f"Load test {args.url} ({len(args.paths)} paths, {args.duration:.0f}s per level)")
+    for c in args.concurrency:
+        asyncio.run(load_test(args.url, args.paths, c, args.duration))
@@ -0,0 +1,98 @@
+import time
+
+from sqlalchemy import Connection, text
+from src import db
+from src.util import log
+
+# Keys and indexes that are dropped (inside a rolled back transaction) to measure the queries without them
+INDEX_DROPS = [
+    "ALTER TABLE img_tile DROP CONSTRAINT IF EXISTS img_tile_pkey",
+    "ALTER TABLE vegetation_alert DROP CONSTRAINT IF EXISTS vegetation_alert_pkey",
+    "DROP INDEX IF EXISTS ix_vegetation_alert_pls_id",
+    "DROP INDEX IF EXISTS ix_power_line_segment_bbox",
+]
+
+# The queries behind the API endpoints, with the same filters the API and scripts use
+QUERIES = [
+    (
+        "Tile by z/x/y",
+        "SELECT d FROM img_tile WHERE x = :x AND y = :y AND z = :z",
+    ),
+    (
+        "Power lines in bbox",
+        "SELECT id FROM power_line_segment "
+        "WHERE box(point(bb_min_lon, bb_min_lat), point(bb_max_lon, bb_max_lat)) "
+        "&& box(point(:min_lon, :min_lat), point(:max_lon, :max_lat)) "
+        "AND bb_max_lat > :min_lat AND bb_max_lon > :min_lon AND bb_min_lat < :max_lat AND bb_min_lon < :max_lon",
+    ),
+    (
+        "Alerts in bbox",
+        "SELECT lat, lon FROM vegetation_alert "
+        "WHERE lat >= :min_lat AND lon >= :min_lon AND lat <= :max_lat AND lon <= :max_lon",
+    ),
+    (
+        "Alerts of a segment",
+        "SELECT lat, lon FROM vegetation_alert WHERE pls_id = :pls_id",
+    ),
+]
+
+
+def get_params(conn: Connection) -> dict:
+    """Pick query parameters from the data: an existing tile, a small area around a segment and its ID."""
+
+    x, y, z = conn.execute(text("SELECT x, y, z FROM img_tile ORDER BY x, y, z LIMIT 1")).one()
+    pls_id, lat, lon = conn.execute(
+        text("SELECT id, bb_min_lat, bb_min_lon FROM power_line_segment ORDER BY id LIMIT 1")
+    ).one()
+    d = 0.01
+    return {
+        "x": x,
+        "y": y,
+        "z": z,
+        "pls_id": pls_id,
+        "min_lat": lat - d,
+        "min_lon": lon - d,
+        "max_lat": lat + d,
+        "max_lon": lon + d,
+    }
+
+
+def measure(conn: Connection, sql: str, params: dict, number=50) -> tuple[str, float]:
+    """Return the top node of the query plan and the best runtime in milliseconds."""
+
+    plan = conn.execute(text(f"EXPLAIN {sql}"), params).scalars().all()
+    best = float("inf")
+    for _ in range(number):
+        t = time.perf_counter()
+        conn.execute(text(sql), params).all()
+        best = min(best, time.perf_counter() - t)
+    scan = next((line.strip(" ->") for line in plan if "Scan" in line), plan[0])
+
+    return scan.split("  (")[0], best * 1e3
+
+
+def bench_queries():
+    """Compare plans and latencies of the API queries with and without keys and spatial indexes."""
+
+    log.msg("Query plans and latencies with and without keys and indexes")
+
+    with db.ENGINE.connect() as conn:
+        params = get_params(conn)
+        after = [measure(conn, sql, params) for _, sql in QUERIES]
+        conn.rollback()
+        # DDL is transactional in PostgreSQL, so the indexes come back with the rollback
+        with conn.begin() as trans:
+            for stmt in INDEX_DROPS:
+                conn.execute(text(stmt))
+            before = [measure(conn, sql, params) for _, sql in QUERIES]
+            trans.rollback()
+
+    for (name, _), (plan_before, t_before), (plan_after, t_after) in zip(QUERIES, before, after):
+        log.info(f"{name}: {t_before:.3f} ms → {t_after:.3f} ms", f" ({t_before / t_after:.1f}x)")
+        log.info(f"before: {plan_before}", prefix="     ")
+        log.info(f"after:  {plan_after}", prefix="     ")
+
+
+if __name__ == "__main__":
+    db.get_session()
+    bench_queries()
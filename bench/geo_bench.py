@@ -0,0 +1,43 @@
+import numpy as np
+
+from bench.timing import best_time
+from src.util import log
+from src.util.geo import (
+    LAT_MAX,
+    lat_lon_to_pixel_coords,
+    lat_lon_to_pixel_coords_batch,
+    lat_lon_to_tile_coords,
+    lat_lon_to_tile_coords_batch,
+    pixel_coords_to_lat_lon,
+    pixel_coords_to_lat_lon_batch,
+    tile_coords_to_lat_lon,
+    tile_coords_to_lat_lon_batch,
+)
+
+
+def bench_projections(n=10000, z=17):
+    """Compare the batch projections with calling the scalar functions in a loop."""
+
+    log.msg(f"Project {n} coordinates at z={z}")
+
+    rng = np.random.default_rng(0)
+    lat, lon = rng.uniform(-LAT_MAX, LAT_MAX, n), rng.uniform(-180, 180, n)
+    tx, ty = rng.integers(0, 2**z, n), rng.integers(0, 2**z, n)
+    px, py = rng.integers(0, 256 * 2**z, n), rng.integers(0, 256 * 2**z, n)
+    cases = [
+        ("lat_lon_to_tile_coords", lat_lon_to_tile_coords, lat_lon_to_tile_coords_batch, lat, lon),
+        ("lat_lon_to_pixel_coords", lat_lon_to_pixel_coords, lat_lon_to_pixel_coords_batch, lat, lon),
+        ("tile_coords_to_lat_lon", tile_coords_to_lat_lon, tile_coords_to_lat_lon_batch, tx, ty),
+        ("pixel_coords_to_lat_lon", pixel_coords_to_lat_lon, pixel_coords_to_lat_lon_batch, px, py),
+    ]
+    for name, scalar, batch, a, b in cases:
+        t_scalar = best_time(lambda: [scalar(u, v, z) for u, v in zip(a.tolist(), b.tolist())], number=1)
+        t_batch = best_time(lambda: batch(a, b, z), number=1)
+        log.info(
+            f"{name:<24} scalar {t_scalar * 1e3:8.2f} ms, batch {t_batch * 1e3:6.2f} ms",
+            f" ({t_scalar / t_batch:.0f}x)",
+        )
+
+
+if __name__ == "__main__":
+    bench_projections()
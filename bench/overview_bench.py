@@ -0,0 +1,60 @@
+import argparse
+import asyncio
+import httpx
+import time
+
+from sqlalchemy import func, select
+from typing import List
+from src import api, db
+from src.model.img_tile import ImgTile
+from src.util import log
+from src.util.geo import lat_lon_to_tile_coords, tile_coords_to_lat_lon
+
+
+async def bench_overviews(zooms: List[int], degrees: float):
+    """Count the tile requests and bytes needed to cover a city-wide viewport with the vegetation overlay per zoom level."""
+
+    # Center the viewport on the median mask tile
+    async with db.ASYNC_SESSION() as session:
+        x, y = (
+            await session.execute(
+                select(
+                    func.percentile_disc(0.5).within_group(ImgTile.x),
+                    func.percentile_disc(0.5).within_group(ImgTile.y),
+                ).where(ImgTile.z == 17)
+            )
+        ).one()
+    lat, lon = tile_coords_to_lat_lon(x, y, 17)
+    mn_lat, mn_lon, mx_lat, mx_lon = lat - degrees / 2, lon - degrees / 2, lat + degrees / 2, lon + degrees / 2
+
+    await api.load_tile_filter()
+    log.msg(f"Vegetation tiles for the viewport ({mn_lat:.3f}, {mn_lon:.3f}) - ({mx_lat:.3f}, {mx_lon:.3f})")
+    transport = httpx.ASGITransport(app=api.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for z in zooms:
+            x0, y0 = lat_lon_to_tile_coords(mx_lat, mn_lon, z)
+            x1, y1 = lat_lon_to_tile_coords(mn_lat, mx_lon, z)
+            paths = [f"/vegetation/tiles/{z}/{y}/{x}" for x in range(x0, x1 + 1) for y in range(y0, y1 + 1)]
+            api.tile_cache.clear()
+            size = found = 0
+            t = time.perf_counter()
+            for path in paths:
+                res = await client.get(path)
+                assert res.status_code in (200, 404), f"Request to {path} failed with status {res.status_code}"
+                found += res.status_code == 200
+                size += len(res.content) if res.status_code == 200 else 0
+            ms = (time.perf_counter() - t) * 1e3
+            log.info(f"z={z:<2}: {len(paths):6} requests, {size / 1024:8.1f} KiB in {ms:7.1f} ms", f" ({found} tiles)")
+
+    await db.ASYNC_ENGINE.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare the vegetation tile requests for a viewport per zoom level.")
+    parser.add_argument("--size", type=float, default=0.2, help="viewport size in degrees (default: 0.2)")
+    parser.add_argument(
+        "--zooms", type=int, nargs="+", default=[17, 14, 12, 10], help="zoom levels (default: 17 14 12 10)"
+    )
+    args = parser.parse_args()
+
+    asyncio.run(bench_overviews(args.zooms, args.size))
@@ -0,0 +1,95 @@
+import numpy as np
+
+from io import BytesIO
+from PIL import Image
+from bench.timing import best_time
+from src.util import log
+from src.util.geo import pixels_in_circle
+from src.util.raster import *
+
+PIXEL_RADIUS = 8
+
+
+def loop_opaque_fraction(arr, x0, y0, r=PIXEL_RADIUS):
+    """The per-pixel loop that compute_alerts used before spot scoring was vectorized."""
+
+    w, h, _ = np.shape(arr)
+    if x0 < r or x0 > w - r or y0 < r or y0 > h - r:
+        return 0
+    pxls = pixels_in_circle(r, x0, y0)
+    num_opaque = 0
+    for x, y in pxls:
+        if arr[y][x][3] > 0:
+            num_opaque += 1
+    return num_opaque / len(pxls)
+
+
+def loop_grayscale_to_rgba(arr, rgba):
+    """The per-pixel loop that src.util.tensor used before colorizing was vectorized."""
+
+    data = np.zeros((*np.shape(arr), 4), dtype=np.uint8)
+    for r in range(0, np.size(arr, 0)):
+        for c in range(0, np.size(arr, 1)):
+            data[r, c] = [arr[r, c] * v for v in rgba]
+    return data
+
+
+def bench_kernels():
+    """Time the mask kernels on a 256x256 tile and compare them with their previous implementations."""
+
+    log.msg("Mask kernels on a 256x256 tile")
+
+    rng = np.random.default_rng(0)
+    pred = ((rng.random((256, 256)) > 0.5) * 255).astype(np.uint8)
+    rgba = colorize(pred, [1, 0, 1, 0.5])
+    blob = BytesIO()
+    Image.fromarray(rgba).save(blob, format="PNG")
+    png = blob.getvalue()
+    alpha = rgba[:, :, 3]
+    mask = threshold_mask(alpha)
+    packed = pack_mask(mask)
+    encoded = encode_mask(pred)
+    out = np.empty_like(rgba)
+    assert np.array_equal(loop_grayscale_to_rgba(pred, [1, 0, 1, 0.5]), rgba), "Results differ"
+
+    rows = [
+        ("grayscale → RGBA (loop)", lambda: loop_grayscale_to_rgba(pred, [1, 0, 1, 0.5]), 1),
+        ("grayscale → RGBA (colorize)", lambda: colorize(pred, [1, 0, 1, 0.5], out), 100),
+        ("PNG → RGBA array", lambda: np.array(Image.open(BytesIO(png))), 100),
+        ("PNG → alpha plane", lambda: decode_alpha(png), 100),
+        ("encode mask", lambda: encode_mask(pred), 100),
+        ("decode mask", lambda: decode_mask(encoded), 100),
+        ("threshold mask", lambda: threshold_mask(alpha), 1000),
+        ("disk mask (r=8, uncached)", lambda: disk_mask.__wrapped__(8), 1000),
+        ("pack mask", lambda: pack_mask(mask), 1000),
+        ("unpack mask", lambda: unpack_mask(packed, 256), 1000),
+    ]
+    log.info(f"{'Kernel':<28} {'Time':>12}")
+    for name, fn, number in rows:
+        log.info(f"{name:<28} {best_time(fn, number) * 1e6:9.1f} µs")
+    log.info(f"PNG: {len(png)} bytes, encoded mask: {len(encoded)} bytes")
+
+
+def bench_opaque_fractions(num_spots=(1, 16, 64, 256)):
+    """Compare the vectorized spot scoring with the per-pixel loop on a random RGBA tile."""
+
+    log.msg(f"Score spots on a 256x256 tile (r={PIXEL_RADIUS})")
+
+    rng = np.random.default_rng(0)
+    arr = np.zeros((256, 256, 4), dtype=np.uint8)
+    arr[:, :, 3] = (rng.random((256, 256)) > 0.5) * 127
+    for n in num_spots:
+        px, py = rng.integers(0, 256, n), rng.integers(0, 256, n)
+        loop = [loop_opaque_fraction(arr, x, y) for x, y in zip(px, py)]
+        assert list(opaque_fractions(arr[:, :, 3], px, py, PIXEL_RADIUS)) == loop, "Results differ"
+
+        t_loop = best_time(lambda: [loop_opaque_fraction(arr, x, y) for x, y in zip(px, py)])
+        t_vec = best_time(lambda: opaque_fractions(arr[:, :, 3], px, py, PIXEL_RADIUS))
+        log.info(
+            f"{n:>4} spots: loop {t_loop * 1e3:8.3f} ms, vectorized {t_vec * 1e3:8.3f} ms", f" ({t_loop / t_vec:.0f}x)"
+        )
+
+
+if __name__ == "__main__":
+    bench_kernels()
+    bench_opaque_fractions()
@@ -0,0 +1,63 @@
+import argparse
+import asyncio
+import httpx
+
+from pydantic import TypeAdapter
+from sqlalchemy import select
+from bench.timing import best_time
+from bench.vector_tile_bench import fetch
+from src import api, db
+from src.model.power_line_segment import PowerLineSegment, PowerLineSegmentSchema
+from src.model.vegetation_alert import VegetationAlert, VegetationAlertSchema
+from src.util import log
+from src.util.serialize import dump_rows
+
+
+def validate_and_dump(rows, schema):
+    """The serialization FastAPI did before: validate every row into the response model and dump it by alias."""
+
+    adapter = TypeAdapter(list[schema])
+    return adapter.dump_json(adapter.validate_python(rows, from_attributes=True), by_alias=True)
+
+
+async def bench_serialization(sw: str, ne: str):
+    """Compare serializing the power lines and alerts through the schemas with `dump_rows`, and time the requests."""
+
+    session = db.get_session()
+    queries = [
+        (PowerLineSegment, PowerLineSegmentSchema, f"/power-lines?sw={sw}&ne={ne}"),
+        (VegetationAlert, VegetationAlertSchema, f"/vegetation/alerts?sw={sw}&ne={ne}"),
+    ]
+    log.msg("Serialize all power lines and alerts")
+    for model, schema, _ in queries:
+        key = model.__table__.primary_key.columns
+        rows = session.execute(select(*[getattr(model, name) for name in schema.model_fields]).order_by(*key)).all()
+        objects = session.scalars(select(model).order_by(*key)).all()
+        assert validate_and_dump(objects, schema) == dump_rows(rows, schema), "Results differ"
+
+        t_schema = best_time(lambda: validate_and_dump(objects, schema), 1, 3)
+        t_rows = best_time(lambda: dump_rows(rows, schema), 1, 3)
+        log.info(
+            f"{len(rows):>7} {model.__tablename__} rows: schema {t_schema * 1e3:8.1f} ms, rows {t_rows * 1e3:8.1f} ms",
+            f" ({t_schema / t_rows:.0f}x)",
+        )
+    session.close()
+
+    log.msg(f"Requests for ({sw}) - ({ne})")
+    api.MAX_ALERTS = 2**31
+    transport = httpx.ASGITransport(app=api.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=600) as client:
+        for _, _, path in queries:
+            size, ms = await fetch(client, [path])
+            log.info(f"{path.split('?')[0]:<20} {size / 2**20:8.1f} MiB in {ms:8.1f} ms")
+
+    await db.ASYNC_ENGINE.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the JSON serialization of the bounding box endpoints.")
+    parser.add_argument("--sw", default="24,-125", help="southwest bounding box corner (default: 24,-125)")
+    parser.add_argument("--ne", default="50,-66", help="northeast bounding box corner (default: 50,-66)")
+    args = parser.parse_args()
+
+    asyncio.run(bench_serialization(args.sw, args.ne))
@@ -0,0 +1,58 @@
+import argparse
+import asyncio
+import httpx
+import numpy as np
+import time
+
+from sqlalchemy import select
+from src import api, db
+from src.model.img_tile import ImgTile
+from src.scripts.export_tiles import DEFAULT_PATH
+from src.util import log
+from src.util.geo import tile_keys_to_coords
+from src.util.tile_archive import TileArchive
+from bench.tile_cache_bench import log_latencies, measure
+
+
+async def bench_tile_archive(path: str, num_tiles: int, rounds: int):
+    """Compare tile lookups and requests served from the DB with those served from the memory-mapped tile archive."""
+
+    archive = TileArchive(path)
+    rng = np.random.default_rng(0)
+    i = rng.choice(len(archive), min(num_tiles, len(archive)), replace=False)
+    keys = archive.keys[i]
+    tiles = list(zip(*[v.tolist() for v in tile_keys_to_coords(keys)]))
+    log.msg(f"Tile lookups in {path} ({len(archive)} tiles, {archive.nbytes / 2**20:.1f} MiB)")
+
+    t = time.perf_counter()
+    for _ in range(rounds):
+        for z, x, y in tiles:
+            archive.get(z, x, y)
+    log.info(f"Archive lookup: {(time.perf_counter() - t) / (rounds * len(tiles)) * 1e6:.2f} µs per tile")
+
+    async with db.ASYNC_SESSION() as session:
+        t = time.perf_counter()
+        for z, x, y in tiles:
+            await session.execute(select(ImgTile.h, ImgTile.m).where(ImgTile.z == z, ImgTile.x == x, ImgTile.y == y))
+        log.info(f"DB lookup:      {(time.perf_counter() - t) / len(tiles) * 1e6:.2f} µs per tile")
+
+    paths = [f"/vegetation/tiles/{z}/{y}/{x}" for z, x, y in tiles]
+    log.msg(f"Latencies of {len(paths)} tile requests without the tile cache")
+    api.tile_cache.max_bytes = 0
+    transport = httpx.ASGITransport(app=api.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        log_latencies("DB     ", await measure(client, paths, rounds))
+        api.tile_archive = archive
+        log_latencies("Archive", await measure(client, paths, rounds))
+
+    await db.ASYNC_ENGINE.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark serving tiles from the memory-mapped tile archive.")
+    parser.add_argument("--archive", default=DEFAULT_PATH, help="archive path (default: data/vegetation.tiles)")
+    parser.add_argument("--tiles", type=int, default=1000, help="number of requested tiles (default: 1000)")
+    parser.add_argument("--rounds", type=int, default=3, help="requests per tile (default: 3)")
+    args = parser.parse_args()
+
+    asyncio.run(bench_tile_archive(args.archive, args.tiles, args.rounds))
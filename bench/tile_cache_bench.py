@@ -0,0 +1,75 @@
+import argparse
+import asyncio
+import httpx
+import time
+
+from sqlalchemy import select
+from typing import Dict, List, Optional
+from src import api, db
+from src.model.img_tile import ImgTile
+from src.util import log
+
+
+async def get_tile_paths(num_tiles: int) -> List[str]:
+    async with db.ASYNC_SESSION() as session:
+        tiles = await session.execute(select(ImgTile.z, ImgTile.x, ImgTile.y).limit(num_tiles))
+        return [f"/vegetation/tiles/{z}/{y}/{x}" for z, x, y in tiles]
+
+
+async def measure(
+    client: httpx.AsyncClient, paths: List[str], rounds: int, etags: Optional[Dict[str, str]] = None, status=200
+) -> List[float]:
+    """Request every path `rounds` times (revalidating the given entity tags) and return the sorted latencies in ms."""
+
+    latencies: List[float] = []
+    for _ in range(rounds):
+        for path in paths:
+            headers = {"If-None-Match": etags[path]} if etags else {}
+            t = time.perf_counter()
+            res = await client.get(path, headers=headers)
+            latencies.append((time.perf_counter() - t) * 1e3)
+            assert res.status_code == status, f"Request to {path} failed with status {res.status_code}"
+    return sorted(latencies)
+
+
+def log_latencies(name: str, latencies: List[float]):
+    p50 = latencies[len(latencies) // 2]
+    p99 = latencies[int(len(latencies) * 0.99)]
+    log.info(f"{name}: p50 {p50:.3f} ms, p99 {p99:.3f} ms", f" ({len(latencies)} requests)")
+
+
+async def bench_tile_cache(num_tiles: int, rounds: int):
+    """Compare tile request latencies without the tile cache, for revalidated tiles and with a warm cache (in-process, no network)."""
+
+    paths = await get_tile_paths(num_tiles)
+    log.msg(f"Tile request latencies for {len(paths)} tiles without the tile cache, revalidated and with the cache")
+
+    cache = api.tile_cache
+    max_bytes = cache.max_bytes
+    transport = httpx.ASGITransport(app=api.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        cache.clear()
+        cache.max_bytes = 0
+        etags = {path: (await client.get(path)).headers["ETag"] for path in paths}
+        log_latencies("No cache  ", await measure(client, paths, rounds))
+        log_latencies("Revalidate", await measure(client, paths, rounds, etags, status=304))
+
+        cache.max_bytes = max_bytes
+        await measure(client, paths, 1)
+        log_latencies("Warm cache", await measure(client, paths, rounds))
+
+    stats = cache.stats()
+    log.info(
+        f"Cache: {stats['entries']} tiles, {stats['bytes'] / 2**20:.1f} MiB",
+        f" ({stats['hits']} hits, {stats['misses']} misses)",
+    )
+    await db.ASYNC_ENGINE.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark tile requests with and without the tile cache.")
+    parser.add_argument("--tiles", type=int, default=500, help="number of distinct tiles (default: 500)")
+    parser.add_argument("--rounds", type=int, default=10, help="requests per tile (default: 10)")
+    args = parser.parse_args()
+
+    asyncio.run(bench_tile_cache(args.tiles, args.rounds))
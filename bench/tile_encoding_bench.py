@@ -0,0 +1,52 @@
+import argparse
+import numpy as np
+
+from io import BytesIO
+from PIL import Image
+from sqlalchemy import func, select
+from bench.timing import best_time
+from src import db
+from src.model.img_tile import ImgTile
+from src.util import log
+from src.util.raster import colorize, decode_mask, render_mask
+
+
+def render_rgba_png(gray, rgba):
+    """The 32-bit RGBA PNGs that tiles were rendered as before palette-indexed PNGs."""
+
+    blob = BytesIO()
+    Image.fromarray(colorize(gray, rgba)).save(blob, format="PNG")
+    return blob.getvalue()
+
+
+def bench_tile_encoding(num_tiles: int, levels=(1, 6, 9)):
+    """Compare the size and encoding time of the image formats for tiles rendered from the stored masks."""
+
+    session = db.get_session()
+    masks = session.scalars(select(ImgTile.m).where(ImgTile.m.is_not(None)).order_by(func.random()).limit(num_tiles))
+    masks = [decode_mask(m) for m in masks]
+    assert len(masks) > 0, "No tiles with vegetation masks found, run `python3 -m src.scripts.migrate_db` first"
+    rgba = ImgTile.__MASK_RGBA__
+    log.msg(f"Encode {len(masks)} random tiles")
+
+    encoders = [("RGBA PNG", lambda g: render_rgba_png(g, rgba))]
+    for level in levels:
+        encoders.append((f"Palette PNG ({level})", lambda g, level=level: render_mask(g, rgba, "PNG", level)))
+    for level in levels:
+        encoders.append((f"WebP ({level})", lambda g, level=level: render_mask(g, rgba, "WEBP", level)))
+
+    log.info(f"{'Format':<18} {'Size':>10} {'Encoding':>12}")
+    baseline = None
+    for name, encode in encoders:
+        size = np.mean([len(encode(g)) for g in masks])
+        t = best_time(lambda: [encode(g) for g in masks], 1) / len(masks)
+        baseline = baseline or size
+        log.info(f"{name:<18} {size / 1024:7.1f} KB {t * 1e3:9.2f} ms", f" ({size / baseline:.0%})")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the image formats of the vegetation tiles.")
+    parser.add_argument("--tiles", type=int, default=100, help="number of encoded tiles (default: 100)")
+    args = parser.parse_args()
+
+    bench_tile_encoding(args.tiles)
@@ -0,0 +1,52 @@
+import argparse
+import asyncio
+import httpx
+import numpy as np
+
+from sqlalchemy import select
+from src import api, db
+from src.model.img_tile import ImgTile
+from src.util import log
+from src.util.geo import tile_keys
+from bench.tile_cache_bench import log_latencies, measure
+
+
+async def bench_tile_filter(num_requests: int):
+    """Measure the footprint and false-positive rate of the tile filter and the latency of requests for missing tiles."""
+
+    await api.load_tile_filter()
+    async with db.ASYNC_SESSION() as session:
+        z, x, y = np.array((await session.execute(select(ImgTile.z, ImgTile.x, ImgTile.y))).all()).T
+
+    log.msg(f"Negative lookup filter for {len(z)} tiles")
+    stats = api.tile_filter.stats()
+    log.info(f"Bloom filter: {stats['bytes'] / 1024:.1f} KiB", f" ({stats['bytes'] * 8 / len(z):.1f} bits per tile)")
+    log.info(f"Sorted keys:  {len(z) * 8 / 1024:.1f} KiB", " (64 bits per tile)")
+
+    # Missing tiles near the stored ones, like the ones requested by a map viewport
+    rng = np.random.default_rng(0)
+    i = rng.integers(0, len(z), 100000)
+    mx, my = x[i] + rng.integers(-256, 257, len(i)), y[i] + rng.integers(-256, 257, len(i))
+    missing = ~np.isin(tile_keys(z[i], mx, my), tile_keys(z, x, y))
+    mz, mx, my = z[i][missing], mx[missing], my[missing]
+    fp_rate = np.mean(api.tile_filter.contains(tile_keys(mz, mx, my)))
+    log.info(f"False-positive rate: {fp_rate * 100:.2f}%", f" (expected {stats['fp_rate'] * 100:.2f}%)")
+
+    paths = [f"/vegetation/tiles/{z}/{y}/{x}" for z, x, y in zip(mz, mx, my)][:num_requests]
+    log.msg(f"Latencies of {len(paths)} requests for missing tiles")
+    transport = httpx.ASGITransport(app=api.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        tile_filter, api.tile_filter = api.tile_filter, None
+        log_latencies("No filter", await measure(client, paths, 1, status=404))
+        api.tile_filter = tile_filter
+        log_latencies("Filter   ", await measure(client, paths, 1, status=404))
+
+    await db.ASYNC_ENGINE.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the negative lookup filter for missing tiles.")
+    parser.add_argument("--requests", type=int, default=2000, help="number of requested tiles (default: 2000)")
+    args = parser.parse_args()
+
+    asyncio.run(bench_tile_filter(args.requests))
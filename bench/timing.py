@@ -0,0 +1,7 @@
+import timeit
+
+
+def best_time(fn, number=10, repeat=5) -> float:
+    """Return the best average runtime of a function call in seconds."""
+
+    return min(timeit.repeat(fn, number=number, repeat=repeat)) / number
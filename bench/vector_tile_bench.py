@@ -0,0 +1,69 @@
+import argparse
+import asyncio
+import httpx
+import time
+
+from sqlalchemy import func, select
+from typing import List, Tuple
+from src import api, db
+from src.model.vegetation_alert import VegetationAlert
+from src.util import log
+from src.util.geo import lat_lon_to_tile_coords
+
+
+async def fetch(client: httpx.AsyncClient, paths: List[str]) -> Tuple[int, float]:
+    """Request the paths one after another and return the total response size and time in milliseconds."""
+
+    size = 0
+    t = time.perf_counter()
+    for path in paths:
+        res = await client.get(path)
+        assert res.status_code == 200, f"Request to {path} failed with status {res.status_code}"
+        size += len(res.content)
+    return size, (time.perf_counter() - t) * 1e3
+
+
+async def bench_vector_tiles(zooms: List[int], degrees: float):
+    """Compare the JSON endpoints for a city-wide viewport (with and without simplification) and the vector tiles."""
+
+    # Center the viewport on the median alert location
+    async with db.ASYNC_SESSION() as session:
+        lat, lon = (
+            await session.execute(
+                select(
+                    func.percentile_cont(0.5).within_group(VegetationAlert.lat),
+                    func.percentile_cont(0.5).within_group(VegetationAlert.lon),
+                )
+            )
+        ).one()
+    mn_lat, mn_lon, mx_lat, mx_lon = lat - degrees / 2, lon - degrees / 2, lat + degrees / 2, lon + degrees / 2
+
+    log.msg(f"Viewport ({mn_lat:.3f}, {mn_lon:.3f}) - ({mx_lat:.3f}, {mx_lon:.3f})")
+    transport = httpx.ASGITransport(app=api.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=600) as client:
+        bbox = f"sw={mn_lat},{mn_lon}&ne={mx_lat},{mx_lon}"
+        size, ms = await fetch(client, [f"/power-lines?{bbox}", f"/vegetation/alerts?{bbox}"])
+        log.info(f"JSON:        {size / 1024:10.1f} KiB in {ms:7.1f} ms")
+        size, ms = await fetch(client, [f"/power-lines?{bbox}"])
+        log.info(f"Power lines: {size / 1024:10.1f} KiB in {ms:7.1f} ms")
+
+        for z in zooms:
+            size, ms = await fetch(client, [f"/power-lines?{bbox}&zoom={z}"])
+            log.info(f"Power lines z={z:<2}: {size / 1024:5.1f} KiB in {ms:7.1f} ms", " (simplified)")
+            x0, y0 = lat_lon_to_tile_coords(mx_lat, mn_lon, z)
+            x1, y1 = lat_lon_to_tile_coords(mn_lat, mx_lon, z)
+            paths = [f"/vector/tiles/{z}/{x}/{y}.mvt" for x in range(x0, x1 + 1) for y in range(y0, y1 + 1)]
+            api.vector_tile_cache.clear()
+            size, ms = await fetch(client, paths)
+            log.info(f"MVT z={z:<2}:    {size / 1024:10.1f} KiB in {ms:7.1f} ms", f" ({len(paths)} tiles)")
+
+    await db.ASYNC_ENGINE.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare JSON and vector tile responses for a city-wide viewport.")
+    parser.add_argument("--size", type=float, default=0.5, help="viewport size in degrees (default: 0.5)")
+    parser.add_argument("--zooms", type=int, nargs="+", default=[10, 11, 12], help="zoom levels (default: 10 11 12)")
+    args = parser.parse_args()
+
+    asyncio.run(bench_vector_tiles(args.zooms, args.size))
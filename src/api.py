@@ -1,22 +1,196 @@
+import asyncio
+import hashlib
+import json
+import numpy as np
+import os
+
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
 from dotenv import load_dotenv
-from fastapi import FastAPI, HTTPException, Path, Query
+from fastapi import Depends, FastAPI, Header, HTTPException, Path, Query
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.openapi.docs import get_redoc_html
 from fastapi.responses import Response
-from sqlalchemy import select
+from numpy.typing import NDArray
+from pydantic import BaseModel
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from src import db
-from src.model.img_tile import ImgTile
+from src.model.img_tile import ImgTile, render_tile
 from src.model.power_line_segment import PowerLineSegment, PowerLineSegmentSchema
 from src.model.region import Region, RegionSchema
 from src.model.root_response import RootResponseSchema
-from src.model.vegetation_alert import VegetationAlert, VegetationAlertSchema
-from src.util.geo import LatLon
+from src.model.vegetation_alert import AlertClusterSchema, VegetationAlert, VegetationAlertSchema
+from src.util.bloom import BloomFilter
+from src.util.cache import ByteCache
+from src.util.cluster import PointIndex
+from src.util.tile_archive import TileArchive
+from src.util import mvt
+from src.util.raster import transcode_image
+from src.util.serialize import dump_rows
+from src.util.geo import (
+    LatLon,
+    clip_polyline,
+    lat_lon_to_mercator_batch,
+    pixel_coords_to_lat_lon_batch,
+    tile_keys,
+)
+from typing import Iterable, Optional, Sequence, Set, Tuple, Type
 
 load_dotenv()
 
 API_NAME = "Vegeo API"
 API_VERSION = "0.1.0"
 
+# Version of the detection data set, clients that request tiles of the current version may cache them for good
+DATASET_VERSION = os.getenv("DATASET_VERSION")
+TILE_MAX_AGE = int(os.getenv("TILE_MAX_AGE", 3600))
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+
+# Hot tiles are served from memory, tiles rewritten by the detection pipeline are invalidated via DB notifications
+tile_cache = ByteCache(int(os.getenv("TILE_CACHE_BYTES", 64 * 2**20)))
+
+# Only the masks are stored, tiles are rendered as PNG, or as lossless WebP for clients that accept it, on a cache
+# miss. Tiles served from the archive are transcoded to WebP (and cached).
+TILE_PNG_LEVEL = int(os.getenv("TILE_PNG_LEVEL", 6))
+TILE_WEBP_LEVEL = int(os.getenv("TILE_WEBP_LEVEL", 6))
+# Tiles rendered with other colors get other entity tags
+TILE_RENDER_TAG = hashlib.md5(repr(ImgTile.__MASK_RGBA__).encode()).hexdigest()[:8]
+
+# Requests for tiles that definitely don't exist are answered without a DB query (built on startup)
+TILE_FILTER_FP_RATE = float(os.getenv("TILE_FILTER_FP_RATE", 0.01))
+tile_filter: Optional[BloomFilter] = None
+
+# Tiles can be served from a memory-mapped archive written by `export_tiles`. The DB stays the source of truth, tiles
+# that changed after the export are served from the DB.
+TILE_ARCHIVE = os.getenv("TILE_ARCHIVE")
+tile_archive: Optional[TileArchive] = None
+archive_stale: Set[Tuple[int, int, int]] = set()
+
+# Wide alert queries are answered with clusters from an in-memory index, which is reloaded when the alerts change
+MAX_ALERTS = int(os.getenv("MAX_ALERTS", 10000))
+ALERT_INDEX_DELAY = 1.0
+alert_index: Optional[PointIndex] = None
+alert_index_refresh: Optional[asyncio.Task] = None
+
+# Vector tiles are cached until any power line or alert changes
+vector_tile_cache = ByteCache(int(os.getenv("VECTOR_TILE_CACHE_BYTES", 32 * 2**20)))
+VECTOR_EXTENT = 4096
+VECTOR_BUFFER = 64
+ALERT_MIN_ZOOM = 12
+
+
+def on_tile_changed(payload: str):
+    z, x, y = [int(v) for v in payload.split("/")]
+    tile_cache.invalidate((z, x, y))
+    tile_cache.invalidate((z, x, y, "webp"))
+    if tile_filter is not None:
+        tile_filter.add(tile_keys(z, x, y))
+    if TILE_ARCHIVE:
+        archive_stale.add((z, x, y))
+
+
+def on_vector_data_changed(table: str):
+    global alert_index_refresh
+    vector_tile_cache.clear()
+    if table == VegetationAlert.__tablename__:
+        # Alerts are written in several transactions, so the index is only reloaded once they stop changing
+        if alert_index_refresh is not None:
+            alert_index_refresh.cancel()
+        alert_index_refresh = asyncio.get_running_loop().create_task(refresh_alert_index())
+
+
+async def refresh_alert_index():
+    await asyncio.sleep(ALERT_INDEX_DELAY)
+    await load_alert_index()
+
+
+async def load_alert_index():
+    """Load the locations and risk levels of all alerts into the in-memory index."""
+
+    global alert_index
+    async with db.ASYNC_SESSION() as session:
+        rows = (await session.execute(select(VegetationAlert.lat, VegetationAlert.lon, VegetationAlert.risk))).all()
+    lat, lon, risk = np.array(rows, dtype=np.float64).reshape(-1, 3).T
+    alert_index = PointIndex(lat, lon, risk.astype(np.int8))
+
+
+async def load_tile_filter() -> NDArray:
+    """Build the negative lookup filter from the keys of all stored tiles and return the keys."""
+
+    global tile_filter
+    async with db.ASYNC_SESSION() as session:
+        num_tiles = await session.scalar(select(func.count()).select_from(ImgTile))
+        # Leave room for tiles that are added while the API is running. The filter is in place before the keys are
+        # loaded, so that tiles which change in the meantime are added as well.
+        tile_filter = BloomFilter(max(2 * num_tiles, 1024), TILE_FILTER_FP_RATE)
+        result = await session.stream(select(ImgTile.z, ImgTile.x, ImgTile.y))
+        parts = [np.zeros(0, np.uint64)]
+        async for rows in result.partitions(100000):
+            parts.append(tile_keys(*np.array(rows).T))
+            tile_filter.add(parts[-1])
+
+    return np.concatenate(parts)
+
+
+async def load_tile_archive(keys: NDArray):
+    """Open the tile archive and mark the tiles that have been written or deleted since its export as stale.
+
+    :param keys: keys of all stored tiles (see `tile_keys`)
+    """
+
+    global tile_archive
+    archive = TileArchive(TILE_ARCHIVE)
+    since = datetime.fromtimestamp(archive.created_at, timezone.utc)
+    async with db.ASYNC_SESSION() as session:
+        rows = await session.execute(select(ImgTile.z, ImgTile.x, ImgTile.y).where(ImgTile.updated_at >= since))
+        archive_stale.update([tuple(row) for row in rows])
+    # Deleted tiles leave no trace in the DB, so they are found by comparing the keys
+    archive_stale.update(archive.missing_tiles(keys))
+    tile_archive = archive
+
+
+def tile_etag(h: str, variant: str) -> str:
+    """Return the entity tag of a tile from the hash of its mask and the media type variant."""
+
+    return f'"{h}-{TILE_RENDER_TAG}{variant}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Check whether an `If-None-Match` header matches an entity tag (using weak comparison)."""
+
+    if not if_none_match:
+        return False
+    tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return "*" in tags or etag in tags
+
+
+def accepts(accept: Optional[str], media_type: str) -> bool:
+    """Check whether an `Accept` header explicitly lists a media type (with a non-zero quality)."""
+
+    for entry in (accept or "").split(","):
+        name, *params = [v.strip() for v in entry.split(";")]
+        if name.lower() == media_type:
+            q = [v.partition("=")[2] for v in params if v.partition("=")[0].strip() == "q"]
+            try:
+                return not q or float(q[0]) > 0
+            except ValueError:
+                return False
+    return False
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await db.create_tables()
+    listener = await db.listen({db.TILE_CHANNEL: on_tile_changed, db.VECTOR_CHANNEL: on_vector_data_changed})
+    keys = await load_tile_filter()
+    await load_alert_index()
+    if TILE_ARCHIVE:
+        await load_tile_archive(keys)
+    yield
+    await listener.close()
+    await db.ASYNC_ENGINE.dispose()
+
 
 app = FastAPI(
     title=API_NAME,
@@ -24,6 +198,7 @@ app = FastAPI(
     description="The Vegeo API provides read access to power line and vegetation detection data in major US cities.",
     docs_url=None,
     redoc_url=None,
+    lifespan=lifespan,
 )
 
 origins = ["http://localhost:3000"]
@@ -34,81 +209,257 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
-session = db.get_session()
 
 
 @app.get("/")
 def get_root() -> RootResponseSchema:
     """Returns the name and version of the running API server. Can be used to ping server availability."""
 
-    return {"name": API_NAME, "version": API_VERSION}
+    return {"name": API_NAME, "version": API_VERSION, "dataset_version": DATASET_VERSION}
+
+
+def json_response(rows: Iterable[Sequence], schema: Type[BaseModel]) -> Response:
+    """Return rows with the fields of a schema as JSON, serialized directly with `dump_rows`.
 
+    The endpoints declare the schemas as response models (for the docs), but skip validating every row through them.
+    """
 
-@app.get("/regions")
-async def get_regions() -> list[RegionSchema]:
+    return Response(content=dump_rows(rows, schema), media_type="application/json")
+
+
+@app.get("/regions", response_model=list[RegionSchema])
+async def get_regions(session: AsyncSession = Depends(db.get_async_session)) -> Response:
     """Returns a list of available regions (major US cities for now)."""
 
-    return [region for region in session.scalars(select(Region))]
+    regions = await session.execute(select(*[getattr(Region, name) for name in RegionSchema.model_fields]))
+    return json_response(regions, RegionSchema)
 
 
-@app.get("/power-lines")
+@app.get("/power-lines", response_model=list[PowerLineSegmentSchema])
 async def get_power_lines(
     sw: str = Query(description="Southwest bounding box corner", example="34.9760601,-106.7440806"),
     ne: str = Query(description="Northeast bounding box corner", example="35.5360249,-106.5489647"),
-) -> list[PowerLineSegmentSchema]:
-    """Returns a list of power line segments within the query bounding box."""
+    zoom: Optional[int] = Query(None, ge=0, le=22, description="Map zoom level (simplifies geometries below z=15)"),
+    session: AsyncSession = Depends(db.get_async_session),
+) -> Response:
+    """Returns a list of power line segments within the query bounding box. If a map zoom level is given, the geometries are simplified accordingly (dropping nodes that are less than half a pixel off)."""
 
     mn = LatLon(*[float(v) for v in sw.split(",")])
     mx = LatLon(*[float(v) for v in ne.split(",")])
-    segments = session.scalars(
-        select(PowerLineSegment)
-        .where(PowerLineSegment.bb_max_lat > mn.lat)
-        .where(PowerLineSegment.bb_max_lon > mn.lon)
-        .where(PowerLineSegment.bb_min_lat < mx.lat)
-        .where(PowerLineSegment.bb_min_lon < mx.lon)
+    # Columns in the order of the schema fields
+    segments = await session.execute(
+        select(
+            PowerLineSegment.id,
+            PowerLineSegment.bb_min_lat,
+            PowerLineSegment.bb_min_lon,
+            PowerLineSegment.bb_max_lat,
+            PowerLineSegment.bb_max_lon,
+            PowerLineSegment.num_nodes,
+            PowerLineSegment.geometry_for_zoom(zoom).label("geometry"),
+        ).where(PowerLineSegment.intersects(mn, mx))
     )
-    if not segments:
-        raise HTTPException(status_code=404, detail="Not found")
-    return [segment for segment in segments]
+    return json_response(segments, PowerLineSegmentSchema)
 
 
-@app.get("/vegetation/tiles/{z}/{y}/{x}", response_class=Response(media_type="image/png"))
-def get_vegetation_tiles(
-    z: int = Path(description="Zoom level of the tile (only z=17 is available for now)"),
-    y: int = Path(description="Web Mercator x coordinate of the tile"),
-    x: int = Path(description="Web Mercator y coordinate of the tile"),
+@app.get(
+    "/vegetation/tiles/{z}/{y}/{x}",
+    response_class=Response,
+    responses={200: {"content": {"image/png": {}, "image/webp": {}}}},
+)
+async def get_vegetation_tiles(
+    z: int = Path(ge=0, le=29, description="Zoom level of the tile (z=17 masks, z=10-16 overviews)"),
+    y: int = Path(ge=0, le=2**29 - 1, description="Web Mercator x coordinate of the tile"),
+    x: int = Path(ge=0, le=2**29 - 1, description="Web Mercator y coordinate of the tile"),
+    v: Optional[str] = Query(
+        None, description="Dataset version (tiles of the current version are cacheable indefinitely)"
+    ),
+    if_none_match: Optional[str] = Header(
+        None, description="Entity tags of cached tiles (answered with 304 if unchanged)"
+    ),
+    accept: Optional[str] = Header(None, description="Accepted media types (WebP tiles for image/webp)"),
 ):
-    """Returns transparent 256x256 PNG image tiles with magenta pixels showing where vegetation has been detected. These can be overlayed on a satellite imagery tile layer."""
+    """Returns transparent 256x256 PNG image tiles with magenta pixels showing where vegetation has been detected. These can be overlayed on a satellite imagery tile layer. Below z=17, the tiles are downsampled overviews of the detection masks. Clients that accept `image/webp` get lossless WebP tiles instead."""
 
-    tile = session.scalar(select(ImgTile).where(ImgTile.x == x).where(ImgTile.y == y).where(ImgTile.z == z))
-    if not tile:
-        raise HTTPException(status_code=404, detail="Not found")
-    return Response(content=tile.d, media_type="image/png")
+    if DATASET_VERSION and v == DATASET_VERSION:
+        max_age = f"max-age={IMMUTABLE_MAX_AGE}, immutable"
+    else:
+        max_age = f"max-age={TILE_MAX_AGE}"
+    headers = {"Cache-Control": f"public, {max_age}", "Vary": "Accept", "X-Cache": "HIT"}
+    # Entity tags are derived from the hash of the mask and the colors it is rendered with
+    webp = accepts(accept, "image/webp")
+    media_type, variant = ("image/webp", "-webp") if webp else ("image/png", "")
+
+    tile = tile_cache.get((z, x, y, "webp") if webp else (z, x, y))
+    rendered = tile is not None
+    if not rendered and tile_archive is not None and (z, x, y) not in archive_stale:
+        # Unchanged tiles are sliced from the memory-mapped archive, which has no entries for missing tiles either
+        tile = tile_archive.get(z, x, y)
+        if tile is None:
+            raise HTTPException(status_code=404, detail="Not found")
+    if tile is None:
+        if tile_filter is not None and tile_keys(z, x, y) not in tile_filter:
+            raise HTTPException(status_code=404, detail="Not found")
+        headers["X-Cache"] = "MISS"
+        version = tile_cache.version
+        where = [ImgTile.x == x, ImgTile.y == y, ImgTile.z == z]
+        async with db.ASYNC_SESSION() as session:
+            # Revalidated tiles are answered from their hash, without reading the mask
+            h = await session.scalar(select(ImgTile.h).where(*where)) if if_none_match else None
+            if h and etag_matches(if_none_match, tile_etag(h, variant)):
+                return Response(status_code=304, headers={**headers, "ETag": tile_etag(h, variant)})
+            tile = (await session.execute(select(ImgTile.h, ImgTile.m).where(*where))).one_or_none()
+        if not tile:
+            raise HTTPException(status_code=404, detail="Not found")
+        image_format, level = ("WEBP", TILE_WEBP_LEVEL) if webp else ("PNG", TILE_PNG_LEVEL)
+        d = await asyncio.to_thread(render_tile, tile.m, image_format, level)
+        tile_cache.put((z, x, y, "webp") if webp else (z, x, y), (tile.h, d), version, size=len(d))
+        tile, rendered = (tile.h, d), True
 
+    h, d = tile
+    headers["ETag"] = tile_etag(h, variant)
+    if etag_matches(if_none_match, headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+    if webp and not rendered:
+        # Archived tiles are PNGs
+        version = tile_cache.version
+        d = await asyncio.to_thread(transcode_image, bytes(d), "WEBP", TILE_WEBP_LEVEL)
+        tile_cache.put((z, x, y, "webp"), (h, d), version, size=len(d))
+    return Response(content=d, media_type=media_type, headers=headers)
 
-@app.get("/vegetation/alerts")
-def get_vegetation_alerts(
+
+@app.get("/vegetation/alerts", response_model=list[VegetationAlertSchema])
+async def get_vegetation_alerts(
     sw: str = Query(description="Southwest bounding box corner", example="40.6098699,-74.1189911"),
     ne: str = Query(description="Northeast bounding box corner", example="40.8352671,-73.9077914"),
-) -> list[VegetationAlertSchema]:
-    """Returns a list of geo-referenced alerts for spots where vegetation is estimated to overlap with power line segments."""
+    session: AsyncSession = Depends(db.get_async_session),
+) -> Response:
+    """Returns a list of geo-referenced alerts for spots where vegetation is estimated to overlap with power line segments. Bounding boxes with too many alerts are rejected, use `/vegetation/alerts/clusters` for those."""
 
     mn = LatLon(*[float(v) for v in sw.split(",")])
     mx = LatLon(*[float(v) for v in ne.split(",")])
-    alerts = session.scalars(
-        select(VegetationAlert)
+    if alert_index is not None and len(alert_index.query(mn, mx)) > MAX_ALERTS:
+        raise HTTPException(status_code=400, detail=f"More than {MAX_ALERTS} alerts, use /vegetation/alerts/clusters")
+    alerts = await session.execute(
+        select(*[getattr(VegetationAlert, name) for name in VegetationAlertSchema.model_fields])
         .where(VegetationAlert.lat >= mn.lat)
         .where(VegetationAlert.lon >= mn.lon)
         .where(VegetationAlert.lat <= mx.lat)
         .where(VegetationAlert.lon <= mx.lon)
     )
-    if not alerts:
+    return json_response(alerts, VegetationAlertSchema)
+
+
+@app.get("/vegetation/alerts/clusters")
+async def get_vegetation_alert_clusters(
+    sw: str = Query(description="Southwest bounding box corner", example="40.6098699,-74.1189911"),
+    ne: str = Query(description="Northeast bounding box corner", example="40.8352671,-73.9077914"),
+    zoom: int = Query(ge=0, le=17, description="Map zoom level that determines the cluster grid"),
+) -> list[AlertClusterSchema]:
+    """Returns clusters of the alerts within the query bounding box, aggregated on a grid of 64x64 pixel cells at the map zoom level (i.e. 4x4 cells per map tile)."""
+
+    if alert_index is None:
+        raise HTTPException(status_code=503, detail="Alerts are not loaded yet")
+    mn = LatLon(*[float(v) for v in sw.split(",")])
+    mx = LatLon(*[float(v) for v in ne.split(",")])
+    clusters = alert_index.cluster(mn, mx, zoom)
+    return [
+        {"lat": lat, "lon": lon, "count": count, "max_risk": max_risk}
+        for lat, lon, count, max_risk in zip(*[clusters[k].tolist() for k in ("lat", "lon", "count", "max_value")])
+    ]
+
+
+async def build_vector_tile(session: AsyncSession, z: int, x: int, y: int) -> bytes:
+    """Encode the power lines and alerts within a tile (and a small buffer around it) as a Mapbox Vector Tile."""
+
+    # Query the buffered tile bounds and project everything into tile coordinates
+    e, b = VECTOR_EXTENT, VECTOR_BUFFER
+    px = np.clip([x * e - b, (x + 1) * e + b], 0, 2**z * e - 1)
+    py = np.clip([y * e - b, (y + 1) * e + b], 0, 2**z * e - 1)
+    (max_lat, min_lon), (min_lat, max_lon) = pixel_coords_to_lat_lon_batch(px, py, z, e)
+    mn, mx = LatLon(min_lat, min_lon), LatLon(max_lat, max_lon)
+    origin = np.array([x * e, y * e])
+
+    power_lines = mvt.Layer("power_lines", e)
+    segments = await session.execute(
+        select(PowerLineSegment.id, PowerLineSegment.geometry_for_zoom(z)).where(PowerLineSegment.intersects(mn, mx))
+    )
+    for segment_id, geometry in segments:
+        nodes = np.array(json.loads(geometry)).reshape(-1, 2)
+        pixels = lat_lon_to_mercator_batch(nodes[:, 0], nodes[:, 1], z, e) - origin
+        parts = [np.round(p) for p in clip_polyline(pixels, -b, -b, e + b, e + b)]
+        power_lines.add(mvt.LINESTRING, parts, {"id": segment_id}, id=segment_id)
+
+    alerts = mvt.Layer("alerts", e)
+    if z >= ALERT_MIN_ZOOM:
+        rows = (
+            await session.execute(
+                select(
+                    VegetationAlert.lat,
+                    VegetationAlert.lon,
+                    VegetationAlert.risk,
+                    VegetationAlert.desc,
+                    VegetationAlert.pls_id,
+                )
+                .where(VegetationAlert.lat >= mn.lat)
+                .where(VegetationAlert.lon >= mn.lon)
+                .where(VegetationAlert.lat <= mx.lat)
+                .where(VegetationAlert.lon <= mx.lon)
+                .order_by(VegetationAlert.risk.desc())
+            )
+        ).all()
+        if rows:
+            lat, lon = np.array([(r.lat, r.lon) for r in rows]).T
+            pixels = np.round(lat_lon_to_mercator_batch(lat, lon, z, e) - origin).astype(np.int64)
+            # Alerts that fall onto the same tile coordinate are merged into the one with the highest risk
+            _, first = np.unique(pixels, axis=0, return_index=True)
+            for i in np.sort(first).tolist():
+                r = rows[i]
+                alerts.add(mvt.POINT, [pixels[i]], {"risk": r.risk, "desc": r.desc, "plsId": r.pls_id})
+
+    return mvt.encode_tile([power_lines, alerts])
+
+
+@app.get("/vector/tiles/{z}/{x}/{y}.mvt", response_class=Response(media_type="application/vnd.mapbox-vector-tile"))
+async def get_vector_tiles(
+    z: int = Path(ge=0, le=17, description="Zoom level of the tile (alerts are included from z=12)"),
+    x: int = Path(ge=0, description="Web Mercator x coordinate of the tile"),
+    y: int = Path(ge=0, description="Web Mercator y coordinate of the tile"),
+):
+    """Returns Mapbox Vector Tiles with a `power_lines` layer of clipped power line segments and an `alerts` layer of vegetation alerts (with `risk`, `desc` and `plsId` properties). Coordinates are quantized to a 4096x4096 grid per tile."""
+
+    if x >= 2**z or y >= 2**z:
         raise HTTPException(status_code=404, detail="Not found")
-    return [alert for alert in alerts]
+
+    headers = {"Cache-Control": f"public, max-age={TILE_MAX_AGE}", "X-Cache": "HIT"}
+    d = vector_tile_cache.get((z, x, y))
+    if d is None:
+        headers["X-Cache"] = "MISS"
+        version = vector_tile_cache.version
+        async with db.ASYNC_SESSION() as session:
+            d = await build_vector_tile(session, z, x, y)
+        vector_tile_cache.put((z, x, y), d, version)
+    return Response(content=d, media_type="application/vnd.mapbox-vector-tile", headers=headers)
+
+
+@app.get("/stats", include_in_schema=False)
+def get_stats():
+    return {
+        "tileCache": tile_cache.stats(),
+        "tileFilter": tile_filter.stats() if tile_filter else None,
+        "tileArchive": (
+            {"tiles": len(tile_archive), "bytes": tile_archive.nbytes, "stale": len(archive_stale)}
+            if tile_archive is not None
+            else None
+        ),
+        "vectorTileCache": vector_tile_cache.stats(),
+        "alertIndex": {"alerts": len(alert_index), "bytes": alert_index.nbytes} if alert_index else None,
+    }
 
 
 @app.get("/docs", include_in_schema=False)
 def expose_redoc():
     return get_redoc_html(
-        openapi_url="/openapi.json", title="Vegeo API Documentation", redoc_favicon_url="https://github.com/klaasnotfound/vegeo-backend/raw/refs/heads/main/data/assets/favicon.png"
+        openapi_url="/openapi.json",
+        title="Vegeo API Documentation",
+        redoc_favicon_url="https://github.com/klaasnotfound/vegeo-backend/raw/refs/heads/main/data/assets/favicon.png",
     )
@@ -1,14 +1,22 @@
+import asyncpg
 import os
 import sqlalchemy
+import time
+from datetime import datetime
 from dotenv import load_dotenv
+from io import StringIO
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import Session
+from typing import AsyncIterator, Callable, Dict, List
 
 # Important: We need to import Base and *all* derived modules.
 from src.model.base import Base
 import src.model.power_line_segment
 import src.model.region
 import src.model.img_tile
+import src.model.deleted_tile
 import src.model.vegetation_alert
+import src.model.watermark
 
 load_dotenv()
 
@@ -16,6 +24,17 @@ DB_SESSION = None
 CONN = os.getenv("DB_CONN").replace("postgresql://", "postgresql+psycopg2://")
 ENGINE = sqlalchemy.create_engine(CONN)
 
+# The API server uses an asyncio engine whose connection pool is shared by all requests
+ASYNC_CONN = os.getenv("DB_CONN").replace("postgresql://", "postgresql+asyncpg://")
+POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+ASYNC_ENGINE = create_async_engine(ASYNC_CONN, pool_size=POOL_SIZE, max_overflow=POOL_SIZE)
+ASYNC_SESSION = async_sessionmaker(ASYNC_ENGINE, expire_on_commit=False)
+
+# Notification channels for changed image tiles (with "z/x/y" payloads) and changed power lines or alerts (with the
+# table name as payload), fed by triggers
+TILE_CHANNEL = "img_tile_changed"
+VECTOR_CHANNEL = "vector_data_changed"
+
 
 def reset():
     Base.metadata.drop_all(ENGINE)
@@ -26,6 +45,17 @@ def reset_table(collection: Base):
     collection.__table__.create(ENGINE)
 
 
+def reset_connection():
+    """Forget the session and pooled connections inherited from a parent process.
+
+    Worker processes call this on startup so that each of them owns its own DB connections and session.
+    """
+
+    global DB_SESSION
+    DB_SESSION = None
+    ENGINE.dispose(close=False)
+
+
 def get_session():
     global DB_SESSION
     if DB_SESSION:
@@ -33,3 +63,144 @@ def get_session():
     Base.metadata.create_all(ENGINE)
     DB_SESSION = Session(ENGINE)
     return DB_SESSION
+
+
+def get_change_horizon(conn) -> datetime:
+    """Return the point in time from which on changes may still be invisible to a connection or session.
+
+    Rows get the start time of the transaction that writes them as change timestamp, so writes of transactions that
+    are still running show up later with an earlier timestamp. This is the start of the oldest running transaction
+    (or the current transaction's `now()`), which makes it a safe watermark for incremental runs. Other sessions'
+    transactions are only visible to superusers and members of pg_read_all_stats.
+    """
+
+    return conn.scalar(
+        sqlalchemy.text(
+            "SELECT least(now(), min(xact_start)) FROM pg_stat_activity WHERE datname = current_database()"
+        )
+    )
+
+
+async def create_tables():
+    """Create missing tables through the async engine (the async counterpart of `get_session`)."""
+
+    async with ASYNC_ENGINE.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+
+async def get_async_session() -> AsyncIterator[AsyncSession]:
+    """Yield a session with a connection from the async pool, e.g. as a per-request FastAPI dependency."""
+
+    async with ASYNC_SESSION() as session:
+        yield session
+
+
+async def listen(callbacks: Dict[str, Callable[[str], None]]) -> asyncpg.Connection:
+    """Open a dedicated connection that calls `callback(payload)` for every notification on a channel.
+
+    :param callbacks: callback for each channel
+
+    The connection has to stay open for as long as notifications should be received.
+    """
+
+    conn = await asyncpg.connect(os.getenv("DB_CONN"))
+    for channel, callback in callbacks.items():
+        await conn.add_listener(channel, lambda conn, pid, channel, payload, callback=callback: callback(payload))
+    return conn
+
+
+def copy_value(v: object) -> str:
+    """Format a Python value as a field for PostgreSQL's CSV `COPY` format (with `\\N` for NULL)."""
+
+    if v is None:
+        return "\\N"
+    if isinstance(v, bool):
+        return "t" if v else "f"
+    if isinstance(v, (bytes, bytearray, memoryview)):
+        return "\\x" + bytes(v).hex()
+    if isinstance(v, datetime):
+        return v.isoformat()
+    if isinstance(v, str):
+        return '"' + v.replace('"', '""') + '"'
+    return str(v)
+
+
+class BulkWriter:
+    """Buffer rows for a table and write them in large batches.
+
+    Each batch is streamed into a temporary staging table with `COPY` and then merged into the
+    target table with a single `INSERT ... SELECT ... ON CONFLICT DO NOTHING`, so rows that
+    conflict with existing ones are skipped just like with `insert(...).on_conflict_do_nothing()`.
+    With `update`, conflicting rows replace the existing ones instead (and columns that are updated
+    automatically, like `updated_at`, are reset to their server default). Every flush runs in its own
+    transaction.
+
+    :param collection: model class of the target table
+    :param batch_size: number of buffered rows that triggers a flush
+    :param update:     whether to update existing rows (rows within a batch must then have distinct keys)
+    """
+
+    def __init__(self, collection: Base, batch_size=10000, update=False):
+        table = collection.__table__
+        self.table = table.name
+        self.batch_size = batch_size
+        self.update = update
+        self.keys = [c.name for c in table.primary_key.columns]
+        self.touched = [c.name for c in table.columns if c.onupdate is not None and c.server_default is not None]
+        self.rows: List[Dict[str, object]] = []
+        self.num_rows = 0
+        self.num_inserted = 0
+        self.elapsed = 0.0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.flush()
+
+    @property
+    def rows_per_sec(self) -> float:
+        return self.num_rows / self.elapsed if self.elapsed > 0 else 0.0
+
+    def add(self, row: Dict[str, object]):
+        self.rows.append(row)
+        if len(self.rows) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self.rows:
+            return
+
+        # Rows of a failed flush are discarded rather than retried with the next batch
+        rows, self.rows = self.rows, []
+        start = time.perf_counter()
+        # Columns that are missing from the rows get their default values
+        cols = list(rows[0].keys())
+        col_list = ", ".join([f'"{c}"' for c in cols])
+        data = StringIO()
+        for row in rows:
+            data.write(",".join([copy_value(row[c]) for c in cols]) + "\n")
+        data.seek(0)
+
+        conflict = "DO NOTHING"
+        if self.update:
+            sets = [f'"{c}" = EXCLUDED."{c}"' for c in cols if c not in self.keys]
+            sets += [f'"{c}" = DEFAULT' for c in self.touched if c not in cols]
+            key_list = ", ".join([f'"{c}"' for c in self.keys])
+            conflict = f"({key_list}) DO UPDATE SET {', '.join(sets)}"
+
+        stage = f"{self.table}_stage"
+        with ENGINE.begin() as conn:
+            cursor = conn.connection.cursor()
+            cursor.execute(f'CREATE TEMP TABLE "{stage}" (LIKE "{self.table}" INCLUDING DEFAULTS) ON COMMIT DROP')
+            cursor.copy_expert(f"COPY \"{stage}\" ({col_list}) FROM STDIN WITH (FORMAT csv, NULL '\\N')", data)
+            # Temp tables are never scanned in parallel, so the staged rows are merged in the order they were added
+            # and the first of several conflicting rows wins
+            cursor.execute(
+                f'INSERT INTO "{self.table}" ({col_list}) SELECT {col_list} FROM "{stage}" ON CONFLICT {conflict}'
+            )
+            self.num_inserted += cursor.rowcount
+
+        self.num_rows += len(rows)
+        self.elapsed += time.perf_counter() - start
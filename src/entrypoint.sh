@@ -14,6 +14,9 @@ if [[ $(psql -d $PG_CONN/vegeo -c "SELECT * FROM pg_tables WHERE schemaname='pub
   echo "✅ Done"
 fi
 
+# Bring the DB schema up to date
+python3 -m src.scripts.migrate_db
+
 # Start API server
 echo "🏃 Starting API server ..."
 fastapi run src/api.py
@@ -0,0 +1,30 @@
+from datetime import datetime
+from sqlalchemy import DateTime, Integer, func
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy.schema import PrimaryKeyConstraint
+from src.model.base import Base
+
+
+class DeletedTile(Base):
+    """Coordinates of a deleted image tile, written by a trigger on the image tile table
+
+    Deletions leave no row behind that could be found by its change timestamp, so incremental pipeline steps look
+    them up here instead.
+    """
+
+    __tablename__ = "deleted_tile"
+
+    x: Mapped[int] = mapped_column(Integer)
+    y: Mapped[int] = mapped_column(Integer)
+    z: Mapped[int] = mapped_column(Integer)
+    deleted_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (PrimaryKeyConstraint("z", "x", "y", name="deleted_tile_pkey"),)
+
+    def __init__(self, x: int, y: int, z: int):
+        self.x = x
+        self.y = y
+        self.z = z
+
+    def __repr__(self) -> str:
+        return f"DeletedTile {self.z}/{self.x}/{self.y}"
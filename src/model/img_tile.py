@@ -1,29 +1,71 @@
-from typing import BinaryIO
-from sqlalchemy import Integer, LargeBinary
+from datetime import datetime
+from numpy.typing import NDArray
+from typing import Dict, Iterable, List, Optional, Tuple
+from sqlalchemy import Computed, DateTime, Integer, LargeBinary, String, func
 from sqlalchemy.orm import Mapped, mapped_column
 from sqlalchemy.schema import PrimaryKeyConstraint
 from src.model.base import Base
+from src.util.geo import TileCoords
+from src.util.raster import decode_mask, render_mask
 
 
 class ImgTile(Base):
-    """A square image tile to be overlayed on map data (usually a 256x256 PNG)"""
+    """A square image tile to be overlayed on map data (usually a 256x256 PNG)
+
+    Only the vegetation mask behind the image is stored, in the compact format of `src.util.raster.encode_mask`.
+    The API renders the image from it with the mask colors and caches it.
+    """
 
     __IMG_FORMAT__ = "PNG"
     __IMG_SIZE__ = 256
+    # RGBA factors for the mask values, see `src.util.raster.colorize`
+    __MASK_RGBA__ = [1.0, 0.0, 1.0, 0.5]
     __tablename__ = "img_tile"
 
     x: Mapped[int] = mapped_column(Integer)
     y: Mapped[int] = mapped_column(Integer)
     z: Mapped[int] = mapped_column(Integer)
-    d: Mapped[BinaryIO] = mapped_column(LargeBinary)
+    m: Mapped[bytes] = mapped_column(LargeBinary)
+    # Content hash of the mask (computed by the DB), used for the HTTP entity tag of the tile
+    h: Mapped[str] = mapped_column(String(32), Computed("md5(m)", persisted=True))
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now(), onupdate=func.now()
+    )
 
-    Primary__table_args__ = (PrimaryKeyConstraint(x, y, z),)
+    # Zoom level first, so the key also serves range scans over a single zoom level
+    __table_args__ = (PrimaryKeyConstraint("z", "x", "y", name="img_tile_pkey"),)
 
-    def __init__(self, x: int, y: int, z: int, d: BinaryIO):
+    def __init__(self, x: int, y: int, z: int, m: bytes):
         self.x = x
         self.y = y
         self.z = z
-        self.d = d
+        self.m = m
 
     def __repr__(self) -> str:
-        return f"ImgTile {self.z}/{self.x}/{self.y} ({self.__IMG_SIZE__}x{self.__IMG_SIZE__} {self.__IMG_FORMAT__} {len(self.d)} bytes)"
+        return f"ImgTile {self.z}/{self.x}/{self.y} ({self.__IMG_SIZE__}x{self.__IMG_SIZE__} {self.__IMG_FORMAT__}, {len(self.m)} byte mask)"
+
+
+def decode_tile_masks(
+    rows: Iterable[Tuple[int, int, Optional[bytes]]],
+) -> Tuple[Dict[TileCoords, NDArray], List[TileCoords]]:
+    """Decode the vegetation masks of (x, y, m) image tile rows.
+
+    Returns the masks by tile and the coordinates of the tiles that have no mask (in databases that still have to be
+    migrated with `src.scripts.migrate_db`).
+    """
+
+    masks: Dict[TileCoords, NDArray] = {}
+    missing: List[TileCoords] = []
+    for x, y, m in rows:
+        if m is None:
+            missing.append(TileCoords(x, y))
+        else:
+            masks[TileCoords(x, y)] = decode_mask(m)
+
+    return masks, missing
+
+
+def render_tile(m: bytes, format="PNG", level=6) -> bytes:
+    """Render the image of a tile from its encoded vegetation mask with the mask colors of `ImgTile`."""
+
+    return render_mask(decode_mask(m), ImgTile.__MASK_RGBA__, format, level)
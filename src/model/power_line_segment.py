@@ -1,10 +1,33 @@
 import json
-from typing import Dict
+import numpy as np
+from datetime import datetime
+from typing import Dict, Optional
 from pydantic import BaseModel, Field
 from pydantic.alias_generators import to_camel
-from sqlalchemy import Integer, Float, String
+from sqlalchemy import ColumnElement, DateTime, Index, Integer, Float, String, and_, func
 from sqlalchemy.orm import Mapped, mapped_column
 from src.model.base import Base
+from src.util.geo import LatLon, lat_lon_to_mercator_batch, simplify_polyline
+
+# Zoom levels with precomputed simplified geometries, which deviate from the full ones by at most half a pixel
+SIMPLIFIED_ZOOMS = [10, 12, 14]
+SIMPLIFY_TOLERANCE_PX = 0.5
+
+
+def simplify_geometry(geometry: str) -> Dict[str, str]:
+    """Simplify a JSON geometry of [lat, lon] nodes for every zoom level in `SIMPLIFIED_ZOOMS`.
+
+    Returns the simplified JSON geometries by column name (e.g. `geometry_z10`).
+    """
+
+    nodes = json.loads(geometry)
+    lat_lon = np.array(nodes, dtype=np.float64).reshape(-1, 2)
+    simplified = {}
+    for z in SIMPLIFIED_ZOOMS:
+        keep = simplify_polyline(lat_lon_to_mercator_batch(lat_lon[:, 0], lat_lon[:, 1], z), SIMPLIFY_TOLERANCE_PX)
+        simplified[f"geometry_z{z}"] = json.dumps([nodes[i] for i in keep.tolist()])
+
+    return simplified
 
 
 class PowerLineSegment(Base):
@@ -19,6 +42,12 @@ class PowerLineSegment(Base):
     bb_max_lon: Mapped[float] = mapped_column(Float)
     num_nodes: Mapped[int] = mapped_column(Integer)
     geometry: Mapped[str] = mapped_column(String)
+    geometry_z10: Mapped[Optional[str]] = mapped_column(String)
+    geometry_z12: Mapped[Optional[str]] = mapped_column(String)
+    geometry_z14: Mapped[Optional[str]] = mapped_column(String)
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now(), onupdate=func.now()
+    )
 
     def __init__(self, data: Dict[str, object]):
         assert data["type"] == "way", f'Invalid entity type: "{data['type']}"'
@@ -30,11 +59,50 @@ class PowerLineSegment(Base):
         self.num_nodes = len(data["nodes"])
         geometry = [[p["lat"], p["lon"]] for p in data["geometry"]]
         self.geometry = json.dumps(geometry)
+        for name, simplified in simplify_geometry(self.geometry).items():
+            setattr(self, name, simplified)
+
+    @classmethod
+    def bbox(cls) -> ColumnElement:
+        """Return the bounding box as a PostgreSQL `box` expression (matching the GiST index below)."""
+
+        return func.box(func.point(cls.bb_min_lon, cls.bb_min_lat), func.point(cls.bb_max_lon, cls.bb_max_lat))
+
+    @classmethod
+    def geometry_for_zoom(cls, z: Optional[int]) -> ColumnElement[str]:
+        """Return the coarsest geometry that is accurate at a zoom level (the full one for high or no zoom levels).
+
+        Falls back to the full geometry for segments whose simplified geometries have not been computed yet.
+        """
+
+        for zs in SIMPLIFIED_ZOOMS:
+            if z is not None and z <= zs:
+                return func.coalesce(getattr(cls, f"geometry_z{zs}"), cls.geometry)
+        return cls.geometry
+
+    @classmethod
+    def intersects(cls, mn: LatLon, mx: LatLon) -> ColumnElement[bool]:
+        """Return a filter for segments whose bounding box intersects the given one.
+
+        The `&&` overlap test can use the GiST index, the other comparisons keep the bounds exclusive.
+        """
+
+        area = func.box(func.point(float(mn.lon), float(mn.lat)), func.point(float(mx.lon), float(mx.lat)))
+        return and_(
+            cls.bbox().op("&&")(area),
+            cls.bb_max_lat > mn.lat,
+            cls.bb_max_lon > mn.lon,
+            cls.bb_min_lat < mx.lat,
+            cls.bb_min_lon < mx.lon,
+        )
 
     def __repr__(self) -> str:
         return f"PowerLineSegment [{self.id}] ({self.bb_min_lat}, {self.bb_min_lon}) - ({self.bb_max_lat}, {self.bb_max_lon}) {self.num_nodes} nodes"
 
 
+Index("ix_power_line_segment_bbox", PowerLineSegment.bbox(), postgresql_using="gist")
+
+
 class PowerLineSegmentSchema(BaseModel):
     id: int = Field(title="OSM way ID")
     bb_min_lat: float = Field(title="Southern latitude of the bounding box")
@@ -1,5 +1,11 @@
-from typing import Optional
-from src.util.geo import LatLon, Pixel
+import numpy as np
+
+from numpy.typing import NDArray
+from typing import Optional, Set
+from src.util.geo import LatLon, Pixel, TileCoords
+
+# Compact record of a spot for batch processing (segment ID and global pixel coordinates)
+SPOT_DTYPE = np.dtype([("segment_id", np.int64), ("px", np.int32), ("py", np.int32)])
 
 
 class PowerLineSpot:
@@ -16,3 +22,15 @@ class PowerLineSpot:
             str = f"{str}: P{[*self.pix_loc]}"
 
         return str
+
+
+def get_dirty_segment_ids(
+    spots: NDArray, changed_tiles: Set[TileCoords], changed_segment_ids: Set[int], ts=256
+) -> Set[int]:
+    """Return the IDs of segments whose alerts are outdated because they or the tiles below their spots changed."""
+
+    tiles, inverse = np.unique(np.stack([spots["px"] // ts, spots["py"] // ts], axis=-1), axis=0, return_inverse=True)
+    changed = np.array([TileCoords(x, y) in changed_tiles for x, y in tiles.tolist()], dtype=bool)
+    dirty = changed[inverse.reshape(-1)] | np.isin(spots["segment_id"], list(changed_segment_ids))
+
+    return set(np.unique(spots["segment_id"][dirty]).tolist())
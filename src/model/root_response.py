@@ -1,14 +1,16 @@
 from pydantic import BaseModel, Field
 from pydantic.alias_generators import to_camel
+from typing import Optional
 
 
 class RootResponseSchema(BaseModel):
     name: str = Field(title="Name of the API server")
     version: str = Field(title="Version of the API server")
+    dataset_version: Optional[str] = Field(title="Version of the detection data set (pass as `v` to tile requests)")
 
     model_config = {
         "alias_generator": to_camel,
         "populate_by_name": True,
         "from_attributes": True,
-        "json_schema_extra": {"examples": [{"name": "Vegeo API", "version": "0.1.0"}]},
+        "json_schema_extra": {"examples": [{"name": "Vegeo API", "version": "0.1.0", "datasetVersion": "2025-04"}]},
     }
@@ -1,7 +1,7 @@
 from typing import Optional
 from pydantic import BaseModel, Field
 from pydantic.alias_generators import to_camel
-from sqlalchemy import ForeignKey, Integer, Float, PrimaryKeyConstraint, String
+from sqlalchemy import ForeignKey, Index, Integer, Float, PrimaryKeyConstraint, String
 from sqlalchemy.orm import Mapped, mapped_column
 from src.model.base import Base
 
@@ -24,7 +24,11 @@ class VegetationAlert(Base):
     risk: Mapped[int] = mapped_column(Integer)
     pls_id: Mapped[Optional[int]] = mapped_column(ForeignKey("power_line_segment.id"))
 
-    Primary__table_args__ = (PrimaryKeyConstraint(lat, lon),)
+    # The (lat, lon) key also serves bounding box queries, the pls_id index the incremental alert updates
+    __table_args__ = (
+        PrimaryKeyConstraint("lat", "lon", name="vegetation_alert_pkey"),
+        Index("ix_vegetation_alert_pls_id", "pls_id"),
+    )
 
     def __init__(self, lat: float, lon: float, desc: str, risk: int, pls_id: int = None):
         assert risk > 0 and risk < 11, "Risk level must be in [1, 10]"
@@ -62,3 +66,26 @@ class VegetationAlertSchema(BaseModel):
             ]
         },
     }
+
+
+class AlertClusterSchema(BaseModel):
+    lat: float = Field(title="Latitude of the cluster centroid")
+    lon: float = Field(title="Longitude of the cluster centroid")
+    count: int = Field(title="Number of alerts in the cluster")
+    max_risk: int = Field(title="Highest risk level of the alerts in the cluster")
+
+    model_config = {
+        "alias_generator": to_camel,
+        "populate_by_name": True,
+        "from_attributes": True,
+        "json_schema_extra": {
+            "examples": [
+                {
+                    "lat": 40.7401862,
+                    "lon": -74.0431207,
+                    "count": 17,
+                    "maxRisk": 8,
+                },
+            ]
+        },
+    }
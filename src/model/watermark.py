@@ -0,0 +1,24 @@
+from datetime import datetime
+from sqlalchemy import DateTime, String
+from sqlalchemy.orm import Mapped, mapped_column
+from src.model.base import Base
+
+
+class Watermark(Base):
+    """Point in time up to which a pipeline step has processed its input data
+
+    :param name: name of the pipeline step
+    :param ts:   timestamp of the last processed change
+    """
+
+    __tablename__ = "watermark"
+
+    name: Mapped[str] = mapped_column(String, primary_key=True)
+    ts: Mapped[datetime] = mapped_column(DateTime(timezone=True))
+
+    def __init__(self, name: str, ts: datetime):
+        self.name = name
+        self.ts = ts
+
+    def __repr__(self) -> str:
+        return f'Watermark "{self.name}" ({self.ts.isoformat()})'
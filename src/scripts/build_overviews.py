@@ -0,0 +1,161 @@
+import argparse
+
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from sqlalchemy import delete, select, tuple_
+from tqdm import tqdm
+from typing import Dict, List, Set, Tuple
+from src import db
+from src.model.deleted_tile import DeletedTile
+from src.model.img_tile import ImgTile, decode_tile_masks
+from src.model.watermark import Watermark
+from src.util import log
+from src.util.geo import TileCoords, parent_tile_coords
+from src.util.raster import downsample_tiles, encode_mask
+
+MASK_ZOOM = 17
+MIN_ZOOM = 10
+MODES = ["max", "mean"]
+TILES_PER_TASK = 64
+WATERMARK = "build_overviews"
+
+
+def get_tile_coords(z: int) -> Set[TileCoords]:
+    """Return the coordinates of all image tiles on a zoom level."""
+
+    session = db.get_session()
+    return set([TileCoords(x, y) for x, y in session.execute(select(ImgTile.x, ImgTile.y).where(ImgTile.z == z))])
+
+
+def get_changed_tiles(since, z=MASK_ZOOM) -> Set[TileCoords]:
+    """Return the coordinates of image tiles on a zoom level that have been written since a given point in time."""
+
+    session = db.get_session()
+    rows = session.execute(select(ImgTile.x, ImgTile.y).where(ImgTile.z == z).where(ImgTile.updated_at > since))
+    return set([TileCoords(x, y) for x, y in rows])
+
+
+def get_deleted_tiles(since, z=MASK_ZOOM) -> Set[TileCoords]:
+    """Return the coordinates of image tiles on a zoom level that have been deleted since a given point in time."""
+
+    session = db.get_session()
+    rows = session.execute(
+        select(DeletedTile.x, DeletedTile.y).where(DeletedTile.z == z).where(DeletedTile.deleted_at > since)
+    )
+    return set([TileCoords(x, y) for x, y in rows])
+
+
+def build_tiles(
+    parents: List[TileCoords], z: int, mode="max", ts=256
+) -> Tuple[List[Dict[str, object]], List[TileCoords]]:
+    """Build the overview tiles on zoom level `z` from their (up to four) child tiles on level `z + 1`.
+
+    Returns image tile records for the parents that have at least one child, and the coordinates of the children
+    without a vegetation mask. Parents of such children are left as they are, instead of being built with a hole.
+    """
+
+    children = [TileCoords(2 * x + dx, 2 * y + dy) for x, y in parents for dy in (0, 1) for dx in (0, 1)]
+    session = db.get_session()
+    # Select plain rows so the mask blobs don't pile up in the session's identity map
+    rows = session.execute(
+        select(ImgTile.x, ImgTile.y, ImgTile.m)
+        .where(ImgTile.z == z + 1)
+        .where(tuple_(ImgTile.x, ImgTile.y).in_(children))
+    )
+    masks, missing = decode_tile_masks(rows)
+    incomplete = parent_tile_coords(missing)
+    # "mean" overviews are rendered with a lower opacity where vegetation is sparse
+    overviews = downsample_tiles(
+        {tc: m for tc, m in masks.items() if TileCoords(tc.x // 2, tc.y // 2) not in incomplete}, mode, ts
+    )
+
+    tiles = [{"x": tc.x, "y": tc.y, "z": z, "m": encode_mask(mask)} for tc, mask in overviews.items()]
+    return tiles, missing
+
+
+def build_overviews(min_zoom=MIN_ZOOM, mode="max", workers=1, incremental=False):
+    log.msg("Build overview tiles of the vegetation masks")
+
+    assert MIN_ZOOM <= min_zoom < MASK_ZOOM, f"Minimum zoom level must be in [{MIN_ZOOM}, {MASK_ZOOM - 1}]"
+    assert mode in MODES, f"Mode must be one of {MODES}"
+
+    session = db.get_session()
+    # Changes of transactions that are still running are picked up by the next run
+    run_start = db.get_change_horizon(session)
+    watermark = session.get(Watermark, WATERMARK) if incremental else None
+    if watermark:
+        # Only the ancestors of mask tiles that changed or were deleted since the last run are rebuilt
+        changed = get_changed_tiles(watermark.ts)
+        deleted = get_deleted_tiles(watermark.ts)
+        log.info(
+            f"Rebuild overviews of tiles changed since {watermark.ts:%Y-%m-%d %H:%M:%S}",
+            f" ({len(changed)} tiles, {len(deleted)} deleted)",
+        )
+        changed |= deleted
+    else:
+        changed = get_tile_coords(MASK_ZOOM)
+
+    # Each worker process opens its own DB connections, the parent only writes the tiles
+    executor = ProcessPoolExecutor(workers, initializer=db.reset_connection) if workers > 1 else None
+    build = executor.map if executor else map
+
+    for z in range(MASK_ZOOM - 1, min_zoom - 1, -1):
+        parents = sorted(parent_tile_coords(changed))
+        # Overview tiles whose children are all gone are deleted, on a full rebuild that includes orphans
+        candidates = set(parents) if watermark else get_tile_coords(z)
+        chunks = [parents[i : i + TILES_PER_TASK] for i in range(0, len(parents), TILES_PER_TASK)]
+        progress = tqdm(total=len(parents), leave=False, desc=f"    ↳ Build z={z}", unit="tiles")
+        built: Set[TileCoords] = set()
+        skipped: List[TileCoords] = []
+        # Levels are built one after another, since each one is downsampled from the level below
+        with db.BulkWriter(ImgTile, batch_size=TILES_PER_TASK, update=True) as writer:
+            for chunk, (tiles, missing) in zip(chunks, build(partial(build_tiles, z=z, mode=mode), chunks)):
+                for tile in tiles:
+                    writer.add(tile)
+                    built.add(TileCoords(tile["x"], tile["y"]))
+                skipped.extend(missing)
+                progress.update(len(chunk))
+        progress.close()
+        if skipped:
+            log.error(
+                f"{len(skipped)} tiles on zoom level {z + 1} have no vegetation mask, their parents were not rebuilt",
+                f" (e.g. {z + 1}/{skipped[0].x}/{skipped[0].y}, see `src.scripts.migrate_db`)",
+            )
+
+        stale = sorted(candidates - built - parent_tile_coords(skipped))
+        for i in range(0, len(stale), TILES_PER_TASK):
+            batch = stale[i : i + TILES_PER_TASK]
+            session.execute(delete(ImgTile).where(ImgTile.z == z).where(tuple_(ImgTile.x, ImgTile.y).in_(batch)))
+        session.commit()
+        log.info(f"{len(built)} tiles on zoom level {z}", f" ({len(stale)} deleted) ✓")
+        changed = set(parents)
+
+    if executor:
+        executor.shutdown()
+    session.merge(Watermark(WATERMARK, run_start))
+    session.commit()
+    log.success("Done")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Downsample the vegetation masks into overview tiles.")
+    parser.add_argument(
+        "--min-zoom",
+        type=int,
+        default=MIN_ZOOM,
+        help=f"lowest zoom level to build (default: {MIN_ZOOM})",
+    )
+    parser.add_argument(
+        "--mode",
+        choices=MODES,
+        default="max",
+        help="how 2x2 pixel blocks are combined, max keeps thin vegetation visible (default: max)",
+    )
+    parser.add_argument("--workers", type=int, default=1, help="number of worker processes (default: 1)")
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="only rebuild the overviews of mask tiles that changed since the last run",
+    )
+    args = parser.parse_args()
+    build_overviews(args.min_zoom, args.mode, args.workers, args.incremental)
@@ -1,135 +1,260 @@
-from io import BytesIO
+import argparse
 import json
-import math
 import numpy as np
 
-from typing import List
-from PIL import Image
-from sqlalchemy import select
-from sqlalchemy.dialects.postgresql import insert
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Dict, List, Set, Tuple
+from sqlalchemy import delete, select, tuple_
 from tqdm import tqdm
 from src import db
-from src.model.img_tile import ImgTile
+from src.model.deleted_tile import DeletedTile
+from src.model.img_tile import ImgTile, decode_tile_masks
 from src.model.power_line_segment import PowerLineSegment
-from src.model.power_line_spot import PowerLineSpot
+from src.model.power_line_spot import SPOT_DTYPE, get_dirty_segment_ids
 from src.model.region import Region
 from src.model.vegetation_alert import VegetationAlert
+from src.model.watermark import Watermark
 from src.util import log
 from src.util.geo import (
+    LatLon,
     Pixel,
-    lat_lon_to_pixel_coords,
+    TileCoords,
+    lat_lon_to_pixel_coords_batch,
     pixel_coords_to_lat_lon,
-    pixels_in_circle,
+    resample_polylines,
 )
+from src.util.raster import opaque_fractions
 from numpy.typing import NDArray
 
 PIXEL_RADIUS = 8
 RISK_THRESH = 0.5
+TILE_BATCH_SIZE = 256
+TILES_PER_TASK = 64
+WATERMARK = "compute_alerts"
 
 
-def get_spots_to_check(region: Region, z=17) -> List[PowerLineSpot]:
-    """Return pixel coordinates of spots to check along the power lines in a given region."""
+def get_spots_to_check(region: Region, z=17) -> NDArray:
+    """Return the segment IDs and pixel coordinates of spots to check along the power lines in a given region.
 
-    spots: List[PowerLineSpot] = []
+    The spots are returned as a structured array with `SPOT_DTYPE` records.
+    """
 
     session = db.get_session()
-    segments = session.scalars(
-        select(PowerLineSegment)
-        .where(PowerLineSegment.bb_max_lat > region.bb_min_lat)
-        .where(PowerLineSegment.bb_max_lon > region.bb_min_lon)
-        .where(PowerLineSegment.bb_min_lat < region.bb_max_lat)
-        .where(PowerLineSegment.bb_min_lon < region.bb_max_lon)
+    segments = session.execute(
+        select(PowerLineSegment.id, PowerLineSegment.geometry).where(
+            PowerLineSegment.intersects(
+                LatLon(region.bb_min_lat, region.bb_min_lon), LatLon(region.bb_max_lat, region.bb_max_lon)
+            )
+        )
     )
-    for seg in segments:
-        geom: List[List[float]] = json.loads(seg.geometry)
-        p0 = lat_lon_to_pixel_coords(*geom[0], z)
-        spots.append(PowerLineSpot(seg.id, pix_loc=p0))
-        for g1 in geom[1:]:
-            p1 = lat_lon_to_pixel_coords(*g1, z)
-            dx, dy = p1.x - p0.x, p1.y - p0.y
-            l = math.sqrt((dx * dx) + (dy * dy))
-            num_steps = math.ceil(l / (2 * PIXEL_RADIUS))
-            for s in range(0, num_steps):
-                p0 = Pixel(
-                    math.floor(p0[0] + dx / num_steps),
-                    math.floor(p0[1] + dy / num_steps),
-                )
-                spots.append(PowerLineSpot(seg.id, pix_loc=p0))
+    ids: List[int] = []
+    geoms: List[List[List[float]]] = []
+    for segment_id, geometry in segments:
+        ids.append(segment_id)
+        geoms.append(json.loads(geometry))
+
+    nodes = np.array([node for geom in geoms for node in geom], dtype=np.float64).reshape(-1, 2)
+    pixels = lat_lon_to_pixel_coords_batch(nodes[:, 0], nodes[:, 1], z)
+    line, samples = resample_polylines(pixels, [len(geom) for geom in geoms], 2 * PIXEL_RADIUS)
+
+    spots = np.empty(len(line), dtype=SPOT_DTYPE)
+    spots["segment_id"] = np.asarray(ids, dtype=np.int64)[line]
+    spots["px"] = samples[:, 0]
+    spots["py"] = samples[:, 1]
 
     return spots
 
 
-def get_opaque_pixel_percentage(arr: NDArray, p: Pixel, r=PIXEL_RADIUS) -> float:
-    """Return the percentage of opaque pixels in a circle with radius r around a reference pixel."""
+def group_spots_by_tile(spots: NDArray, ts=256) -> Dict[TileCoords, NDArray]:
+    """Group power line spots by the tile they fall into, ordered by tile and keeping the spot order within each tile."""
+
+    tx, ty = spots["px"] // ts, spots["py"] // ts
+    # Lexsort is stable, so spots within a tile keep their order
+    order = np.lexsort((ty, tx))
+    tx, ty = tx[order], ty[order]
+    bounds = np.flatnonzero((np.diff(tx) != 0) | (np.diff(ty) != 0)) + 1
+    groups = np.split(spots[order], bounds)
+
+    return {TileCoords(int(tx[i]), int(ty[i])): g for i, g in zip(np.concatenate([[0], bounds]), groups) if len(g)}
+
+
+def fetch_tiles(
+    coords: List[TileCoords], z=17, batch_size=TILE_BATCH_SIZE
+) -> Tuple[Dict[TileCoords, NDArray], List[TileCoords]]:
+    """Fetch image tiles in bulk and decode the vegetation mask of each tile that exists in the DB.
+
+    Returns the masks by tile and the coordinates of the tiles that exist, but have no mask.
+    """
+
+    session = db.get_session()
+    masks: Dict[TileCoords, NDArray] = {}
+    missing: List[TileCoords] = []
+    for i in range(0, len(coords), batch_size):
+        batch = coords[i : i + batch_size]
+        # Select plain rows so the mask blobs don't pile up in the session's identity map
+        rows = session.execute(
+            select(ImgTile.x, ImgTile.y, ImgTile.m)
+            .where(ImgTile.z == z)
+            .where(tuple_(ImgTile.x, ImgTile.y).in_(batch))
+        )
+        batch_masks, batch_missing = decode_tile_masks(rows)
+        masks.update(batch_masks)
+        missing.extend(batch_missing)
+
+    return masks, missing
+
+
+def check_tile(mask: NDArray, tc: TileCoords, spots: NDArray, ts=256) -> NDArray:
+    """Check all power line spots within a tile's vegetation mask and return their vegetation pixel percentages."""
+
+    return opaque_fractions(mask, spots["px"] - tc.x * ts, spots["py"] - tc.y * ts, PIXEL_RADIUS)
+
+
+def make_alert(segment_id: int, p: Pixel, perc: float, z=17) -> Dict[str, object]:
+    """Turn the opaque pixel percentage of a power line spot into a vegetation alert record."""
+
+    risk = 1 + round((perc - RISK_THRESH) / (1 - RISK_THRESH) * 9)
+    loc = pixel_coords_to_lat_lon(*p, z)
+    return {
+        "lat": loc.lat,
+        "lon": loc.lon,
+        "desc": "Power line overlap",
+        "risk": risk,
+        "pls_id": segment_id,
+    }
+
+
+def get_tile_chunks(spots: NDArray) -> List[List[Tuple[TileCoords, NDArray]]]:
+    """Group power line spots by tile and split the tiles into chunks that can be checked independently."""
 
-    w, h, _ = np.shape(arr)
-    # If we cannot analyze the full circle, just return 0
-    if p.x < r or p.x > w - r or p.y < r or p.y > h - r:
-        return 0
+    groups = list(group_spots_by_tile(spots).items())
+    return [groups[i : i + TILES_PER_TASK] for i in range(0, len(groups), TILES_PER_TASK)]
 
-    pxls = pixels_in_circle(r, p.x, p.y)
-    num_opaque = 0
-    for x, y in pxls:
-        if arr[y][x][3] > 0:
-            num_opaque += 1
 
-    return num_opaque / len(pxls)
+def check_tiles(chunk: List[Tuple[TileCoords, NDArray]]) -> Tuple[List[Dict[str, object]], List[TileCoords]]:
+    """Check the power line spots in a chunk of tiles.
 
+    Returns the resulting alerts in tile order and the coordinates of the tiles that were skipped for lack of a mask.
+    """
 
-def check_spot(spot: PowerLineSpot) -> float:
-    """Check a power line spot and generate an alert if there is vegetation overlap."""
+    # Tiles are fetched and decoded once, then all spots inside them are checked together
+    data, missing = fetch_tiles([tc for tc, _ in chunk])
+    alerts: List[Dict[str, object]] = []
+    for tc, spots in chunk:
+        if tc not in data:
+            continue
+        percs = check_tile(data[tc], tc, spots)
+        risky = percs >= RISK_THRESH
+        for (segment_id, px, py), perc in zip(spots[risky].tolist(), percs[risky].tolist()):
+            alerts.append(make_alert(segment_id, Pixel(px, py), perc))
 
-    z = 17
-    ts = 256
-    tx, ty = math.floor(spot.pix_loc.x / ts), math.floor(spot.pix_loc.y / ts)
-    px, py = spot.pix_loc.x - tx * ts, spot.pix_loc.y - ty * ts
+    return alerts, missing
+
+
+def get_changed_tiles(since: datetime, z=17) -> Set[TileCoords]:
+    """Return the coordinates of image tiles that have been written since a given point in time."""
 
     session = db.get_session()
-    tile = session.scalar(select(ImgTile).where(ImgTile.x == tx).where(ImgTile.y == ty).where(ImgTile.z == z))
-    if not tile:
-        return 0
-    im = Image.open(BytesIO(tile.d))
-    data = np.array(im)
-    return get_opaque_pixel_percentage(data, Pixel(px, py))
+    rows = session.execute(select(ImgTile.x, ImgTile.y).where(ImgTile.z == z).where(ImgTile.updated_at > since))
+    return set([TileCoords(x, y) for x, y in rows])
 
 
-def compute_alerts():
-    log.msg("Check power lines in major US cities for vegetation overlap")
+def get_deleted_tiles(since: datetime, z=17) -> Set[TileCoords]:
+    """Return the coordinates of image tiles that have been deleted since a given point in time."""
+
+    session = db.get_session()
+    rows = session.execute(
+        select(DeletedTile.x, DeletedTile.y).where(DeletedTile.z == z).where(DeletedTile.deleted_at > since)
+    )
+    return set([TileCoords(x, y) for x, y in rows])
+
 
-    db.reset_table(VegetationAlert)
+def get_changed_segment_ids(since: datetime) -> Set[int]:
+    """Return the IDs of power line segments that have been written since a given point in time."""
 
     session = db.get_session()
-    regions = session.scalars(select(Region))
-    for region in regions:
-        spots = get_spots_to_check(region)
+    return set(session.scalars(select(PowerLineSegment.id).where(PowerLineSegment.updated_at > since)))
+
+
+def compute_alerts(workers=1, incremental=False):
+    log.msg("Check power lines in major US cities for vegetation overlap")
+
+    session = db.get_session()
+    # Changes of transactions that are still running are picked up by the next run
+    run_start = db.get_change_horizon(session)
+    watermark = session.get(Watermark, WATERMARK) if incremental else None
+    if watermark:
+        # Only recompute the alerts of segments that changed or cross changed or deleted tiles since the last run
+        changed_tiles = get_changed_tiles(watermark.ts)
+        deleted_tiles = get_deleted_tiles(watermark.ts)
+        changed_segment_ids = get_changed_segment_ids(watermark.ts)
         log.info(
-            f"Retrieve spots to check along power line segments in {region.name}",
-            f" ({len(spots)} spots)",
+            f"Recompute alerts affected by changes since {watermark.ts:%Y-%m-%d %H:%M:%S}",
+            f" ({len(changed_tiles)} tiles, {len(deleted_tiles)} deleted, {len(changed_segment_ids)} segments)",
         )
-        alerts: List[VegetationAlert] = []
-        spts = tqdm(spots, leave=False, desc="    ↳ Check spots", unit="spots")
-        num_alerts = 0
-        for spot in spts:
-            perc = check_spot(spot)
-            if perc < RISK_THRESH:
-                continue
-            risk = 1 + round((perc - RISK_THRESH) / (1 - RISK_THRESH) * 9)
-            loc = pixel_coords_to_lat_lon(*spot.pix_loc, 17)
-            alert = {
-                "lat": loc.lat,
-                "lon": loc.lon,
-                "desc": "Power line overlap",
-                "risk": risk,
-                "pls_id": spot.segment_id,
-            }
-            stmt = insert(VegetationAlert).values(alert).on_conflict_do_nothing()
-            session.execute(stmt)
-            num_alerts += 1
-        session.commit()
-        log.info(f"{num_alerts} alerts in {region.name}", " ✓")
+        changed_tiles |= deleted_tiles
+        # Changed segments may no longer be in any region, so their alerts are removed regardless
+        session.execute(delete(VegetationAlert).where(VegetationAlert.pls_id.in_(changed_segment_ids)))
+    else:
+        db.reset_table(VegetationAlert)
+
+    regions = session.scalars(select(Region).order_by(Region.name)).all()
+    # Each worker process opens its own DB connections, the parent only merges and writes the alerts
+    executor = ProcessPoolExecutor(workers, initializer=db.reset_connection) if workers > 1 else None
+    check = executor.map if executor else map
 
+    # Queue the tile chunks of all regions up front so that workers don't idle at region boundaries
+    jobs = []
+    for region in regions:
+        spots = get_spots_to_check(region)
+        if watermark:
+            dirty = get_dirty_segment_ids(spots, changed_tiles, changed_segment_ids)
+            spots = spots[np.isin(spots["segment_id"], list(dirty))]
+            session.execute(delete(VegetationAlert).where(VegetationAlert.pls_id.in_(dirty)))
+        chunks = get_tile_chunks(spots)
+        jobs.append((region, len(spots), [len(chunk) for chunk in chunks], check(check_tiles, chunks)))
+    # Outdated alerts must be gone before their replacements are written
+    session.commit()
+    with db.BulkWriter(VegetationAlert) as writer:
+        for region, num_spots, chunk_sizes, results in jobs:
+            log.info(
+                f"Check spots along power line segments in {region.name}",
+                f" ({num_spots} spots)",
+            )
+            tiles = tqdm(total=sum(chunk_sizes), leave=False, desc="    ↳ Check tiles", unit="tiles")
+            num_alerts = 0
+            skipped: List[TileCoords] = []
+            # Results come back in submission order, so the merged alerts don't depend on worker scheduling
+            for chunk_size, (alerts, missing) in zip(chunk_sizes, results):
+                for alert in alerts:
+                    writer.add(alert)
+                num_alerts += len(alerts)
+                skipped.extend(missing)
+                tiles.update(chunk_size)
+            tiles.close()
+            if skipped:
+                log.error(
+                    f"{len(skipped)} tiles in {region.name} have no vegetation mask and were skipped",
+                    f" (e.g. 17/{skipped[0].x}/{skipped[0].y}, see `src.scripts.migrate_db`)",
+                )
+            log.info(f"{num_alerts} alerts in {region.name}", " ✓")
+    log.info(f"{writer.num_inserted} alerts written", f" ({writer.rows_per_sec:.0f} rows/s)")
+
+    if executor:
+        executor.shutdown()
+    session.merge(Watermark(WATERMARK, run_start))
+    session.commit()
     log.success("Done")
 
 
 if __name__ == "__main__":
-    compute_alerts()
+    parser = argparse.ArgumentParser(description="Check power lines for vegetation overlap and save alerts in the DB.")
+    parser.add_argument("--workers", type=int, default=1, help="number of worker processes (default: 1)")
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="only recompute alerts affected by tiles and segments that changed since the last run",
+    )
+    args = parser.parse_args()
+    compute_alerts(args.workers, args.incremental)
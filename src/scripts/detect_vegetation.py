@@ -1,116 +1,292 @@
+import argparse
+import asyncio
 import sys
 import detectree as dtr
 import json
-import math
 import os
-import requests
 import warnings
 
+from collections import Counter
+from functools import partial
 from io import BytesIO
+from numpy.typing import NDArray
 from PIL import Image, ImageOps
-from sqlalchemy import select
-from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy import select, tuple_
 from tqdm import tqdm
-from typing import List, Set
+from typing import Dict, List, Optional, Sequence, Set, Tuple
 from src import db
 from src.model.img_tile import ImgTile
 from src.model.power_line_segment import PowerLineSegment
 from src.model.region import Region
+from src.scripts.build_overviews import build_overviews
 from src.util import log
-from src.util.geo import TileCoords, lat_lon_to_tile_coords
-from src.util.tensor import grayscale_to_rgba
+from src.util.download import DownloadFailure, TileDownloader
+from src.util.geo import LatLon, TileCoords, polyline_tile_coords
+from src.util.model_pool import ModelPool
+from src.util.pipeline import Pipeline, StageStats
+from src.util.raster import encode_mask
 
 tile_layer_url = "https://gis.apfo.usda.gov/arcgis/rest/services/NAIP/USDA_CONUS_PRIME/ImageServer/tile/"
 temp_dir = os.path.normpath(f"{__file__}/../../../data/temp")
 
+TILE_BATCH_SIZE = 256
+CLASSIFY_BATCH_SIZE = 4
+STORE_BATCH_SIZE = 32
 
-def get_power_line_tile_coords(region: Region, z=17) -> Set[TileCoords]:
-    """Get the power line segments in a given region and return the coordinates of all level-17 tiles they intersect with."""
 
-    tile_width = 360 / (2**z)
+def get_power_line_tile_coords(region: Region, z=17, buffer_px=0) -> Set[TileCoords]:
+    """Get the power line segments in a given region and return the coordinates of all level-17 tiles they intersect with.
+
+    With `buffer_px`, tiles within that many pixels of a power line are included as well.
+    """
+
     tile_coords: Set[TileCoords] = set()
 
     session = db.get_session()
     segments = session.scalars(
-        select(PowerLineSegment)
-        .where(PowerLineSegment.bb_max_lat > region.bb_min_lat)
-        .where(PowerLineSegment.bb_max_lon > region.bb_min_lon)
-        .where(PowerLineSegment.bb_min_lat < region.bb_max_lat)
-        .where(PowerLineSegment.bb_min_lon < region.bb_max_lon)
+        select(PowerLineSegment.geometry).where(
+            PowerLineSegment.intersects(
+                LatLon(region.bb_min_lat, region.bb_min_lon), LatLon(region.bb_max_lat, region.bb_max_lon)
+            )
+        )
     )
-    for seg in segments:
-        geom: List[List[float]] = json.loads(seg.geometry)
-        p0 = geom[0]
-        tile_coords.add(lat_lon_to_tile_coords(*p0, z))
-        for p in geom[1:]:
-            dlat, dlon = p[0] - p0[0], p[1] - p0[1]
-            diff = max(dlat, dlon)
-            # This ignores the web Mercator distortion but should overestimate the needed steps
-            num_steps = math.ceil(diff / tile_width)
-            for s in range(0, num_steps):
-                p0 = [p0[0] + dlat / num_steps, p0[1] + dlon / num_steps]
-                tile_coords.add(lat_lon_to_tile_coords(*p0, z))
+    for geometry in segments:
+        geom: List[List[float]] = json.loads(geometry)
+        lat, lon = [p[0] for p in geom], [p[1] for p in geom]
+        tile_coords.update(polyline_tile_coords(lat, lon, z, buffer_px))
 
     return tile_coords
 
 
-def download_and_classify_tiles(region_name: str, tile_coords: Set[TileCoords], z=17):
-    """Download NAIP satellite tile images, run tree detection and save the image masks in the DB."""
+def get_tile_path(data_dir: str, tc: TileCoords, z=17) -> str:
+    """Return the path of the downloaded NAIP image for a tile."""
+
+    return f"{data_dir}/naip_{z}_{tc.y}_{tc.x}.jpg"
+
+
+def write_failure_report(data_dir: str, failures: List[DownloadFailure[TileCoords]], stats: Sequence[StageStats] = ()):
+    """Log a summary of failed downloads and pipeline stages and write the details to a JSON file in the data dir.
+
+    Tiles that failed in a pipeline stage are listed with the name of the stage and the error.
+    """
+
+    fpath = f"{data_dir}/failures.json"
+    if not failures and not any([s.failed for s in stats]):
+        if os.path.isfile(fpath):
+            os.remove(fpath)
+        return
+
+    if failures:
+        statuses = Counter(str(f.status) if f.status else f.error.split(":")[0] for f in failures)
+        log.error(
+            f"{len(failures)} tiles could not be downloaded",
+            f" ({', '.join(f'{k}: {v}' for k, v in statuses.items())})",
+        )
+    report = [{**f._asdict(), "key": list(f.key)} for f in failures]
+    for s in stats:
+        report.extend([{"key": list(tc), "stage": s.name, "error": repr(e)} for tc, e in s.failed])
+    with open(fpath, "w") as f:
+        json.dump(report, f, indent=2)
+
+
+def get_existing_tile_coords(tile_coords: Set[TileCoords], z=17) -> Set[TileCoords]:
+    """Return the coordinates of the given tiles that already have a segmentation mask in the DB."""
 
     session = db.get_session()
+    existing: Set[TileCoords] = set()
+    coords = sorted(tile_coords)
+    for i in range(0, len(coords), TILE_BATCH_SIZE):
+        batch = coords[i : i + TILE_BATCH_SIZE]
+        rows = session.execute(
+            select(ImgTile.x, ImgTile.y).where(ImgTile.z == z).where(tuple_(ImgTile.x, ImgTile.y).in_(batch))
+        )
+        existing.update(TileCoords(x, y) for x, y in rows)
+
+    return existing
+
+
+def load_classifier() -> dtr.Classifier:
+    """Load the tree detection model (once per classifier process)."""
+
+    # Suppress irrelevant warnings from rasterio and the classifier lib
+    warnings.filterwarnings("ignore")
+    return dtr.Classifier()
+
+
+def predict_tile(classifier: dtr.Classifier, fpath: str) -> NDArray:
+    """Run tree detection on a downloaded tile image."""
+
+    return classifier.predict_img(fpath)
+
+
+def get_item_coords(item: Tuple[TileCoords, object]) -> TileCoords:
+    """Return the tile coordinates of a (coordinates, data) pipeline item."""
+
+    return item[0]
+
+
+def encode_tile(item: Tuple[TileCoords, NDArray], z=17) -> Dict[str, object]:
+    """Turn a tree detection result into an image tile record with a compact mask."""
+
+    (x, y), pred = item
+    return {"x": x, "y": y, "z": z, "m": encode_mask(pred)}
+
+
+def download_and_classify_tiles(
+    region_name: str,
+    tile_coords: Set[TileCoords],
+    classifiers: ModelPool,
+    z=17,
+    concurrency=8,
+    rate: Optional[float] = None,
+) -> int:
+    """Download NAIP satellite tile images, run tree detection and save the image masks in the DB.
+
+    The steps run as a pipeline: tiles are downloaded concurrently, saved, classified in batches by the
+    long-lived `classifiers` processes, encoded and written to the DB in batches, all at the same time.
+    Returns the number of tiles that failed in a pipeline stage (they are listed in the failure report).
+    """
+
     dir_name = region_name.replace(" ", "")
     data_dir = f"{temp_dir}/{dir_name}"
     if not os.path.exists(data_dir):
         os.makedirs(data_dir)
 
-    # Suppress irrelevant warnings from rasterio and the classifier lib
-    warnings.filterwarnings("ignore")
-    coords = tqdm(tile_coords, leave=False, desc="    ↳ Detect vegetation", unit="tiles")
-    for x, y in coords:
-        tpath = f"{z}/{y}/{x}"
-        url = f"{tile_layer_url}{tpath}?blankTile=false"
-        fpath = f"{data_dir}/naip_{z}_{y}_{x}.jpg"
-        if not os.path.isfile(fpath):
-            try:
-                res = requests.get(url)
-            except:  # We skip occasional SSL and rate limit errors
-                continue
-            if res.status_code != 200:
-                continue
-            im = Image.open(BytesIO(res.content))
+    todo = sorted(tile_coords - get_existing_tile_coords(tile_coords, z))
+    cached: List[TileCoords] = []
+    urls: List[Tuple[TileCoords, str]] = []
+    for tc in todo:
+        if os.path.isfile(get_tile_path(data_dir, tc, z)):
+            cached.append(tc)
+        else:
+            urls.append((tc, f"{tile_layer_url}{z}/{tc.y}/{tc.x}?blankTile=false"))
+    progress = tqdm(total=len(todo), leave=False, desc="    ↳ Detect vegetation", unit="tiles")
+
+    def save(item: Tuple[TileCoords, Optional[bytes]]) -> Tuple[TileCoords, str]:
+        tc, content = item
+        fpath = get_tile_path(data_dir, tc, z)
+        if content is not None:
+            im = Image.open(BytesIO(content))
             im = ImageOps.autocontrast(im)
             im.save(fpath)
-        # Check if raster tile exists
-        if session.scalar(select(ImgTile.x).where(ImgTile.x == x).where(ImgTile.y == y).where(ImgTile.z == z)):
-            continue
-        pred = dtr.Classifier().predict_img(fpath)
-        pred_rgba = grayscale_to_rgba(pred, [1, 0, 1, 0.5])
-        det_img = Image.fromarray(pred_rgba)
-        blob = BytesIO()
-        det_img.save(blob, format="PNG")
-        tile_data = {"x": x, "y": y, "z": z, "d": blob.getvalue()}
-        stmt = insert(ImgTile).values(tile_data).on_conflict_do_nothing()
-        session.execute(stmt)
-        session.commit()
-
-
-def detect_vegetation():
-    """Go through all regions in the DB and detect trees in tiles that intersect with power line segments."""
+        return tc, fpath
 
-    log.msg("Detect trees along power lines in major US cities")
+    def classify(batch: List[Tuple[TileCoords, str]]) -> List[Tuple[TileCoords, NDArray]]:
+        preds = classifiers.predict([fpath for _, fpath in batch])
+        return [(tc, pred) for (tc, _), pred in zip(batch, preds)]
 
-    session = db.get_session()
-    regions = session.scalars(select(Region))
-    for region in regions:
-        coords = get_power_line_tile_coords(region)
+    def store(batch: List[Dict[str, object]]) -> List[Dict[str, object]]:
+        for tile_data in batch:
+            writer.add(tile_data)
+        writer.flush()
+        progress.update(len(batch))
+        return batch
+
+    downloader = TileDownloader[TileCoords](concurrency, rate)
+    with db.BulkWriter(ImgTile) as writer:
+        pipeline = (
+            Pipeline(maxsize=2 * CLASSIFY_BATCH_SIZE * classifiers.workers)
+            .stage("save", save, workers=2, key=get_item_coords)
+            .stage("classify", classify, classifiers.workers, CLASSIFY_BATCH_SIZE, key=get_item_coords)
+            .stage("encode", partial(encode_tile, z=z), workers=2, key=get_item_coords)
+            .stage("store", store, batch_size=STORE_BATCH_SIZE, key=lambda row: TileCoords(row["x"], row["y"]))
+        )
+        pipeline.start()
+
+        async def feed():
+            # Already downloaded images enter the pipeline while the remaining ones are being downloaded
+            async def put_cached():
+                for tc in cached:
+                    await asyncio.to_thread(pipeline.put, (tc, None))
+
+            async def put_downloaded(tc: TileCoords, content: bytes):
+                await asyncio.to_thread(pipeline.put, (tc, content))
+
+            await asyncio.gather(put_cached(), downloader.download(urls, put_downloaded))
+
+        asyncio.run(feed())
+        stats = pipeline.close()
+    progress.close()
+
+    write_failure_report(data_dir, downloader.failures, stats)
+    for s in stats:
         log.info(
-            f"Process tiles covered by power line segments in {region.name}",
-            f" ({len(coords)} tiles)",
+            f"{s.name.capitalize()}: {s.num_out} tiles",
+            f" ({s.items_per_sec:.1f} tiles/s, {s.utilization:.0%} busy, {s.num_errors} errors)",
         )
-        download_and_classify_tiles(region.name, coords)
+        if s.last_error:
+            log.error(f"{s.name.capitalize()}: {len(s.failed)} tiles failed", f" (last error: {s.last_error!r})")
 
+    return sum([len(s.failed) for s in stats])
+
+
+def detect_vegetation(
+    buffer_px=0, concurrency=8, rate: Optional[float] = None, workers: Optional[int] = None, overviews=True
+):
+    """Go through all regions in the DB and detect trees in tiles that intersect with power line segments.
+
+    Afterwards, the overview tiles above the stored tiles are rebuilt (unless `overviews` is False).
+    """
+
+    log.msg("Detect trees along power lines in major US cities")
+
+    session = db.get_session()
+    regions = session.scalars(select(Region)).all()
+    num_failed = 0
+    # The classifier processes load the model once and are reused for all regions
+    with ModelPool(load_classifier, predict_tile, workers) as classifiers:
+        for region in regions:
+            coords = get_power_line_tile_coords(region, buffer_px=buffer_px)
+            log.info(
+                f"Process tiles covered by power line segments in {region.name}",
+                f" ({len(coords)} tiles)",
+            )
+            num_failed += download_and_classify_tiles(
+                region.name, coords, classifiers, concurrency=concurrency, rate=rate
+            )
+
+    # Overviews are built once all regions are stored, since regions can share overview tiles. The incremental
+    # build only covers tiles stored since its last run, including those of regions with failed tiles.
+    if overviews:
+        build_overviews(workers=workers or os.cpu_count(), incremental=True)
+
+    if num_failed:
+        # Failed tiles are not in the DB, so they are processed again by the next run
+        log.error(f"{num_failed} tiles failed during detection", " (see failures.json in the region data folders)")
+        sys.exit(1)
     log.success("Done")
 
 
 if __name__ == "__main__":
-    detect_vegetation()
+    parser = argparse.ArgumentParser(description="Detect trees along power lines")
+    parser.add_argument(
+        "--buffer-px",
+        type=int,
+        default=0,
+        help="also process tiles within this many pixels of a power line (default: 0)",
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=8,
+        help="number of concurrent tile downloads (default: 8)",
+    )
+    parser.add_argument(
+        "--rate",
+        type=float,
+        default=None,
+        help="maximum number of tile requests per second (default: no limit)",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="number of tree detection processes (default: number of CPUs)",
+    )
+    parser.add_argument(
+        "--skip-overviews",
+        action="store_true",
+        help="don't rebuild the overview tiles afterwards",
+    )
+    args = parser.parse_args()
+    detect_vegetation(args.buffer_px, args.concurrency, args.rate, args.workers, not args.skip_overviews)
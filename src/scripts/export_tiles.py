@@ -0,0 +1,74 @@
+import argparse
+import numpy as np
+import os
+import tempfile
+
+from sqlalchemy import select, tuple_
+from tqdm import tqdm
+from src import db
+from src.model.img_tile import ImgTile, render_tile
+from src.util import log
+from src.util.tile_archive import TileArchiveWriter, hilbert_order
+
+TILE_BATCH_SIZE = 256
+DEFAULT_PATH = os.path.normpath(f"{__file__}/../../../data/vegetation.tiles")
+
+
+def export_tiles(path=DEFAULT_PATH, level=6):
+    """Render all image tiles from the DB into a single archive file that the API can serve from memory.
+
+    :param path:  archive path
+    :param level: PNG compression level (0-9)
+    """
+
+    log.msg("Export image tiles into a tile archive")
+
+    # Both passes over the tiles see the same snapshot, even if tiles are written in the meantime
+    with db.ENGINE.connect().execution_options(isolation_level="REPEATABLE READ") as conn, conn.begin():
+        # Tiles written by transactions that are still running are not in the snapshot, so the archive is dated to
+        # the start of the oldest running transaction and the API marks all of their tiles as stale
+        created_at = db.get_change_horizon(conn).timestamp()
+        keys = conn.execute(
+            select(ImgTile.z, ImgTile.x, ImgTile.y, ImgTile.h).order_by(ImgTile.z, ImgTile.x, ImgTile.y)
+        ).all()
+        z, x, y, hashes = zip(*keys) if keys else [[]] * 4
+        # Tiles are rendered in the order they are stored in the archive, see `TileArchiveWriter`
+        order = hilbert_order(z, x, y).tolist()
+        lengths = np.zeros(len(order), np.int64)
+        log.info(f"Render {len(order)} tiles", f" (RGBA {ImgTile.__MASK_RGBA__})")
+
+        # The directory at the start of the archive needs the size of every image, so the images are rendered
+        # into a temporary file first
+        progress = tqdm(total=len(order), leave=False, desc="    ↳ Render tiles", unit="tiles")
+        with tempfile.TemporaryFile(dir=os.path.dirname(os.path.abspath(path))) as spool:
+            for i in range(0, len(order), TILE_BATCH_SIZE):
+                batch = order[i : i + TILE_BATCH_SIZE]
+                rows = conn.execute(
+                    select(ImgTile.z, ImgTile.x, ImgTile.y, ImgTile.m).where(
+                        tuple_(ImgTile.z, ImgTile.x, ImgTile.y).in_([(z[j], x[j], y[j]) for j in batch])
+                    )
+                )
+                masks = {(z, x, y): m for z, x, y, m in rows}
+                for j in batch:
+                    d = render_tile(masks[(z[j], x[j], y[j])], level=level)
+                    lengths[j] = len(d)
+                    spool.write(d)
+                progress.update(len(batch))
+            progress.close()
+
+            log.info(f"Write {len(order)} tiles to {path}", f" ({lengths.sum() / 2**20:.1f} MiB)")
+            spool.seek(0)
+            with TileArchiveWriter(path, z, x, y, lengths, hashes, float(created_at)) as writer:
+                for j in order:
+                    writer.write(spool.read(lengths[j]))
+
+    log.info("Tile archive written", f" ({os.path.getsize(path) / 2**20:.1f} MiB)")
+    log.success("Done")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Render the image tiles into a memory-mappable tile archive.")
+    parser.add_argument("--output", default=DEFAULT_PATH, help="archive path (default: data/vegetation.tiles)")
+    parser.add_argument("--level", type=int, default=6, choices=range(10), help="PNG compression level (default: 6)")
+    args = parser.parse_args()
+    export_tiles(args.output, args.level)
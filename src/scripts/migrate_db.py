@@ -0,0 +1,222 @@
+import numpy as np
+
+from PIL import UnidentifiedImageError
+from sqlalchemy import column, select, text, tuple_, update
+from sqlalchemy.orm import Session
+from src import db
+from src.model.img_tile import ImgTile
+from src.model.power_line_segment import PowerLineSegment, simplify_geometry
+from src.util import log
+from src.util.raster import decode_alpha, encode_mask
+
+TILE_BATCH_SIZE = 256
+
+# Idempotent schema changes that bring databases created by older versions (e.g. the DB dump) up to date.
+# Missing tables are created by the session, so only changes to existing tables need to be listed here.
+MIGRATIONS = [
+    (
+        "Track changes of image tiles",
+        "ALTER TABLE img_tile ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now()",
+    ),
+    (
+        "Track changes of power line segments",
+        "ALTER TABLE power_line_segment "
+        "ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now()",
+    ),
+    (
+        "Key image tiles by (z, x, y)",
+        # Older versions never created the key, so duplicates are removed before adding it
+        """
+        DO $$ BEGIN
+            IF NOT EXISTS (
+                SELECT 1 FROM pg_index
+                WHERE indrelid = 'img_tile'::regclass AND indisprimary
+                AND pg_get_indexdef(indexrelid) LIKE '%(z, x, y)'
+            ) THEN
+                DELETE FROM img_tile a USING img_tile b
+                WHERE a.z = b.z AND a.x = b.x AND a.y = b.y AND a.ctid < b.ctid;
+                ALTER TABLE img_tile DROP CONSTRAINT IF EXISTS img_tile_pkey;
+                ALTER TABLE img_tile ADD CONSTRAINT img_tile_pkey PRIMARY KEY (z, x, y);
+            END IF;
+        END $$
+        """,
+    ),
+    (
+        "Key vegetation alerts by (lat, lon)",
+        """
+        DO $$ BEGIN
+            IF NOT EXISTS (SELECT 1 FROM pg_index WHERE indrelid = 'vegetation_alert'::regclass AND indisprimary) THEN
+                DELETE FROM vegetation_alert a USING vegetation_alert b
+                WHERE a.lat = b.lat AND a.lon = b.lon AND a.ctid < b.ctid;
+                ALTER TABLE vegetation_alert ADD CONSTRAINT vegetation_alert_pkey PRIMARY KEY (lat, lon);
+            END IF;
+        END $$
+        """,
+    ),
+    (
+        "Index vegetation alerts by power line segment",
+        "CREATE INDEX IF NOT EXISTS ix_vegetation_alert_pls_id ON vegetation_alert (pls_id)",
+    ),
+    (
+        "Index power line segment bounding boxes",
+        "CREATE INDEX IF NOT EXISTS ix_power_line_segment_bbox ON power_line_segment "
+        "USING gist (box(point(bb_min_lon, bb_min_lat), point(bb_max_lon, bb_max_lat)))",
+    ),
+    (
+        "Notify the API about changed image tiles",
+        # The payload is "z/x/y", see `db.TILE_CHANNEL`
+        """
+        CREATE OR REPLACE FUNCTION notify_img_tile_changed() RETURNS trigger AS $$
+        DECLARE
+            t img_tile := CASE WHEN TG_OP = 'DELETE' THEN OLD ELSE NEW END;
+        BEGIN
+            PERFORM pg_notify('img_tile_changed', t.z || '/' || t.x || '/' || t.y);
+            RETURN NULL;
+        END $$ LANGUAGE plpgsql;
+        DROP TRIGGER IF EXISTS img_tile_changed ON img_tile;
+        CREATE TRIGGER img_tile_changed AFTER INSERT OR UPDATE OR DELETE ON img_tile
+        FOR EACH ROW EXECUTE FUNCTION notify_img_tile_changed();
+        """,
+    ),
+    (
+        "Notify the API about changed power lines and alerts",
+        # The payload is the table name, see `db.VECTOR_CHANNEL`. Notifications are sent once per statement, since
+        # a change invalidates all vector tiles anyway.
+        """
+        CREATE OR REPLACE FUNCTION notify_vector_data_changed() RETURNS trigger AS $$
+        BEGIN
+            PERFORM pg_notify('vector_data_changed', TG_TABLE_NAME);
+            RETURN NULL;
+        END $$ LANGUAGE plpgsql;
+        DROP TRIGGER IF EXISTS vector_data_changed ON power_line_segment;
+        CREATE TRIGGER vector_data_changed AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON power_line_segment
+        FOR EACH STATEMENT EXECUTE FUNCTION notify_vector_data_changed();
+        DROP TRIGGER IF EXISTS vector_data_changed ON vegetation_alert;
+        CREATE TRIGGER vector_data_changed AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON vegetation_alert
+        FOR EACH STATEMENT EXECUTE FUNCTION notify_vector_data_changed();
+        """,
+    ),
+    (
+        "Store simplified power line geometries",
+        "ALTER TABLE power_line_segment ADD COLUMN IF NOT EXISTS geometry_z10 VARCHAR, "
+        "ADD COLUMN IF NOT EXISTS geometry_z12 VARCHAR, ADD COLUMN IF NOT EXISTS geometry_z14 VARCHAR",
+    ),
+    (
+        "Store compact vegetation masks",
+        "ALTER TABLE img_tile ADD COLUMN IF NOT EXISTS m BYTEA",
+    ),
+    (
+        "Store content hashes of image tiles",
+        # The hash of the image is replaced by that of the mask once the images are dropped
+        """
+        DO $$ BEGIN
+            IF EXISTS (SELECT 1 FROM information_schema.columns WHERE table_name = 'img_tile' AND column_name = 'd') THEN
+                ALTER TABLE img_tile ADD COLUMN IF NOT EXISTS h VARCHAR(32) GENERATED ALWAYS AS (md5(d)) STORED;
+            END IF;
+        END $$
+        """,
+    ),
+    (
+        "Log deleted image tiles",
+        # The table itself is created by the session, see `DeletedTile`
+        """
+        CREATE OR REPLACE FUNCTION log_img_tile_deleted() RETURNS trigger AS $$
+        BEGIN
+            INSERT INTO deleted_tile (z, x, y) VALUES (OLD.z, OLD.x, OLD.y)
+            ON CONFLICT (z, x, y) DO UPDATE SET deleted_at = now();
+            RETURN NULL;
+        END $$ LANGUAGE plpgsql;
+        DROP TRIGGER IF EXISTS img_tile_deleted ON img_tile;
+        CREATE TRIGGER img_tile_deleted AFTER DELETE ON img_tile
+        FOR EACH ROW EXECUTE FUNCTION log_img_tile_deleted();
+        """,
+    ),
+]
+
+# Runs once the masks have been recovered from the images, which are rendered by the API from then on. Tiles whose
+# images couldn't be read have no mask and are removed.
+DROP_IMAGES = (
+    "Drop rendered images of image tiles",
+    """
+    DO $$ BEGIN
+        IF EXISTS (SELECT 1 FROM information_schema.columns WHERE table_name = 'img_tile' AND column_name = 'd') THEN
+            DELETE FROM img_tile WHERE m IS NULL;
+            ALTER TABLE img_tile DROP COLUMN IF EXISTS h, DROP COLUMN d;
+            ALTER TABLE img_tile ADD COLUMN h VARCHAR(32) GENERATED ALWAYS AS (md5(m)) STORED;
+            ALTER TABLE img_tile ALTER COLUMN m SET NOT NULL;
+        END IF;
+    END $$
+    """,
+)
+
+
+def simplify_geometries(session: Session) -> int:
+    """Compute the simplified geometries of segments that were stored without them and return their number."""
+
+    segments = session.execute(
+        select(PowerLineSegment.id, PowerLineSegment.geometry, PowerLineSegment.updated_at).where(
+            PowerLineSegment.geometry_z14.is_(None)
+        )
+    ).all()
+    # Keep the change timestamps, since the segments themselves did not change (and need no new alerts)
+    rows = [{"id": id, "updated_at": ts, **simplify_geometry(geometry)} for id, geometry, ts in segments]
+    if rows:
+        session.execute(update(PowerLineSegment), rows)
+
+    return len(rows)
+
+
+def encode_masks(session: Session) -> int:
+    """Recover the masks of image tiles that were stored without them from their alpha plane and return their number."""
+
+    keys = session.execute(select(ImgTile.z, ImgTile.x, ImgTile.y).where(ImgTile.m.is_(None))).all()
+    # The images were rendered with the mask colors, so the mask values are the alpha values scaled back to [0, 255]
+    max_alpha = int(255 * ImgTile.__MASK_RGBA__[3])
+    num_tiles = 0
+    for i in range(0, len(keys), TILE_BATCH_SIZE):
+        batch = [tuple(key) for key in keys[i : i + TILE_BATCH_SIZE]]
+        tiles = session.execute(
+            # The images are no longer part of the model, they are dropped after this step
+            select(ImgTile.z, ImgTile.x, ImgTile.y, column("d"), ImgTile.updated_at).where(
+                tuple_(ImgTile.z, ImgTile.x, ImgTile.y).in_(batch)
+            )
+        )
+        rows = []
+        for z, x, y, d, ts in tiles:
+            try:
+                alpha = decode_alpha(d)
+            except UnidentifiedImageError:
+                continue
+            gray = np.minimum(np.round(alpha * (255 / max_alpha)), 255).astype(np.uint8)
+            # Keep the change timestamps, since the tiles themselves did not change
+            rows.append({"z": z, "x": x, "y": y, "m": encode_mask(gray), "updated_at": ts})
+        if rows:
+            session.execute(update(ImgTile), rows)
+        num_tiles += len(rows)
+
+    return num_tiles
+
+
+def migrate_db():
+    """Apply all schema migrations to the database."""
+
+    log.msg("Migrate DB schema")
+
+    session = db.get_session()
+    for desc, stmt in MIGRATIONS:
+        session.execute(text(stmt))
+        log.info(desc, " ✓")
+    num_segments = simplify_geometries(session)
+    log.info("Simplify power line geometries", f" ({num_segments} segments) ✓")
+    num_tiles = encode_masks(session)
+    log.info("Encode vegetation masks", f" ({num_tiles} tiles) ✓")
+    desc, stmt = DROP_IMAGES
+    session.execute(text(stmt))
+    log.info(desc, " ✓")
+    session.commit()
+
+    log.success("Done")
+
+
+if __name__ == "__main__":
+    migrate_db()
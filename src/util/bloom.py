@@ -0,0 +1,79 @@
+import math
+import numpy as np
+
+from numpy.typing import ArrayLike, NDArray
+from typing import Dict
+
+
+def mix64(keys: NDArray) -> NDArray:
+    """Scramble 64-bit integer keys into well-distributed hashes (the SplitMix64 finalizer)."""
+
+    with np.errstate(over="ignore"):
+        h = keys.astype(np.uint64)
+        h = (h ^ (h >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        h = (h ^ (h >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+        return h ^ (h >> np.uint64(31))
+
+
+class BloomFilter:
+    """Compact probabilistic set of 64-bit integer keys.
+
+    :param capacity: expected number of keys
+    :param fp_rate:  false-positive rate at the expected number of keys
+
+    Membership tests never miss a key that has been added, but report keys that have not been added with
+    a probability of roughly `fp_rate` (which grows once more than `capacity` keys have been added). Keys
+    cannot be removed.
+    """
+
+    num_bits: int
+    num_hashes: int
+    num_keys: int
+
+    def __init__(self, capacity: int, fp_rate=0.01):
+        assert capacity > 0, "Capacity must be positive"
+        assert fp_rate > 0 and fp_rate < 1, "False-positive rate must be within (0, 1)"
+
+        # Optimal size and number of hash functions, see https://en.wikipedia.org/wiki/Bloom_filter
+        self.num_bits = math.ceil(-capacity * math.log(fp_rate) / math.log(2) ** 2 / 8) * 8
+        self.num_hashes = max(1, round(self.num_bits / capacity * math.log(2)))
+        self.num_keys = 0
+        self.bits = np.zeros(self.num_bits // 8, np.uint8)
+
+    def __contains__(self, key: int) -> bool:
+        return bool(self.contains(np.array([key], np.uint64))[0])
+
+    @property
+    def nbytes(self) -> int:
+        return self.bits.nbytes
+
+    @property
+    def fp_rate(self) -> float:
+        """Expected false-positive rate for the number of keys added so far."""
+
+        return (1 - math.exp(-self.num_hashes * self.num_keys / self.num_bits)) ** self.num_hashes
+
+    def stats(self) -> Dict[str, float]:
+        return {"keys": self.num_keys, "bytes": self.nbytes, "fp_rate": self.fp_rate}
+
+    def positions(self, keys: ArrayLike) -> NDArray:
+        """Return the bit positions of the keys as an array of shape (number of keys, number of hashes)."""
+
+        # Double hashing with two halves of a 64-bit hash, see Kirsch & Mitzenmacher (2006)
+        h = mix64(np.asarray(keys, np.uint64).ravel())
+        h1 = (h >> np.uint64(32)).astype(np.int64)
+        h2 = (h & np.uint64(0xFFFFFFFF)).astype(np.int64) | 1
+        return (h1[:, None] + np.arange(self.num_hashes) * h2[:, None]) % self.num_bits
+
+    def add(self, keys: ArrayLike):
+        """Add one or more keys to the set."""
+
+        pos = self.positions(keys)
+        np.bitwise_or.at(self.bits, pos >> 3, (1 << (pos & 7)).astype(np.uint8))
+        self.num_keys += len(pos)
+
+    def contains(self, keys: ArrayLike) -> NDArray:
+        """Test several keys at once and return a boolean array."""
+
+        pos = self.positions(keys)
+        return np.all(self.bits[pos >> 3] & (1 << (pos & 7)).astype(np.uint8), axis=1)
@@ -0,0 +1,104 @@
+import threading
+
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+
+class ByteCache:
+    """In-memory LRU cache for binary values with a total size budget in bytes.
+
+    :param max_bytes: maximum total size of the cached values (0 disables the cache)
+
+    When adding a value exceeds the budget, the least recently used values are evicted. Values larger than
+    the whole budget are not cached at all. Other values can be cached as well if their size is passed to `put`.
+    """
+
+    max_bytes: int
+    num_bytes: int
+    hits: int
+    misses: int
+    evictions: int
+    version: int
+
+    def __init__(self, max_bytes: int):
+        assert max_bytes >= 0, "Byte budget must not be negative"
+
+        self.max_bytes = max_bytes
+        # Values with their sizes
+        self.entries: OrderedDict[Hashable, Tuple[Any, int]] = OrderedDict()
+        self.lock = threading.Lock()
+        self.num_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # Incremented by every invalidation, so values read before an invalidation can be rejected
+        self.version = 0
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self.entries
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Return the cached value for a key (marking it as recently used) or None."""
+
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key: Hashable, value: Any, version: Optional[int] = None, size: Optional[int] = None):
+        """Cache a value, evicting the least recently used ones if the byte budget is exceeded.
+
+        Pass the cache `version` from before the value was read to skip caching it if an invalidation
+        happened in the meantime (since the value might be outdated). The size defaults to `len(value)`.
+        """
+
+        size = len(value) if size is None else size
+        with self.lock:
+            if version is not None and version != self.version:
+                return
+            self.discard(key)
+            if size > self.max_bytes:
+                return
+            while self.num_bytes + size > self.max_bytes:
+                _, (_, evicted_size) = self.entries.popitem(last=False)
+                self.num_bytes -= evicted_size
+                self.evictions += 1
+            self.entries[key] = (value, size)
+            self.num_bytes += size
+
+    def invalidate(self, key: Hashable):
+        """Remove a key from the cache, e.g. because the underlying data changed."""
+
+        with self.lock:
+            self.discard(key)
+            self.version += 1
+
+    def clear(self):
+        with self.lock:
+            self.version += 1
+            self.entries.clear()
+            self.num_bytes = 0
+
+    def discard(self, key: Hashable):
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            self.num_bytes -= entry[1]
+
+    def stats(self) -> Dict[str, int]:
+        """Return the cache counters."""
+
+        return {
+            "entries": len(self.entries),
+            "bytes": self.num_bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
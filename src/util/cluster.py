@@ -0,0 +1,69 @@
+import numpy as np
+
+from numpy.typing import ArrayLike, NDArray
+from typing import Dict
+from src.util.geo import LatLon, lat_lon_to_mercator_batch
+
+
+class PointIndex:
+    """In-memory index of weighted lat/lon points for bounding box queries and grid clustering.
+
+    :param lat:   latitudes of the points
+    :param lon:   longitudes of the points
+    :param value: value per point (e.g. a risk level), aggregated as maximum per cluster
+
+    The points are sorted by longitude, so a bounding box query is a binary search followed by a latitude filter
+    on the points within the longitude range.
+    """
+
+    def __init__(self, lat: ArrayLike, lon: ArrayLike, value: ArrayLike):
+        lat, lon, value = [np.asarray(v) for v in (lat, lon, value)]
+        assert len(lat) == len(lon) == len(value), "Number of latitudes, longitudes and values must match"
+
+        order = np.argsort(lon, kind="stable")
+        self.lat = lat[order].astype(np.float64)
+        self.lon = lon[order].astype(np.float64)
+        self.value = value[order]
+
+    def __len__(self) -> int:
+        return len(self.lat)
+
+    @property
+    def nbytes(self) -> int:
+        return self.lat.nbytes + self.lon.nbytes + self.value.nbytes
+
+    def query(self, mn: LatLon, mx: LatLon) -> NDArray:
+        """Return the indices of the points within a bounding box (bounds included)."""
+
+        i0 = np.searchsorted(self.lon, mn.lon, side="left")
+        i1 = np.searchsorted(self.lon, mx.lon, side="right")
+        lat = self.lat[i0:i1]
+        return i0 + np.flatnonzero((lat >= mn.lat) & (lat <= mx.lat))
+
+    def cluster(self, mn: LatLon, mx: LatLon, z: int, cell_px=64) -> Dict[str, NDArray]:
+        """Aggregate the points within a bounding box on a grid of web Mercator cells.
+
+        :param mn:      southwest corner of the bounding box
+        :param mx:      northeast corner of the bounding box
+        :param z:       zoom level that determines the grid
+        :param cell_px: cell size in pixels at that zoom level (with 256x256 pixel tiles)
+
+        Returns arrays with the centroid (`lat`, `lon`), the number of points (`count`) and the maximum value
+        (`max_value`) of every non-empty cell, ordered by cell.
+        """
+
+        assert cell_px > 0, "Cell size must be positive"
+
+        idx = self.query(mn, mx)
+        lat, lon, value = self.lat[idx], self.lon[idx], self.value[idx]
+        cx, cy = np.floor(lat_lon_to_mercator_batch(lat, lon, z) / cell_px).astype(np.int64).T
+        _, inverse, count = np.unique(cx << 32 | cy, return_inverse=True, return_counts=True)
+        max_value = np.full(len(count), np.iinfo(np.int64).min)
+        np.maximum.at(max_value, inverse, value.astype(np.int64))
+
+        return {
+            "lat": np.bincount(inverse, lat, len(count)) / np.maximum(count, 1),
+            "lon": np.bincount(inverse, lon, len(count)) / np.maximum(count, 1),
+            "count": count,
+            "max_value": max_value,
+        }
@@ -0,0 +1,177 @@
+import asyncio
+import httpx
+import random
+import ssl
+import time
+
+from typing import Awaitable, Callable, Generic, Iterable, List, NamedTuple, Optional, Tuple, TypeVar
+
+K = TypeVar("K")
+
+# Status codes that indicate a temporary problem on the server side
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class TokenBucket:
+    """Rate limiter that allows `rate` acquisitions per second on average and bursts of up to `capacity`."""
+
+    rate: float
+    capacity: float
+    tokens: float
+
+    def __init__(self, rate: float, capacity: Optional[float] = None, clock: Callable[[], float] = time.monotonic):
+        assert rate > 0, "Rate must be positive"
+        assert capacity is None or capacity >= 1, "Capacity must be at least 1"
+
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self.tokens = self.capacity
+        self.clock = clock
+        self.last = clock()
+        self.lock = asyncio.Lock()
+
+    def refill(self):
+        now = self.clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self.last) * self.rate)
+        self.last = now
+
+    async def acquire(self):
+        """Wait until a token is available and take it."""
+
+        async with self.lock:
+            self.refill()
+            while self.tokens < 1:
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+                self.refill()
+            self.tokens -= 1
+
+
+class DownloadFailure(NamedTuple, Generic[K]):
+    key: K
+    url: str
+    status: Optional[int]
+    error: str
+    attempts: int
+
+
+class TileDownloader(Generic[K]):
+    """Download tiles concurrently over a pooled keep-alive HTTP client.
+
+    :param concurrency: maximum number of requests in flight (and pooled connections)
+    :param rate:        maximum number of requests per second (None for no limit)
+    :param burst:       maximum number of requests sent at once before the rate limit applies
+    :param max_retries: how often to retry a request after a 429/5xx response or a connection/SSL error
+    :param backoff:     base delay in seconds, doubled with every retry (plus jitter)
+    :param timeout:     timeout per request in seconds
+
+    Tiles that cannot be downloaded are collected in `failures` instead of raising errors.
+    """
+
+    concurrency: int
+    rate: Optional[float]
+    burst: Optional[float]
+    max_retries: int
+    backoff: float
+    timeout: float
+    failures: List[DownloadFailure[K]]
+    num_requests: int
+    num_retries: int
+    num_downloaded: int
+    num_bytes: int
+
+    def __init__(
+        self,
+        concurrency=8,
+        rate: Optional[float] = None,
+        burst: Optional[float] = None,
+        max_retries=5,
+        backoff=0.5,
+        timeout=30.0,
+    ):
+        assert concurrency > 0, "Concurrency must be positive"
+        assert max_retries >= 0, "Number of retries must not be negative"
+
+        self.concurrency = concurrency
+        self.rate = rate
+        self.burst = burst
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.failures = []
+        self.num_requests = 0
+        self.num_retries = 0
+        self.num_downloaded = 0
+        self.num_bytes = 0
+
+    def get_delay(self, attempt: int, res: Optional[httpx.Response] = None) -> float:
+        """Return how long to wait before the next attempt, honoring a numeric Retry-After header."""
+
+        retry_after = res.headers.get("Retry-After", "") if res is not None else ""
+        if retry_after.isdigit():
+            return float(retry_after)
+        return self.backoff * (2**attempt) * random.uniform(0.5, 1.0)
+
+    async def fetch(
+        self, client: httpx.AsyncClient, bucket: Optional[TokenBucket], key: K, url: str
+    ) -> Optional[bytes]:
+        """Fetch a single tile with retries and return its content, or record a failure and return None."""
+
+        for attempt in range(self.max_retries + 1):
+            if bucket:
+                await bucket.acquire()
+            self.num_requests += 1
+            res: Optional[httpx.Response] = None
+            try:
+                res = await client.get(url)
+                if res.status_code == 200:
+                    self.num_downloaded += 1
+                    self.num_bytes += len(res.content)
+                    return res.content
+                status, error = res.status_code, res.reason_phrase
+                if status not in RETRY_STATUS_CODES:
+                    break
+            except (httpx.TransportError, ssl.SSLError) as e:
+                status, error = None, f"{type(e).__name__}: {e}"
+            if attempt < self.max_retries:
+                self.num_retries += 1
+                await asyncio.sleep(self.get_delay(attempt, res))
+
+        self.failures.append(DownloadFailure(key, url, status, error, attempt + 1))
+        return None
+
+    async def download(
+        self,
+        tiles: Iterable[Tuple[K, str]],
+        on_tile: Callable[[K, bytes], Optional[Awaitable[None]]],
+        client: Optional[httpx.AsyncClient] = None,
+    ):
+        """Download (key, url) pairs and call `on_tile(key, content)` for every tile as soon as it arrives.
+
+        The callback may be a coroutine function. Pass a `client` to reuse an existing connection pool.
+        """
+
+        queue: asyncio.Queue[Tuple[K, str]] = asyncio.Queue()
+        for tile in tiles:
+            queue.put_nowait(tile)
+        bucket = TokenBucket(self.rate, self.burst) if self.rate else None
+
+        async def work(client: httpx.AsyncClient):
+            while not queue.empty():
+                key, url = queue.get_nowait()
+                content = await self.fetch(client, bucket, key, url)
+                if content is not None:
+                    res = on_tile(key, content)
+                    if asyncio.iscoroutine(res):
+                        await res
+
+        if client is None:
+            limits = httpx.Limits(max_connections=self.concurrency, max_keepalive_connections=self.concurrency)
+            async with httpx.AsyncClient(limits=limits, timeout=self.timeout) as client:
+                await asyncio.gather(*[work(client) for _ in range(self.concurrency)])
+        else:
+            await asyncio.gather(*[work(client) for _ in range(self.concurrency)])
+
+    def run(self, tiles: Iterable[Tuple[K, str]], on_tile: Callable[[K, bytes], Optional[Awaitable[None]]]):
+        """Synchronous wrapper around `download`."""
+
+        asyncio.run(self.download(tiles, on_tile))
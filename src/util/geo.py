@@ -1,6 +1,9 @@
 import math
+import numpy as np
+
 from collections import namedtuple
-from typing import List
+from numpy.typing import ArrayLike, NDArray
+from typing import Iterable, List, Set, Tuple
 
 TileCoords = namedtuple("TileCoords", "x y")
 Pixel = namedtuple("Pixel", "x y")
@@ -88,6 +91,339 @@ def pixel_coords_to_lat_lon(px: int, py: int, z: int, ts=256) -> LatLon:
     return LatLon(lat, lon)
 
 
+def lat_lon_to_mercator_batch(lat: ArrayLike, lon: ArrayLike, z: int, ts=256) -> NDArray:
+    """Convert arrays of lat/long coordinates to continuous global web Mercator pixel coordinates.
+
+    :param lat: latitude values within [-85.05, 85.05]
+    :param lon: longitude values within [-180.0, 180.0]
+    :param z:   zoom level / LOD within [0, 17]
+    :param ts:  tile size in pixels within [1, 4096] (1 yields continuous tile coordinates)
+
+    Returns an (n x 2) float array of [x, y] coordinates. They are calculated with the same formula as in the
+    scalar functions, but NumPy's vectorized math may differ from the `math` module in the last digit.
+    """
+
+    lat = np.asarray(lat, dtype=np.float64)
+    lon = np.asarray(lon, dtype=np.float64)
+    assert np.all((lat >= -LAT_MAX) & (lat <= LAT_MAX)), f"Latitude must be within [-{LAT_MAX}, {LAT_MAX}]"
+    assert np.all((lon >= -180.0) & (lon <= 180.0)), "Longitude must be within [-180, 180]"
+    assert z >= 0 and z <= 17, "Zoom level must be within [0, 17]"
+    assert ts > 0 and ts <= 4096, "Tile size must within [1, 4096]"
+
+    # See https://en.wikipedia.org/wiki/Web_Mercator_projection
+    x = (2**z) * (180 + lon) / 360 * ts
+    y = (2**z) * (180 - np.degrees(np.log(np.tan(math.pi / 4 + np.radians(lat) / 2)))) / 360 * ts
+
+    return np.stack([x, y], axis=-1)
+
+
+def lat_lon_to_tile_coords_batch(lat: ArrayLike, lon: ArrayLike, z: int) -> NDArray:
+    """Convert arrays of lat/long coordinates to web Mercator tile coordinates at a given zoom level.
+
+    Returns an (n x 2) integer array of [x, y] tile coordinates.
+    """
+
+    return np.floor(lat_lon_to_mercator_batch(lat, lon, z, 1)).astype(np.int64)
+
+
+def lat_lon_to_pixel_coords_batch(lat: ArrayLike, lon: ArrayLike, z: int, ts=256) -> NDArray:
+    """Convert arrays of lat/long coordinates to global web Mercator pixel coordinates at a given zoom level.
+
+    Returns an (n x 2) integer array of [x, y] pixel coordinates.
+    """
+
+    return np.floor(lat_lon_to_mercator_batch(lat, lon, z, ts)).astype(np.int64)
+
+
+def tile_coords_to_lat_lon_batch(x: ArrayLike, y: ArrayLike, z: int, ox=0.5, oy=0.5) -> NDArray:
+    """Return the lat/lon coordinates of arrays of x/y/z web Mercator tiles (at their center by default).
+
+    Returns an (n x 2) float array of [lat, lon] coordinates.
+    """
+
+    x = np.asarray(x)
+    y = np.asarray(y)
+    assert np.all((x >= 0) & (x < (2**z))), f"x must be within [0, {(2**z) - 1}]"
+    assert np.all((y >= 0) & (y < (2**z))), f"y must be within [0, {(2**z) - 1}]"
+    assert z >= 0 and z <= 17, "Zoom level must be within [0, 17]"
+    assert ox >= 0 and ox <= 1, "x offset must be within [0, 1]"
+    assert oy >= 0 and oy <= 1, "y offset must be within [0, 1]"
+
+    lon = (x + ox) * 360 / (2**z) - 180
+    lat = 90 - np.degrees(2 * np.arctan(np.power(math.e, 2 * math.pi / (2**z) * (y + oy) - math.pi)))
+
+    return np.stack([lat, lon], axis=-1)
+
+
+def pixel_coords_to_lat_lon_batch(px: ArrayLike, py: ArrayLike, z: int, ts=256) -> NDArray:
+    """Convert arrays of global web Mercator pixel coordinates to lat/long coordinates.
+
+    Returns an (n x 2) float array of [lat, lon] coordinates.
+    """
+
+    px = np.asarray(px)
+    py = np.asarray(py)
+    pMax = (2**z) * ts
+    assert np.all((px >= 0) & (px < pMax)), f"px must be within [0, {pMax - 1}]"
+    assert np.all((py >= 0) & (py < pMax)), f"py must be within [0, {pMax - 1}]"
+    assert z >= 0 and z <= 17, "Zoom level must be within [0, 17]"
+    assert ts > 0 and ts <= 4096, "Tile size must within [1, 4096]"
+
+    lon = px / ts * 360 / (2**z) - 180
+    lat = 90 - np.degrees(2 * np.arctan(np.power(math.e, 2 * math.pi / (2**z) * py / ts - math.pi)))
+
+    return np.stack([lat, lon], axis=-1)
+
+
+def resample_polylines(pixels: ArrayLike, lengths: ArrayLike, spacing: float) -> Tuple[NDArray, NDArray]:
+    """Sample pixel positions along a batch of polylines so that neighboring samples are at most `spacing` apart.
+
+    :param pixels:  (n x 2) array with the [x, y] pixel coordinates of all polyline nodes, one polyline after another
+    :param lengths: number of nodes of each polyline
+    :param spacing: maximum distance between neighboring samples in pixels
+
+    Each polyline is sampled at its first node and at evenly spaced points along each of its edges, ending
+    exactly at the edge's end node. Returns the polyline index and the [x, y] pixel coordinates of each sample.
+    """
+
+    pixels = np.reshape(np.asarray(pixels, dtype=np.int64), (-1, 2))
+    lengths = np.asarray(lengths, dtype=np.int64)
+    assert np.sum(lengths) == len(pixels), "Polyline lengths must add up to the number of nodes"
+    assert spacing > 0, "Spacing must be positive"
+
+    line = np.repeat(np.arange(len(lengths)), lengths)
+    starts = (np.cumsum(lengths) - lengths)[lengths > 0]
+
+    # Edges connect consecutive nodes of the same polyline
+    p0 = pixels[:-1]
+    d = (pixels[1:] - p0).astype(np.float64)
+    l = np.sqrt(d[:, 0] * d[:, 0] + d[:, 1] * d[:, 1])
+    steps = np.where(line[:-1] == line[1:], np.ceil(l / spacing), 0).astype(np.int64)
+
+    # Step k of an edge with n steps is at k/n of the way from its start to its end node
+    edge = np.repeat(np.arange(len(steps)), steps)
+    k = np.arange(len(edge)) - np.repeat(np.cumsum(steps) - steps, steps) + 1
+    n = steps[edge]
+    samples = np.floor(p0[edge] + d[edge] * k[:, np.newaxis] / n[:, np.newaxis]).astype(np.int64)
+
+    # Merge the first nodes and edge samples, ordered by node index and step
+    idx = np.concatenate([starts, edge])
+    step = np.concatenate([np.zeros(len(starts), dtype=np.int64), k])
+    order = np.lexsort((step, idx))
+
+    return line[idx[order]], np.concatenate([pixels[starts], samples])[order]
+
+
+def distance_to_segment(x: float, y: float, x0: float, y0: float, x1: float, y1: float) -> float:
+    """Return the Euclidean distance of the point (x, y) to the line segment from (x0, y0) to (x1, y1)."""
+
+    dx, dy = x1 - x0, y1 - y0
+    ls = dx * dx + dy * dy
+    t = 0.0 if ls == 0 else min(max(((x - x0) * dx + (y - y0) * dy) / ls, 0.0), 1.0)
+
+    return math.hypot(x - x0 - t * dx, y - y0 - t * dy)
+
+
+def simplify_polyline(points: ArrayLike, tolerance: float) -> NDArray:
+    """Simplify a polyline with the Douglas-Peucker algorithm and return the indices of the points to keep.
+
+    :param points:    (n x 2) array of polyline nodes
+    :param tolerance: maximum distance of dropped nodes to the simplified polyline
+
+    The first and last node are always kept. Distances are measured to the segments (not the infinite lines)
+    of the simplified polyline, so closed polylines are simplified correctly as well.
+    """
+
+    assert tolerance >= 0, "Tolerance must not be negative"
+
+    pts = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    if len(pts) == 0:
+        return np.zeros(0, dtype=np.int64)
+    keep = np.zeros(len(pts), dtype=bool)
+    keep[[0, -1]] = True
+    ranges = [(0, len(pts) - 1)]
+    while ranges:
+        i, j = ranges.pop()
+        if j - i < 2:
+            continue
+        p0, d = pts[i], pts[j] - pts[i]
+        ls = d @ d
+        rel = pts[i + 1 : j] - p0
+        t = np.zeros(len(rel)) if ls == 0 else np.clip(rel @ d / ls, 0.0, 1.0)
+        dist = np.hypot(*(rel - t[:, None] * d).T)
+        k = int(np.argmax(dist))
+        if dist[k] > tolerance:
+            keep[i + 1 + k] = True
+            ranges += [(i, i + 1 + k), (i + 1 + k, j)]
+
+    return np.flatnonzero(keep)
+
+
+def supercover_tiles(x0: float, y0: float, x1: float, y1: float, buffer=0.0) -> Set[TileCoords]:
+    """Return the coordinates of all tiles that a line segment in continuous tile coordinates touches.
+
+    :param x0, y0: start of the segment, e.g. from `lat_lon_to_mercator_batch(lat, lon, z, 1)`
+    :param x1, y1: end of the segment
+    :param buffer: also include tiles within this distance of the segment (in tiles)
+
+    The tiles are enumerated with an Amanatides-Woo grid traversal. When the segment passes exactly through a
+    tile corner, both tiles next to the corner are included as well (supercover).
+    """
+
+    assert buffer >= 0, "Buffer must not be negative"
+
+    tx, ty = math.floor(x0), math.floor(y0)
+    nx, ny = abs(math.floor(x1) - tx), abs(math.floor(y1) - ty)
+    dx, dy = x1 - x0, y1 - y0
+    sx, sy = (1 if dx > 0 else -1), (1 if dy > 0 else -1)
+    # Parametric distance between vertical and horizontal tile borders, and to the first one of each
+    tdx = abs(1 / dx) if dx != 0 else math.inf
+    tdy = abs(1 / dy) if dy != 0 else math.inf
+    tmx = ((tx + 1 - x0) if dx > 0 else (x0 - tx)) * tdx if dx != 0 else math.inf
+    tmy = ((ty + 1 - y0) if dy > 0 else (y0 - ty)) * tdy if dy != 0 else math.inf
+
+    tiles = {TileCoords(tx, ty)}
+    # Counting the remaining steps per axis guarantees to end in the last tile despite rounding errors
+    while nx > 0 or ny > 0:
+        if ny == 0 or (nx > 0 and tmx < tmy):
+            tx, tmx, nx = tx + sx, tmx + tdx, nx - 1
+        elif nx == 0 or tmy < tmx:
+            ty, tmy, ny = ty + sy, tmy + tdy, ny - 1
+        else:
+            tiles.update([TileCoords(tx + sx, ty), TileCoords(tx, ty + sy)])
+            tx, tmx, nx = tx + sx, tmx + tdx, nx - 1
+            ty, tmy, ny = ty + sy, tmy + tdy, ny - 1
+        tiles.add(TileCoords(tx, ty))
+
+    if buffer == 0:
+        return tiles
+
+    # Dilate by checking the tiles around the traversed ones. A tile that the segment does not touch is within
+    # the buffer if one of the segment ends is close to the tile or one of the tile corners is close to the segment.
+    r = math.ceil(buffer)
+    buffered = set(tiles)
+    for tx, ty in tiles:
+        for x in range(tx - r, tx + r + 1):
+            for y in range(ty - r, ty + r + 1):
+                if TileCoords(x, y) in buffered:
+                    continue
+                ends = [
+                    math.hypot(px - min(max(px, x), x + 1), py - min(max(py, y), y + 1))
+                    for px, py in [(x0, y0), (x1, y1)]
+                ]
+                corners = [distance_to_segment(cx, cy, x0, y0, x1, y1) for cx in [x, x + 1] for cy in [y, y + 1]]
+                if min(ends + corners) <= buffer:
+                    buffered.add(TileCoords(x, y))
+
+    return buffered
+
+
+def polyline_tile_coords(lat: ArrayLike, lon: ArrayLike, z: int, buffer_px=0.0, ts=256) -> Set[TileCoords]:
+    """Return the coordinates of all tiles at a given zoom level that a polyline with lat/lon nodes touches.
+
+    :param lat:       latitudes of the polyline nodes
+    :param lon:       longitudes of the polyline nodes
+    :param z:         zoom level / LOD within [0, 17]
+    :param buffer_px: also include tiles within this distance of the polyline (in pixels)
+    :param ts:        tile size in pixels
+    """
+
+    nodes = lat_lon_to_mercator_batch(lat, lon, z, 1).tolist()
+    if len(nodes) == 1:
+        nodes.append(nodes[0])
+
+    tiles: Set[TileCoords] = set()
+    for (x0, y0), (x1, y1) in zip(nodes[:-1], nodes[1:]):
+        tiles.update(supercover_tiles(x0, y0, x1, y1, buffer_px / ts))
+
+    return tiles
+
+
+def clip_polyline(points: ArrayLike, x0: float, y0: float, x1: float, y1: float) -> List[NDArray]:
+    """Clip a polyline to the rectangle [x0, x1] x [y0, y1] and return the parts inside as (n x 2) arrays.
+
+    Every segment is clipped with the Liang-Barsky algorithm. Consecutive segments that stay inside the
+    rectangle are joined, so a polyline that leaves and re-enters the rectangle yields several parts.
+    """
+
+    parts: List[NDArray] = []
+    part: List[Tuple[float, float]] = []
+    pts = np.asarray(points, dtype=np.float64).reshape(-1, 2).tolist()
+    for (ax, ay), (bx, by) in zip(pts[:-1], pts[1:]):
+        dx, dy = bx - ax, by - ay
+        t0, t1 = 0.0, 1.0
+        for p, q in ((-dx, ax - x0), (dx, x1 - ax), (-dy, ay - y0), (dy, y1 - ay)):
+            if p == 0:
+                if q < 0:
+                    t0, t1 = 1.0, 0.0
+            elif p < 0:
+                t0 = max(t0, q / p)
+            else:
+                t1 = min(t1, q / p)
+        if t0 > t1:
+            continue
+        # A part continues as long as the previous segment ended inside the rectangle
+        if not part:
+            part.append((ax + t0 * dx, ay + t0 * dy))
+        part.append((ax + t1 * dx, ay + t1 * dy))
+        if t1 < 1:
+            parts.append(np.array(part))
+            part = []
+    if part:
+        parts.append(np.array(part))
+
+    return parts
+
+
+def parent_tile_coords(coords: Iterable[TileCoords]) -> Set[TileCoords]:
+    """Return the coordinates of the tiles one zoom level up that contain the given tiles."""
+
+    return set([TileCoords(x // 2, y // 2) for x, y in coords])
+
+
+def tile_keys(z: ArrayLike, x: ArrayLike, y: ArrayLike) -> NDArray:
+    """Pack tile coordinates into unique 64-bit integer keys (5 bits for z, 29 bits each for x and y)."""
+
+    z, x, y = [np.asarray(v, np.uint64) for v in (z, x, y)]
+    assert np.all(z < 30), "Zoom level must be within [0, 29]"
+
+    return (z << np.uint64(58)) | (x << np.uint64(29)) | y
+
+
+def tile_keys_to_coords(keys: ArrayLike) -> Tuple[NDArray, NDArray, NDArray]:
+    """Unpack keys created with `tile_keys` into the zoom levels, x and y coordinates of the tiles."""
+
+    keys = np.asarray(keys, np.uint64)
+    mask = np.uint64(2**29 - 1)
+    z = keys >> np.uint64(58)
+    x = (keys >> np.uint64(29)) & mask
+    y = keys & mask
+
+    return z.astype(np.int64), x.astype(np.int64), y.astype(np.int64)
+
+
+def hilbert_index(z: int, x: ArrayLike, y: ArrayLike) -> NDArray:
+    """Return the positions of tiles along the Hilbert curve that fills the (2^z x 2^z) tile grid of a zoom level.
+
+    Consecutive positions are adjacent tiles, so tiles that are close on the map tend to be close in Hilbert order.
+    """
+
+    assert 0 <= z < 30, "Zoom level must be within [0, 29]"
+
+    x, y = np.asarray(x, np.int64), np.asarray(y, np.int64)
+    d = np.zeros(np.broadcast(x, y).shape, np.int64)
+    for b in range(z - 1, -1, -1):
+        rx, ry = (x >> b) & 1, (y >> b) & 1
+        d += ((3 * rx) ^ ry) << (2 * b)
+        # Rotate the quadrant, i.e. mirror the lower bits (if rx == 1 and ry == 0) and swap x and y (if ry == 0)
+        mirror = ((1 << b) - 1) * (rx & (ry ^ 1))
+        x, y = x ^ mirror, y ^ mirror
+        swap = (x ^ y) * (ry ^ 1)
+        x, y = x ^ swap, y ^ swap
+
+    return d
+
+
 def pixels_in_circle(r: int, ox=0, oy=0) -> List[Pixel]:
     """Return pixel coordinates that fall into a circle with radius `r`."""
 
@@ -0,0 +1,196 @@
+import multiprocessing as mp
+import numpy as np
+import queue
+import threading
+
+from multiprocessing.shared_memory import SharedMemory
+from numpy.typing import NDArray
+from typing import Any, Callable, List, Optional, Tuple
+
+# Workers are restarted while the pool's queue threads are running, which is not safe to fork from
+DEFAULT_CONTEXT = "forkserver" if "forkserver" in mp.get_all_start_methods() else None
+
+# Result placement in shared memory: (shape, dtype, byte offset)
+Placement = Tuple[Tuple[int, ...], str, int]
+
+
+def serve(
+    load: Callable[[], Any],
+    predict: Callable[[Any, Any], NDArray],
+    shm_name: str,
+    tasks: mp.Queue,
+    results: mp.Queue,
+):
+    """Worker process loop: load the model once, then run batches of predictions until a None task arrives.
+
+    Predictions are written one after another into the worker's shared memory block. Only their placement is
+    sent back, unless a batch does not fit into the block, in which case the remaining arrays are pickled.
+    """
+
+    shm = SharedMemory(shm_name)
+    try:
+        model = load()
+        results.put(("ready", None))
+        while (batch := tasks.get()) is not None:
+            try:
+                offset = 0
+                out: List[Placement | NDArray] = []
+                for input in batch:
+                    arr = np.ascontiguousarray(predict(model, input))
+                    if offset + arr.nbytes <= shm.size:
+                        np.ndarray(arr.shape, arr.dtype, shm.buf, offset)[...] = arr
+                        out.append((arr.shape, arr.dtype.str, offset))
+                        offset += arr.nbytes
+                    else:
+                        out.append(arr)
+                results.put(("ok", out))
+            except Exception as e:
+                results.put(("error", f"{type(e).__name__}: {e}"))
+    except Exception as e:
+        results.put(("error", f"{type(e).__name__}: {e}"))
+    finally:
+        shm.close()
+
+
+class ModelPool:
+    """Pool of long-lived worker processes that each load a model once and then run predictions on it.
+
+    :param load:         function that loads the model (called once in every worker)
+    :param predict:      function that runs the model on a single input and returns a NumPy array
+    :param workers:      number of worker processes (default: number of CPUs)
+    :param buffer_bytes: size of the shared memory block per worker for returning predictions
+    :param context:      multiprocessing start method (default: forkserver where available)
+
+    `predict` sends a batch of inputs to an idle worker and can be called from several threads at once. The
+    resulting arrays are returned through shared memory instead of being pickled. Both functions must be
+    picklable, i.e. defined at module level.
+
+    Workers that die (e.g. killed for running out of memory) fail the batch they were working on and are
+    restarted. A worker that cannot load the model again is dropped, once no workers are left, `predict` raises.
+    """
+
+    workers: int
+    buffer_bytes: int
+
+    def __init__(
+        self,
+        load: Callable[[], Any],
+        predict: Callable[[Any, Any], NDArray],
+        workers: Optional[int] = None,
+        buffer_bytes=16 * 256 * 256,
+        context: Optional[str] = None,
+    ):
+        assert workers is None or workers > 0, "Number of workers must be positive"
+        assert buffer_bytes > 0, "Buffer size must be positive"
+
+        self.ctx = mp.get_context(context or DEFAULT_CONTEXT)
+        self.load = load
+        self.predict_fn = predict
+        self.workers = workers or mp.cpu_count()
+        self.buffer_bytes = buffer_bytes
+        self.buffers: List[SharedMemory] = []
+        self.tasks: List[mp.Queue] = []
+        self.results: List[mp.Queue] = []
+        self.processes: List[mp.Process] = []
+        # Indices of idle workers, None once all workers have been dropped
+        self.idle: queue.Queue[Optional[int]] = queue.Queue()
+        self.num_live = self.workers
+        self.lock = threading.Lock()
+
+        for i in range(self.workers):
+            self.buffers.append(SharedMemory(create=True, size=buffer_bytes))
+            self.tasks.append(None)
+            self.results.append(None)
+            self.processes.append(None)
+            self.start_worker(i)
+
+        # Wait until every worker has loaded its model
+        for i in range(self.workers):
+            status, error = self.receive(i)
+            if status != "ready":
+                self.close()
+                raise RuntimeError(f"Worker {i} failed to load the model ({error})")
+            self.idle.put(i)
+
+    def start_worker(self, i: int):
+        """Start the process of a worker (with new queues, since a dead process may leave its queues broken)."""
+
+        self.tasks[i] = self.ctx.Queue()
+        self.results[i] = self.ctx.Queue()
+        args = (self.load, self.predict_fn, self.buffers[i].name, self.tasks[i], self.results[i])
+        self.processes[i] = self.ctx.Process(target=serve, args=args, daemon=True)
+        self.processes[i].start()
+
+    def restart_worker(self, i: int) -> bool:
+        """Replace a dead worker process and return whether the new one loaded the model (if not, it is dropped)."""
+
+        self.processes[i].join()
+        # Batches that were sent to the dead process must not block the interpreter from exiting
+        self.tasks[i].cancel_join_thread()
+        self.start_worker(i)
+        status, _ = self.receive(i)
+        if status == "ready":
+            return True
+
+        with self.lock:
+            self.num_live -= 1
+            if self.num_live == 0:
+                # Wake up the callers waiting for an idle worker
+                self.idle.put(None)
+        return False
+
+    def receive(self, i: int) -> Tuple[str, Any]:
+        """Wait for the next message of a worker, or return an "exit" status if the worker process died."""
+
+        while True:
+            try:
+                return self.results[i].get(timeout=1)
+            except queue.Empty:
+                if not self.processes[i].is_alive():
+                    return "exit", f"process exited with code {self.processes[i].exitcode}"
+
+    def predict(self, inputs: List[Any]) -> List[NDArray]:
+        """Run the model on a batch of inputs in one of the workers and return the predictions in order."""
+
+        if not inputs:
+            return []
+
+        i = self.idle.get()
+        if i is None:
+            self.idle.put(None)
+            raise RuntimeError("No workers left, all of them died")
+
+        live = True
+        try:
+            self.tasks[i].put(list(inputs))
+            status, out = self.receive(i)
+            if status == "exit":
+                live = self.restart_worker(i)
+            if status != "ok":
+                raise RuntimeError(f"Prediction failed in worker {i} ({out})")
+            # Copy the arrays out of the shared memory block before the worker can reuse it
+            buf = self.buffers[i].buf
+            return [r if isinstance(r, np.ndarray) else np.ndarray(r[0], r[1], buf, r[2]).copy() for r in out]
+        finally:
+            if live:
+                self.idle.put(i)
+
+    def close(self):
+        """Stop the workers and release their shared memory."""
+
+        with self.lock:
+            for tasks, process in zip(self.tasks, self.processes):
+                if process.is_alive():
+                    tasks.put(None)
+            for process in self.processes:
+                process.join()
+            for buffer in self.buffers:
+                buffer.close()
+                buffer.unlink()
+            self.processes, self.buffers = [], []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -0,0 +1,132 @@
+import numpy as np
+
+from numpy.typing import ArrayLike, NDArray
+from typing import Dict, List, Optional, Tuple
+
+# Geometry types and commands, see https://github.com/mapbox/vector-tile-spec/tree/master/2.1
+POINT = 1
+LINESTRING = 2
+MOVE_TO = 1
+LINE_TO = 2
+
+# Protobuf wire types
+VARINT = 0
+LENGTH_DELIMITED = 2
+
+
+def varint(n: int) -> bytes:
+    """Encode a non-negative integer as a protobuf varint."""
+
+    out = bytearray()
+    while n > 0x7F:
+        out.append((n & 0x7F) | 0x80)
+        n >>= 7
+    out.append(n)
+    return bytes(out)
+
+
+def field(num: int, value: int | bytes) -> bytes:
+    """Encode a protobuf field, either a varint or a length-delimited payload."""
+
+    if isinstance(value, bytes):
+        return varint(num << 3 | LENGTH_DELIMITED) + varint(len(value)) + value
+    return varint(num << 3 | VARINT) + varint(value)
+
+
+def packed(num: int, values: ArrayLike) -> bytes:
+    """Encode a packed repeated field of non-negative integers."""
+
+    return field(num, b"".join(varint(v) for v in np.asarray(values, np.int64).tolist()))
+
+
+def zigzag(values: NDArray) -> NDArray:
+    return (values << 1) ^ (values >> 63)
+
+
+def encode_geometry(parts: List[NDArray]) -> NDArray:
+    """Encode points (one part each) or linestrings (one part per linestring) as MVT geometry commands.
+
+    The parts are (n x 2) integer arrays in tile coordinates. Coordinates are stored as deltas to the
+    previous position, so consecutive duplicates are dropped and linestrings that collapse to a single
+    position are skipped.
+    """
+
+    out: List[NDArray] = []
+    cursor = np.zeros(2, np.int64)
+    for part in parts:
+        part = np.asarray(part, np.int64).reshape(-1, 2)
+        if len(part) > 1:
+            part = part[np.r_[True, np.any(part[1:] != part[:-1], axis=1)]]
+            if len(part) < 2:
+                continue
+        deltas = zigzag(np.diff(part, axis=0, prepend=cursor[None]))
+        cursor = part[-1]
+        out.append(np.r_[MOVE_TO | 1 << 3, deltas[0]])
+        if len(part) > 1:
+            out.append(np.r_[LINE_TO | (len(part) - 1) << 3, deltas[1:].ravel()])
+
+    return np.concatenate(out) if out else np.zeros(0, np.int64)
+
+
+def encode_value(value: str | bool | int | float) -> bytes:
+    if isinstance(value, str):
+        return field(1, value.encode())
+    if isinstance(value, bool):
+        return field(7, int(value))
+    if isinstance(value, int):
+        return field(6, int(zigzag(np.int64(value))))
+    return varint(3 << 3 | 1) + np.float64(value).tobytes()
+
+
+class Layer:
+    """Layer of a Mapbox Vector Tile that collects features and encodes them.
+
+    :param name:   layer name
+    :param extent: size of the tile in integer tile coordinates
+    """
+
+    name: str
+    extent: int
+
+    def __init__(self, name: str, extent=4096):
+        assert extent > 0, "Extent must be positive"
+
+        self.name = name
+        self.extent = extent
+        self.features: List[bytes] = []
+        self.keys: Dict[str, int] = {}
+        self.values: Dict[Tuple[type, object], int] = {}
+
+    def __len__(self) -> int:
+        return len(self.features)
+
+    def add(self, geom_type: int, parts: List[NDArray], properties: Dict[str, object], id: Optional[int] = None):
+        """Add a point or linestring feature, unless its geometry is empty."""
+
+        geometry = encode_geometry(parts)
+        if len(geometry) == 0:
+            return
+
+        tags: List[int] = []
+        for key, value in properties.items():
+            if value is None:
+                continue
+            tags.append(self.keys.setdefault(key, len(self.keys)))
+            tags.append(self.values.setdefault((type(value), value), len(self.values)))
+
+        feature = field(1, id) if id is not None else b""
+        feature += packed(2, tags) + field(3, geom_type) + packed(4, geometry)
+        self.features.append(feature)
+
+    def encode(self) -> bytes:
+        layer = field(15, 2) + field(1, self.name.encode())
+        layer += b"".join(field(2, f) for f in self.features)
+        layer += b"".join(field(3, k.encode()) for k in self.keys)
+        layer += b"".join(field(4, encode_value(v)) for _, v in self.values)
+        return layer + field(5, self.extent)
+
+
+def encode_tile(layers: List[Layer]) -> bytes:
+    """Encode the non-empty layers as a Mapbox Vector Tile."""
+
+    return b"".join(field(3, layer.encode()) for layer in layers if len(layer) > 0)
@@ -0,0 +1,229 @@
+import queue
+import threading
+import time
+
+from concurrent.futures import Executor
+from typing import Any, Callable, Iterable, List, Optional, Tuple
+
+# Sentinel that is passed down the queues once no more items follow
+DONE = object()
+
+
+class StageStats:
+    """Throughput counters of a pipeline stage."""
+
+    name: str
+    workers: int
+    num_in: int
+    num_out: int
+    num_errors: int
+    busy: float
+    start: Optional[float]
+    end: Optional[float]
+    last_error: Optional[BaseException]
+    # Keys of the items that raised an error, with the error
+    failed: List[Tuple[Any, BaseException]]
+
+    def __init__(self, name: str, workers: int):
+        self.name = name
+        self.workers = workers
+        self.num_in = 0
+        self.num_out = 0
+        self.num_errors = 0
+        self.busy = 0.0
+        self.start = None
+        self.end = None
+        self.last_error = None
+        self.failed = []
+
+    @property
+    def elapsed(self) -> float:
+        """Time between the first item entering the stage and the last worker finishing."""
+
+        return (self.end or time.monotonic()) - self.start if self.start else 0.0
+
+    @property
+    def items_per_sec(self) -> float:
+        return self.num_in / self.elapsed if self.elapsed > 0 else 0.0
+
+    @property
+    def utilization(self) -> float:
+        """Fraction of the elapsed time that the workers spent processing items (rather than waiting)."""
+
+        return self.busy / (self.elapsed * self.workers) if self.elapsed > 0 else 0.0
+
+    def __repr__(self) -> str:
+        error = f", last error: {self.last_error!r}" if self.last_error else ""
+        return (
+            f"{self.name}: {self.num_in} in, {self.num_out} out, {self.num_errors} errors "
+            f"({self.items_per_sec:.1f} items/s, {self.utilization:.0%} busy{error})"
+        )
+
+
+class Stage:
+    name: str
+    fn: Callable[[Any], Any]
+    workers: int
+    batch_size: int
+    executor: Optional[Executor]
+    key: Optional[Callable[[Any], Any]]
+    stats: StageStats
+
+    def __init__(
+        self,
+        name: str,
+        fn: Callable,
+        workers: int,
+        batch_size: int,
+        executor: Optional[Executor],
+        key: Optional[Callable] = None,
+    ):
+        self.name = name
+        self.fn = fn
+        self.workers = workers
+        self.batch_size = batch_size
+        self.executor = executor
+        self.key = key
+        self.stats = StageStats(name, workers)
+
+
+class Pipeline:
+    """Run items through a chain of stages that are connected by bounded queues.
+
+    Each stage has its own worker threads, so slow I/O in one stage does not hold up the others, and a full
+    queue makes the stages before it wait instead of piling up items in memory. CPU-heavy stages can hand
+    their work to a process pool via `executor`.
+
+    A stage function receives an item and returns the item for the next stage. Batched stages receive and
+    return lists of items. Returning None drops the item(s). Errors are counted per stage and do not stop
+    the pipeline, the stage stats keep the failed items (or their `key`) with the errors.
+
+    Example:
+
+        pipeline = Pipeline(maxsize=16).stage("decode", decode, 2).stage("store", store, batch_size=32)
+        stats = pipeline.run(items)
+    """
+
+    maxsize: int
+    stages: List[Stage]
+
+    def __init__(self, maxsize=16):
+        assert maxsize > 0, "Queue size must be positive"
+
+        self.maxsize = maxsize
+        self.stages = []
+        self.queues: List[queue.Queue] = []
+        self.threads: List[threading.Thread] = []
+        self.lock = threading.Lock()
+
+    def stage(
+        self,
+        name: str,
+        fn: Callable,
+        workers=1,
+        batch_size=1,
+        executor: Optional[Executor] = None,
+        key: Optional[Callable] = None,
+    ):
+        """Append a stage with `workers` threads. Batched stages receive lists of up to `batch_size` items.
+
+        The `key` function maps items to what is kept of them when they fail (e.g. an ID instead of the data).
+        """
+
+        assert not self.threads, "Stages must be added before the pipeline starts"
+        assert workers > 0, "Number of workers must be positive"
+        assert batch_size > 0, "Batch size must be positive"
+
+        self.stages.append(Stage(name, fn, workers, batch_size, executor, key))
+        return self
+
+    @property
+    def stats(self) -> List[StageStats]:
+        return [s.stats for s in self.stages]
+
+    def start(self):
+        """Start the worker threads of all stages."""
+
+        assert self.stages, "Pipeline needs at least one stage"
+
+        self.queues = [queue.Queue(self.maxsize) for _ in self.stages]
+        remaining = [s.workers for s in self.stages]
+        for i, stage in enumerate(self.stages):
+            for _ in range(stage.workers):
+                thread = threading.Thread(target=self.work, args=(i, remaining), daemon=True)
+                thread.start()
+                self.threads.append(thread)
+
+    def put(self, item):
+        """Feed an item into the first stage, waiting while its queue is full."""
+
+        self.queues[0].put(item)
+
+    def close(self) -> List[StageStats]:
+        """Signal that no more items follow, wait until all stages are done and return their stats."""
+
+        self.queues[0].put(DONE)
+        for thread in self.threads:
+            thread.join()
+
+        return self.stats
+
+    def run(self, items: Iterable) -> List[StageStats]:
+        """Run all items through the pipeline and return the stage stats."""
+
+        self.start()
+        for item in items:
+            self.put(item)
+
+        return self.close()
+
+    def work(self, i: int, remaining: List[int]):
+        stage = self.stages[i]
+        stats = stage.stats
+        inq = self.queues[i]
+        outq = self.queues[i + 1] if i + 1 < len(self.queues) else None
+
+        done = False
+        while not done:
+            batch = []
+            while len(batch) < stage.batch_size:
+                item = inq.get()
+                if item is DONE:
+                    # Put the sentinel back so that the other workers of this stage see it as well
+                    inq.put(DONE)
+                    done = True
+                    break
+                batch.append(item)
+            if not batch:
+                break
+
+            t = time.monotonic()
+            with self.lock:
+                stats.start = stats.start or t
+                stats.num_in += len(batch)
+            try:
+                arg = batch if stage.batch_size > 1 else batch[0]
+                res = stage.executor.submit(stage.fn, arg).result() if stage.executor else stage.fn(arg)
+            except Exception as e:
+                res = None
+                with self.lock:
+                    stats.num_errors += 1
+                    stats.last_error = e
+                    stats.failed.extend([(stage.key(item) if stage.key else item, e) for item in batch])
+            with self.lock:
+                stats.busy += time.monotonic() - t
+            if res is not None:
+                with self.lock:
+                    stats.num_out += len(res) if stage.batch_size > 1 else 1
+                if outq is not None:
+                    for item in res if stage.batch_size > 1 else [res]:
+                        outq.put(item)
+
+        # The last worker of a stage to finish signals the next stage
+        with self.lock:
+            remaining[i] -= 1
+            last = remaining[i] == 0
+            if last:
+                stats.end = time.monotonic()
+        if last and outq is not None:
+            outq.put(DONE)
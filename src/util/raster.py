@@ -0,0 +1,263 @@
+import numpy as np
+import zlib
+
+from functools import lru_cache
+from io import BytesIO
+from numpy.typing import ArrayLike, NDArray
+from PIL import Image
+from typing import Dict, Optional, Sequence, Tuple
+from src.util.geo import TileCoords
+
+# Compact mask encoding: a header with the bit depth and size of the mask, followed by the deflate-compressed
+# pixels (8 per byte for binary masks, one byte each otherwise)
+MASK_HEADER = np.dtype([("bits", "u1"), ("height", "<u2"), ("width", "<u2")])
+IMAGE_FORMATS = ("PNG", "WEBP")
+
+
+@lru_cache(maxsize=None)
+def disk_mask(r: int) -> NDArray:
+    """Return a read-only (2r+1 x 2r+1) boolean mask of the pixels that fall into a circle with radius `r`.
+
+    The mask contains the same pixels as `pixels_in_circle(r)` from `src.util.geo`, with the
+    circle center at index [r, r].
+    """
+
+    assert r > 0, "Radius must be positive"
+
+    y, x = np.ogrid[-r : r + 1, -r : r + 1]
+    mask = x * x + y * y < r * r
+    mask.setflags(write=False)
+
+    return mask
+
+
+@lru_cache(maxsize=None)
+def disk_offsets(r: int) -> Tuple[NDArray, NDArray]:
+    """Return read-only (dy, dx) pixel offsets of a circle with radius `r`, relative to its center."""
+
+    dy, dx = np.nonzero(disk_mask(r))
+    dy -= r
+    dx -= r
+    dy.setflags(write=False)
+    dx.setflags(write=False)
+
+    return dy, dx
+
+
+def opaque_fractions(alpha: NDArray, px: ArrayLike, py: ArrayLike, r: int) -> NDArray:
+    """Return the fraction of opaque pixels in a circle with radius `r` around each of the given pixels.
+
+    :param alpha: 2-dimensional (h x w) alpha plane of a decoded image tile
+    :param px:    pixel x coordinates within the tile
+    :param py:    pixel y coordinates within the tile
+    :param r:     circle radius in pixels
+
+    Pixels whose circle does not fully fit into the tile get a fraction of 0.
+    """
+
+    assert len(np.shape(alpha)) == 2, "Alpha plane must be 2-dimensional."
+
+    h, w = np.shape(alpha)
+    px = np.asarray(px, dtype=np.intp)
+    py = np.asarray(py, dtype=np.intp)
+    fractions = np.zeros(len(px), dtype=np.float64)
+
+    valid = (px >= r) & (px <= w - r) & (py >= r) & (py <= h - r)
+    dy, dx = disk_offsets(r)
+    # Gather the circle around every spot at once, resulting in a (num spots x num circle pixels) array
+    opaque = alpha[py[valid, np.newaxis] + dy, px[valid, np.newaxis] + dx] > 0
+    fractions[valid] = np.count_nonzero(opaque, axis=1) / len(dx)
+
+    return fractions
+
+
+def colorize(gray: NDArray, rgba: Sequence[float], out: Optional[NDArray] = None) -> NDArray:
+    """Color an (h x w) array of grayscale values (0-255) into an (h x w x 4) RGBA array.
+
+    :param gray: 2-dimensional uint8 array
+    :param rgba: [r, g, b, a] factors in [0, 1] that the grayscale values are multiplied with
+    :param out:  optional preallocated (h x w x 4) uint8 output array
+
+    For uint8 input, every gray value is looked up in a 256-entry color table. That gives the same
+    (truncated) results as multiplying each pixel with the factors.
+    """
+
+    assert len(np.shape(gray)) == 2, "Input array must be a 2-dimensional."
+    assert len(rgba) == 4, "RGBA vector must contain exactly 4 values."
+    assert all([(v >= 0.0 and v <= 1.0) for v in rgba]), "RGBA vector must contain float values in [0, 1]."
+
+    gray = np.asarray(gray)
+    factors = np.asarray(rgba, dtype=np.float64)
+    if out is None:
+        out = np.empty((*gray.shape, 4), dtype=np.uint8)
+    assert out.shape == (*gray.shape, 4) and out.dtype == np.uint8, "Output must be an (h x w x 4) uint8 array."
+
+    if gray.dtype != np.uint8:
+        # Other input types may hold fractional values, so they are multiplied directly (and truncated)
+        out[...] = gray[:, :, np.newaxis] * factors
+        return out
+
+    table = (np.arange(256, dtype=np.float64)[:, np.newaxis] * factors).astype(np.uint8)
+    return np.take(table, gray, axis=0, out=out, mode="clip")
+
+
+def decode_alpha(blob: bytes) -> NDArray:
+    """Decode an image and return only its (h x w) alpha plane (fully opaque for images without alpha)."""
+
+    im = Image.open(BytesIO(blob))
+    if "transparency" in im.info:
+        # Palette images store their alpha values separately (in the tRNS chunk for PNGs)
+        im = im.convert("RGBA")
+    if "A" not in im.getbands():
+        return np.full((im.height, im.width), 255, dtype=np.uint8)
+
+    return np.asarray(im.getchannel("A"))
+
+
+def threshold_mask(arr: NDArray, thresh=0, out: Optional[NDArray] = None) -> NDArray:
+    """Return a boolean mask of the values above a threshold, optionally written into a preallocated array."""
+
+    return np.greater(arr, thresh, out=out)
+
+
+def pack_mask(mask: NDArray) -> NDArray:
+    """Pack an (h x w) boolean mask into an (h x ceil(w / 8)) uint8 array with 8 pixels per byte."""
+
+    assert len(np.shape(mask)) == 2, "Mask must be 2-dimensional."
+
+    return np.packbits(mask, axis=1)
+
+
+def unpack_mask(packed: NDArray, w: int) -> NDArray:
+    """Unpack a mask that was packed with `pack_mask`, given its original width."""
+
+    assert len(np.shape(packed)) == 2, "Packed mask must be 2-dimensional."
+
+    return np.unpackbits(packed, axis=1, count=w).view(bool)
+
+
+def downsample_alpha(alpha: NDArray, mode="max") -> NDArray:
+    """Halve the resolution of an (h x w) alpha plane or mask by combining every 2x2 pixel block into one pixel.
+
+    :param alpha: 2-dimensional uint8 array with an even height and width
+    :param mode:  "max" keeps the most opaque pixel of each block (so thin structures stay visible),
+                  "mean" averages the block (rounded down)
+    """
+
+    assert len(np.shape(alpha)) == 2, "Alpha plane must be 2-dimensional."
+    assert np.shape(alpha)[0] % 2 == 0 and np.shape(alpha)[1] % 2 == 0, "Alpha plane must have an even size."
+    assert mode in ("max", "mean"), 'Mode must be "max" or "mean".'
+
+    h, w = np.shape(alpha)
+    blocks = np.asarray(alpha, dtype=np.uint8).reshape(h // 2, 2, w // 2, 2)
+    if mode == "max":
+        return blocks.max(axis=(1, 3))
+
+    return (blocks.sum(axis=(1, 3), dtype=np.uint16) // 4).astype(np.uint8)
+
+
+def downsample_tiles(masks: Dict[TileCoords, NDArray], mode="max", ts=256) -> Dict[TileCoords, NDArray]:
+    """Build the masks of the tiles one zoom level up from the (ts x ts) masks of their child tiles.
+
+    :param masks: masks of the child tiles by tile coordinates
+    :param mode:  how 2x2 pixel blocks are combined, see `downsample_alpha`
+    :param ts:    tile size in pixels
+
+    Returns a mask for every parent with at least one child, missing children are treated as empty.
+    """
+
+    # Children are pasted into a (2 ts x 2 ts) plane per parent
+    planes: Dict[TileCoords, NDArray] = {}
+    for (x, y), mask in masks.items():
+        assert np.shape(mask) == (ts, ts), f"Tile {x}/{y} is not {ts}x{ts} pixels"
+        plane = planes.setdefault(TileCoords(x // 2, y // 2), np.zeros((2 * ts, 2 * ts), dtype=np.uint8))
+        plane[(y % 2) * ts : (y % 2 + 1) * ts, (x % 2) * ts : (x % 2 + 1) * ts] = mask
+
+    return {tc: downsample_alpha(plane, mode) for tc, plane in sorted(planes.items())}
+
+
+def encode_mask(gray: NDArray, level=6) -> bytes:
+    """Encode an (h x w) grayscale mask (0-255) in the compact mask format.
+
+    :param gray:  2-dimensional uint8 array
+    :param level: deflate compression level (0-9)
+
+    Masks that only contain 0 and 255 (like the tree detection results) are stored with 1 bit per pixel.
+    """
+
+    assert len(np.shape(gray)) == 2, "Mask must be 2-dimensional."
+
+    gray = np.asarray(gray, dtype=np.uint8)
+    binary = bool(np.all((gray == 0) | (gray == 255)))
+    pixels = pack_mask(gray > 0) if binary else gray
+    header = np.array([(1 if binary else 8, *gray.shape)], MASK_HEADER)
+
+    return header.tobytes() + zlib.compress(np.ascontiguousarray(pixels).tobytes(), level)
+
+
+def decode_mask(blob: bytes) -> NDArray:
+    """Decode a mask that was encoded with `encode_mask` into an (h x w) uint8 array."""
+
+    bits, h, w = np.frombuffer(blob, MASK_HEADER, 1)[0].tolist()
+    assert bits in (1, 8), f"Unsupported mask bit depth {bits}"
+
+    pixels = np.frombuffer(zlib.decompress(blob[MASK_HEADER.itemsize :]), dtype=np.uint8)
+    if bits == 8:
+        return pixels.reshape(h, w)
+
+    return unpack_mask(pixels.reshape(h, (w + 7) // 8), w).view(np.uint8) * np.uint8(255)
+
+
+def encode_image(im: Image.Image, format="PNG", level=6) -> bytes:
+    """Encode an image as PNG or lossless WebP.
+
+    :param im:     image to encode
+    :param format: "PNG" or "WEBP"
+    :param level:  compression level from 0 (fastest) to 9 (smallest), mapped onto the WebP methods (0-6)
+    """
+
+    assert format in IMAGE_FORMATS, f"Image format must be one of {IMAGE_FORMATS}"
+    assert 0 <= level <= 9, "Compression level must be within [0, 9]"
+
+    blob = BytesIO()
+    if format == "PNG":
+        im.save(blob, format="PNG", compress_level=level)
+    else:
+        # Higher WebP qualities barely shrink two-color tiles, but take up to 100x longer to encode
+        im = im if im.mode in ("RGB", "RGBA") else im.convert("RGBA")
+        im.save(blob, format="WEBP", lossless=True, method=level * 6 // 9, quality=50)
+
+    return blob.getvalue()
+
+
+def render_mask(gray: NDArray, rgba: Sequence[float], format="PNG", level=6) -> bytes:
+    """Color an (h x w) grayscale mask with `colorize` and encode it as an image.
+
+    :param gray:   2-dimensional uint8 array
+    :param rgba:   [r, g, b, a] factors, see `colorize`
+    :param format: "PNG" or "WEBP"
+    :param level:  compression level (0-9), see `encode_image`
+
+    PNGs are palette-indexed, with one RGBA palette entry (alpha in the tRNS chunk) per gray value in the mask.
+    Binary masks become 1-bit PNGs that way, which are much smaller than 32-bit RGBA ones.
+    """
+
+    assert len(np.shape(gray)) == 2, "Mask must be 2-dimensional."
+
+    gray = np.asarray(gray, dtype=np.uint8)
+    if format != "PNG":
+        return encode_image(Image.fromarray(colorize(gray, rgba)), format, level)
+
+    values, indices = np.unique(gray, return_inverse=True)
+    colors = colorize(values[np.newaxis], rgba)[0]
+    im = Image.fromarray(indices.reshape(gray.shape).astype(np.uint8), "P")
+    im.putpalette(colors[:, :3].tobytes(), "RGB")
+    im.info["transparency"] = colors[:, 3].tobytes()
+
+    return encode_image(im, format, level)
+
+
+def transcode_image(blob: bytes, format="WEBP", level=6) -> bytes:
+    """Decode an image and encode it in another format (losslessly), see `encode_image`."""
+
+    return encode_image(Image.open(BytesIO(blob)), format, level)
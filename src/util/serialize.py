@@ -0,0 +1,25 @@
+import orjson
+
+from pydantic import BaseModel
+from typing import Any, Iterable, List, Sequence, Type
+
+
+def schema_keys(schema: Type[BaseModel]) -> List[str]:
+    """Return the JSON keys of a schema's fields (their aliases, e.g. camelCase) in declaration order."""
+
+    return [field.alias or name for name, field in schema.model_fields.items()]
+
+
+def dump_rows(rows: Iterable[Sequence[Any]], schema: Type[BaseModel]) -> bytes:
+    """Serialize rows into a JSON array of objects with the keys of a schema, without validating every row.
+
+    :param rows:   rows with one value per schema field, in the order of the fields (e.g. from a select of the
+                   corresponding columns)
+    :param schema: Pydantic schema that describes the objects
+
+    The values have to be of the field types already (no coercion). For those, the result is identical to
+    validating each row into the schema and serializing the list by alias, like FastAPI does for response models.
+    """
+
+    keys = schema_keys(schema)
+    return orjson.dumps([dict(zip(keys, row)) for row in rows])
@@ -1,7 +1,6 @@
-import numpy as np
-
 from numpy.typing import NDArray
 from typing import List
+from src.util.raster import colorize
 
 
 def grayscale_to_rgba(arr: NDArray, rgba: List[float]) -> NDArray:
@@ -11,16 +10,8 @@ def grayscale_to_rgba(arr: NDArray, rgba: List[float]) -> NDArray:
     :param rgba: vector with [r, g, b, a] values in [0, 1]
 
     The RGBA values are multiplied with the input values, so [1.0, 0.0, 0.0, 0.5] would
-    map the grayscale intensities to the red channel with 50% opacity.
+    map the grayscale intensities to the red channel with 50% opacity. See `colorize` in
+    `src.util.raster`.
     """
 
-    assert len(np.shape(arr)) == 2, "Input array must be a 2-dimensional."
-    assert len(rgba) == 4, "RGBA vector must contain exactly 4 values."
-    assert all([(v >= 0.0 and v <= 1.0) for v in rgba]), "RGBA vector must contain float values in [0, 1]."
-
-    data = np.zeros((*np.shape(arr), 4), dtype=np.uint8)
-    for r in range(0, np.size(arr, 0)):
-        for c in range(0, np.size(arr, 1)):
-            data[r, c] = [arr[r, c] * v for v in rgba]
-
-    return data
+    return colorize(arr, rgba)
@@ -0,0 +1,170 @@
+import mmap
+import numpy as np
+import os
+
+from numpy.typing import ArrayLike, NDArray
+from typing import List, Optional, Sequence, Tuple
+from src.util.geo import hilbert_index, tile_keys, tile_keys_to_coords
+
+# An archive consists of a header, the directory (tile keys in ascending order, followed by the data offset, data
+# length and content hash of every tile) and the tile data, which is ordered along the Hilbert curve of each zoom level
+MAGIC = b"VEGEOTIL"
+VERSION = 1
+HEADER_DTYPE = np.dtype(
+    [("magic", "S8"), ("version", "<u4"), ("reserved", "<u4"), ("num_tiles", "<u8"), ("created_at", "<f8")]
+)
+ENTRY_BYTES = 8 + 8 + 4 + 32
+
+
+def hilbert_order(z: ArrayLike, x: ArrayLike, y: ArrayLike) -> NDArray:
+    """Return the indices that sort tiles by zoom level and along the Hilbert curve within each zoom level."""
+
+    z, x, y = [np.asarray(v, np.int64) for v in (z, x, y)]
+    d = np.zeros(len(z), np.int64)
+    for level in np.unique(z).tolist():
+        on_level = z == level
+        d[on_level] = hilbert_index(level, x[on_level], y[on_level])
+
+    return np.lexsort((d, z))
+
+
+class TileArchiveWriter:
+    """Write image tiles into a single archive file that can be memory-mapped with `TileArchive`.
+
+    :param path:       path of the archive, which is replaced once all tiles have been written
+    :param z:          zoom levels of the tiles
+    :param x:          x coordinates of the tiles
+    :param y:          y coordinates of the tiles
+    :param lengths:    data size of each tile in bytes
+    :param hashes:     content hash of each tile (32 characters, e.g. a hex MD5 digest)
+    :param created_at: Unix timestamp of the data (e.g. of the DB snapshot the tiles were read from)
+
+    The directory is written up front, so the tile data has to be passed to `write` in the order of `keys`
+    (which is the Hilbert order). The archive is written to a temporary file first, readers that still map
+    the previous version keep seeing it until they open the archive again.
+    """
+
+    path: str
+    keys: List[Tuple[int, int, int]]
+
+    def __init__(
+        self,
+        path: str,
+        z: ArrayLike,
+        x: ArrayLike,
+        y: ArrayLike,
+        lengths: ArrayLike,
+        hashes: Sequence[str],
+        created_at=0.0,
+    ):
+        z, x, y, lengths = [np.asarray(v, np.int64) for v in (z, x, y, lengths)]
+        assert len(z) == len(x) == len(y) == len(lengths) == len(hashes), "Number of coordinates and tiles must match"
+        assert np.all((x >= 0) & (x < 2**29) & (y >= 0) & (y < 2**29)), "Tile coordinates must be within [0, 2^29)"
+        assert all([len(h) == 32 for h in hashes]), "Content hashes must have 32 characters"
+
+        order = hilbert_order(z, x, y)
+        self.path = path
+        self.keys = list(zip(z[order].tolist(), x[order].tolist(), y[order].tolist()))
+        self.lengths = lengths[order]
+        self.num_written = 0
+
+        data_offset = HEADER_DTYPE.itemsize + len(z) * ENTRY_BYTES
+        offsets = data_offset + np.cumsum(self.lengths) - self.lengths
+        keys = tile_keys(z[order], x[order], y[order])
+        by_key = np.argsort(keys, kind="stable")
+        assert np.all(np.diff(keys[by_key]) > 0), "Tile coordinates must be unique"
+
+        header = np.array([(MAGIC, VERSION, 0, len(z), created_at)], HEADER_DTYPE)
+        self.file = open(f"{path}.tmp", "wb")
+        self.file.write(header.tobytes())
+        self.file.write(keys[by_key].astype("<u8").tobytes())
+        self.file.write(offsets[by_key].astype("<u8").tobytes())
+        self.file.write(self.lengths[by_key].astype("<u4").tobytes())
+        self.file.write(np.array(hashes, "S32")[order][by_key].tobytes())
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        complete = exc_type is None and self.num_written == len(self.keys)
+        if complete:
+            self.file.flush()
+            os.fsync(self.file.fileno())
+        self.file.close()
+        if not complete:
+            # Incomplete archives are discarded, the previous version stays in place
+            os.remove(self.file.name)
+        if exc_type is None:
+            assert complete, f"{len(self.keys) - self.num_written} tiles have not been written"
+            os.replace(self.file.name, self.path)
+
+    def write(self, d: bytes):
+        """Append the data of the next tile in `keys`."""
+
+        assert self.num_written < len(self.keys), "All tiles have been written"
+        expected = self.lengths[self.num_written]
+        assert len(d) == expected, f"Tile {self.keys[self.num_written]} has {len(d)} instead of {expected} bytes"
+
+        self.file.write(d)
+        self.num_written += 1
+
+
+class TileArchive:
+    """Read-only, memory-mapped tile archive written by `TileArchiveWriter`.
+
+    :param path: path of the archive
+
+    Lookups are a binary search over the directory, and the returned tile data is a view into the memory map
+    (no copy). The pages of the file are shared by all processes that open the same archive.
+    """
+
+    path: str
+    created_at: float
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            self.buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        header = np.frombuffer(self.buffer, HEADER_DTYPE, 1)[0]
+        assert header["magic"] == MAGIC and header["version"] == VERSION, f"{path} is not a tile archive"
+
+        self.created_at = float(header["created_at"])
+        n = int(header["num_tiles"])
+        offset = HEADER_DTYPE.itemsize
+        self.keys = np.frombuffer(self.buffer, "<u8", n, offset)
+        self.offsets = np.frombuffer(self.buffer, "<u8", n, offset + 8 * n)
+        self.lengths = np.frombuffer(self.buffer, "<u4", n, offset + 16 * n)
+        self.hashes = np.frombuffer(self.buffer, "S32", n, offset + 20 * n)
+        self.data = memoryview(self.buffer)
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    @property
+    def nbytes(self) -> int:
+        return len(self.buffer)
+
+    def get(self, z: int, x: int, y: int) -> Optional[Tuple[str, memoryview]]:
+        """Return the content hash and data of a tile, or None if the archive doesn't contain it."""
+
+        if not (0 <= z < 30 and 0 <= x < 2**29 and 0 <= y < 2**29):
+            return None
+
+        # Same packing as `tile_keys`, without the array overhead for a single tile
+        key = np.uint64((z << 58) | (x << 29) | y)
+        i = int(self.keys.searchsorted(key))
+        if i == len(self.keys) or self.keys[i] != key:
+            return None
+
+        offset = int(self.offsets[i])
+        return self.hashes[i].decode(), self.data[offset : offset + int(self.lengths[i])]
+
+    def missing_tiles(self, keys: ArrayLike) -> List[Tuple[int, int, int]]:
+        """Return the (z, x, y) coordinates of the archived tiles whose keys (see `tile_keys`) are not in `keys`.
+
+        Passing the keys of all stored tiles returns the tiles that have been deleted since the export.
+        """
+
+        missing = np.setdiff1d(self.keys, np.asarray(keys, np.uint64))
+        return list(zip(*[v.tolist() for v in tile_keys_to_coords(missing)]))
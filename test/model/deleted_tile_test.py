@@ -0,0 +1,16 @@
+from src.model.deleted_tile import *
+
+
+def test_init():
+    dt = DeletedTile(1, 2, 3)
+    assert dt.x == 1
+    assert dt.y == 2
+    assert dt.z == 3
+
+
+def test_repr():
+    assert f"{DeletedTile(1, 2, 3)!r}" == "DeletedTile 3/1/2"
+
+
+def test_primary_key():
+    assert [c.name for c in DeletedTile.__table__.primary_key.columns] == ["z", "x", "y"]
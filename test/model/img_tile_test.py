@@ -1,5 +1,9 @@
 import os
+import numpy as np
+from io import BytesIO
+from PIL import Image
 from src.model.img_tile import *
+from src.util.raster import decode_alpha, encode_mask
 
 
 def test_init():
@@ -7,9 +11,39 @@ def test_init():
     assert mt.x == 1
     assert mt.y == 2
     assert mt.z == 3
-    assert len(mt.d) == 100
+    assert len(mt.m) == 100
 
 
 def test_repr():
     mt = ImgTile(1, 2, 3, os.urandom(100))
-    assert f"{mt!r}" == "ImgTile 3/1/2 (256x256 PNG 100 bytes)"
+    assert f"{mt!r}" == "ImgTile 3/1/2 (256x256 PNG, 100 byte mask)"
+
+
+def test_content_hash():
+    assert ImgTile.__table__.c.h.computed.sqltext.text == "md5(m)"
+
+
+def test_primary_key():
+    assert [c.name for c in ImgTile.__table__.primary_key.columns] == ["z", "x", "y"]
+
+
+def test_decode_tile_masks():
+    gray = np.zeros((4, 8), dtype=np.uint8)
+    gray[1, 2:5] = 255
+    masks, missing = decode_tile_masks([(1, 2, encode_mask(gray)), (3, 4, None), (5, 6, encode_mask(gray // 2))])
+    assert list(masks) == [TileCoords(1, 2), TileCoords(5, 6)]
+    assert np.array_equal(masks[TileCoords(1, 2)], gray)
+    assert np.array_equal(masks[TileCoords(5, 6)], gray // 2)
+    assert missing == [TileCoords(3, 4)]
+
+    assert decode_tile_masks([]) == ({}, [])
+    assert decode_tile_masks([(0, 0, None)]) == ({}, [TileCoords(0, 0)])
+
+
+def test_render_tile():
+    gray = np.zeros((256, 256), dtype=np.uint8)
+    gray[10:20, 30:40] = 255
+    for format in ["PNG", "WEBP"]:
+        im = Image.open(BytesIO(render_tile(encode_mask(gray), format)))
+        assert im.format == format and im.size == (256, 256)
+    assert np.array_equal(decode_alpha(render_tile(encode_mask(gray))), gray // 2)
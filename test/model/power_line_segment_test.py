@@ -22,6 +22,30 @@ def test_init(segment_data):
     )
 
 
+def test_simplified_geometries(segment_data):
+    pls = PowerLineSegment(segment_data)
+    nodes = json.loads(pls.geometry)
+    # Lower zoom levels keep fewer nodes, but always the first and last one
+    assert json.loads(pls.geometry_z10) == [nodes[0], nodes[-1]]
+    assert json.loads(pls.geometry_z12) == [nodes[0], nodes[1], nodes[2], nodes[-1]]
+    assert pls.geometry_z14 == pls.geometry_z12
+    assert simplify_geometry(pls.geometry) == {
+        "geometry_z10": pls.geometry_z10,
+        "geometry_z12": pls.geometry_z12,
+        "geometry_z14": pls.geometry_z14,
+    }
+
+
+def test_geometry_for_zoom():
+    assert PowerLineSegment.geometry_for_zoom(None) is PowerLineSegment.geometry
+    assert PowerLineSegment.geometry_for_zoom(15) is PowerLineSegment.geometry
+    assert str(PowerLineSegment.geometry_for_zoom(8)) == (
+        "coalesce(power_line_segment.geometry_z10, power_line_segment.geometry)"
+    )
+    assert "geometry_z12" in str(PowerLineSegment.geometry_for_zoom(11))
+    assert "geometry_z14" in str(PowerLineSegment.geometry_for_zoom(14))
+
+
 def test_repr(segment_data):
     pls = PowerLineSegment(segment_data)
     assert f"{pls!r}" == "PowerLineSegment [808267289] (35.1192121, -89.933647) - (35.1197699, -89.9321114) 5 nodes"
@@ -48,3 +72,18 @@ def segment_data():
         ],
         "tags": {"power": "minor_line"},
     }
+
+
+def test_intersects():
+    sql = str(
+        PowerLineSegment.intersects(LatLon(35.0, -90.0), LatLon(35.5, -89.5)).compile(
+            compile_kwargs={"literal_binds": True}
+        )
+    )
+    # Uses the same box expression as the GiST index, plus exclusive bounds
+    assert "box(point(power_line_segment.bb_min_lon, power_line_segment.bb_min_lat)" in sql
+    assert "&& box(point(-90.0, 35.0), point(-89.5, 35.5))" in sql
+    assert "power_line_segment.bb_max_lat > 35.0" in sql
+    assert "power_line_segment.bb_min_lon < -89.5" in sql
+    index = next(i for i in PowerLineSegment.__table__.indexes if i.name == "ix_power_line_segment_bbox")
+    assert index.dialect_options["postgresql"]["using"] == "gist"
@@ -1,4 +1,5 @@
 import os
+import numpy as np
 from src.model.power_line_spot import *
 
 
@@ -11,3 +12,31 @@ def test_init():
 def test_repr():
     pls = PowerLineSpot(456, Pixel(7, 8))
     assert f"{pls!r}" == "PowerLineSpot 456: P[7, 8]"
+
+
+def test_spot_dtype():
+    spots = np.zeros(3, dtype=SPOT_DTYPE)
+    assert spots.itemsize == 16
+    assert spots.dtype.names == ("segment_id", "px", "py")
+
+
+def test_get_dirty_segment_ids():
+    # Segment 1 crosses tiles (0, 0) and (1, 0), segment 2 lies in tile (2, 1), segment 3 in tile (0, 1)
+    spots = np.array(
+        [(1, 10, 10), (1, 300, 20), (2, 600, 300), (2, 700, 400), (3, 100, 400)],
+        dtype=SPOT_DTYPE,
+    )
+
+    # Nothing changed
+    assert get_dirty_segment_ids(spots, set(), set()) == set()
+
+    # A changed tile marks all segments with spots on it
+    assert get_dirty_segment_ids(spots, {TileCoords(1, 0)}, set()) == {1}
+    assert get_dirty_segment_ids(spots, {TileCoords(2, 1), TileCoords(0, 1)}, set()) == {2, 3}
+
+    # A changed segment is dirty on its own, unchanged segments and tiles without spots are not
+    assert get_dirty_segment_ids(spots, {TileCoords(5, 5)}, {3}) == {3}
+    assert get_dirty_segment_ids(spots, set(), {4}) == set()
+
+    # Handles regions without spots
+    assert get_dirty_segment_ids(np.zeros(0, dtype=SPOT_DTYPE), {TileCoords(0, 0)}, {1}) == set()
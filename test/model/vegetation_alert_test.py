@@ -20,3 +20,8 @@ def test_init():
 def test_repr():
     va = VegetationAlert(45, -90, "Power line overlap", 7, 123)
     assert f"{va!r}" == "VegetationAlert (45, -90) [7]: Power line overlap"
+
+
+def test_keys():
+    assert [c.name for c in VegetationAlert.__table__.primary_key.columns] == ["lat", "lon"]
+    assert [[c.name for c in i.columns] for i in VegetationAlert.__table__.indexes] == [["pls_id"]]
@@ -0,0 +1,13 @@
+from datetime import datetime, timezone
+from src.model.watermark import *
+
+
+def test_init():
+    wm = Watermark("compute_alerts", datetime(2025, 4, 23, 14, 53, 30, tzinfo=timezone.utc))
+    assert wm.name == "compute_alerts"
+    assert wm.ts == datetime(2025, 4, 23, 14, 53, 30, tzinfo=timezone.utc)
+
+
+def test_repr():
+    wm = Watermark("compute_alerts", datetime(2025, 4, 23, 14, 53, 30, tzinfo=timezone.utc))
+    assert f"{wm!r}" == 'Watermark "compute_alerts" (2025-04-23T14:53:30+00:00)'
@@ -0,0 +1,29 @@
+import numpy as np
+import pytest
+from src.util.bloom import *
+
+
+def test_bloom_filter():
+    # Raises errors for invalid parameters
+    with pytest.raises(AssertionError):
+        BloomFilter(0)
+    with pytest.raises(AssertionError):
+        BloomFilter(100, 1.0)
+
+    bf = BloomFilter(1000, 0.01)
+    assert bf.num_bits == 9592 and bf.num_hashes == 7 and bf.nbytes == 1199
+    assert 42 not in bf and bf.fp_rate == 0
+
+    # Never misses added keys
+    keys = np.arange(1000, dtype=np.uint64) * 7919
+    bf.add(keys[:-1])
+    bf.add(int(keys[-1]))
+    assert bf.num_keys == 1000
+    assert np.all(bf.contains(keys))
+    assert all(int(k) in bf for k in keys[:10])
+
+    # Reports absent keys at about the configured false-positive rate
+    assert bf.fp_rate == pytest.approx(0.01, rel=0.1)
+    assert bf.stats() == {"keys": 1000, "bytes": 1199, "fp_rate": bf.fp_rate}
+    absent = np.arange(100000, dtype=np.uint64) * 7919 + 1
+    assert np.mean(bf.contains(absent)) == pytest.approx(0.01, rel=0.3)
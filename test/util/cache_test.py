@@ -0,0 +1,67 @@
+import pytest
+from src.util.cache import *
+
+
+def test_byte_cache():
+    # Raises errors for invalid budgets
+    with pytest.raises(AssertionError):
+        ByteCache(-1)
+
+    cache = ByteCache(10)
+    assert cache.get("a") is None
+    cache.put("a", b"1234")
+    cache.put("b", b"5678")
+    assert cache.get("a") == b"1234"
+    assert len(cache) == 2 and cache.num_bytes == 8
+
+    # Evicts the least recently used values once the budget is exceeded
+    cache.put("c", b"901")
+    assert "b" not in cache and cache.num_bytes == 7
+    cache.put("d", b"xy")
+    cache.put("e", b"zz")
+    assert "a" not in cache and cache.num_bytes == 7
+
+    # Replaces existing values and skips values that exceed the budget
+    cache.put("c", b"123456")
+    assert cache.get("c") == b"123456" and cache.num_bytes == 10
+    cache.put("f", b"12345678901")
+    assert "f" not in cache and cache.num_bytes == 10
+
+    # Invalidates and clears values
+    cache.invalidate("c")
+    cache.invalidate("unknown")
+    assert "c" not in cache and cache.num_bytes == 4
+    cache.clear()
+    assert len(cache) == 0 and cache.num_bytes == 0
+
+    # Counts hits, misses and evictions
+    assert cache.stats() == {"entries": 0, "bytes": 0, "max_bytes": 10, "hits": 2, "misses": 1, "evictions": 2}
+
+
+def test_byte_cache_version():
+    cache = ByteCache(10)
+    version = cache.version
+    cache.put("a", b"1", version)
+    assert cache.get("a") == b"1"
+
+    # Rejects values that were read before an invalidation
+    cache.invalidate("b")
+    cache.put("c", b"2", version)
+    assert "c" not in cache
+    cache.put("c", b"2", cache.version)
+    assert "c" in cache
+
+
+def test_byte_cache_size():
+    cache = ByteCache(10)
+    cache.put("a", ("hash", b"1234"), size=6)
+    cache.put("b", ("hash", b"5678"), size=6)
+    assert cache.get("b") == ("hash", b"5678")
+    assert "a" not in cache and cache.num_bytes == 6
+
+
+def test_byte_cache_disabled():
+    cache = ByteCache(0)
+    cache.put("a", b"1")
+    assert cache.get("a") is None
+    assert cache.stats()["misses"] == 1
@@ -0,0 +1,40 @@
+import pytest
+from src.util.cluster import *
+from src.util.geo import LatLon
+
+
+def test_point_index_query():
+    with pytest.raises(AssertionError):
+        PointIndex([1, 2], [3], [4])
+
+    index = PointIndex([35.0, 35.1, 36.0, 35.05], [-90.0, -89.9, -89.95, -91.0], [1, 2, 3, 4])
+    assert len(index) == 4 and index.nbytes == 4 * 8 * 3
+    # Sorted by longitude
+    assert index.lon.tolist() == [-91.0, -90.0, -89.95, -89.9]
+
+    idx = index.query(LatLon(34.9, -90.0), LatLon(35.5, -89.9))
+    assert index.value[idx].tolist() == [1, 2]
+    assert len(index.query(LatLon(37, -90), LatLon(38, -89))) == 0
+    assert len(PointIndex([], [], []).query(LatLon(34, -91), LatLon(36, -89))) == 0
+
+
+def test_point_index_cluster():
+    lat = [35.0, 35.0001, 35.0002, 35.1, 36.0]
+    lon = [-90.05, -90.0501, -90.0502, -89.9, -89.95]
+    index = PointIndex(lat, lon, [1, 5, 2, 3, 7])
+    mn, mx = LatLon(34.9, -90.1), LatLon(35.5, -89.8)
+
+    # Nearby points end up in the same cell at low zoom levels
+    clusters = index.cluster(mn, mx, 10)
+    assert clusters["count"].tolist() == [3, 1]
+    assert clusters["max_value"].tolist() == [5, 3]
+    assert clusters["lat"].tolist() == pytest.approx([35.0001, 35.1])
+    assert clusters["lon"].tolist() == pytest.approx([-90.0501, -89.9])
+
+    # ... and in separate cells at high zoom levels
+    assert sorted(index.cluster(mn, mx, 17, 1)["count"].tolist()) == [1, 1, 1, 1]
+
+    clusters = index.cluster(LatLon(37, -90), LatLon(38, -89), 10)
+    assert all(len(v) == 0 for v in clusters.values())
+    with pytest.raises(AssertionError):
+        index.cluster(mn, mx, 10, 0)
@@ -0,0 +1,114 @@
+import asyncio
+import pytest
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from src.util.download import *
+
+
+class StubTileHandler(BaseHTTPRequestHandler):
+    """Serve `/tile/<status>/<n>`, answering with `status` for the first `n` requests and with 200 afterwards."""
+
+    counts = {}
+    lock = threading.Lock()
+
+    def do_GET(self):
+        _, _, status, n = self.path.split("?")[0].split("/")
+        with self.lock:
+            count = self.counts[self.path] = self.counts.get(self.path, 0) + 1
+        code = int(status) if count <= int(n) else 200
+        body = self.path.encode() if code == 200 else b""
+        self.send_response(code)
+        if code == 429:
+            self.send_header("Retry-After", "0")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    StubTileHandler.counts = {}
+    srv = ThreadingHTTPServer(("127.0.0.1", 0), StubTileHandler)
+    thread = threading.Thread(target=srv.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{srv.server_port}"
+    srv.shutdown()
+    srv.server_close()
+
+
+def test_token_bucket():
+    now = [0.0]
+    bucket = TokenBucket(2, 2, clock=lambda: now[0])
+
+    async def take(n):
+        for _ in range(n):
+            await bucket.acquire()
+
+    # Allows bursts up to the capacity
+    asyncio.run(take(2))
+    assert bucket.tokens == 0
+
+    # Refills with the given rate
+    now[0] = 0.25
+    bucket.refill()
+    assert bucket.tokens == 0.5
+    now[0] = 10
+    bucket.refill()
+    assert bucket.tokens == 2
+
+    # Raises errors for invalid inputs
+    with pytest.raises(AssertionError):
+        TokenBucket(0)
+
+
+def test_download(server):
+    tiles = [(i, f"{server}/tile/200/0?i={i}") for i in range(20)]
+    results = {}
+    dl = TileDownloader(concurrency=4)
+    dl.run(tiles, lambda k, content: results.__setitem__(k, content))
+
+    assert sorted(results) == list(range(20))
+    assert results[3] == b"/tile/200/0?i=3"
+    assert dl.num_requests == dl.num_downloaded == 20
+    assert dl.failures == []
+
+
+def test_download_retries(server):
+    tiles = [("a", f"{server}/tile/429/2"), ("b", f"{server}/tile/503/1"), ("c", f"{server}/tile/500/9")]
+    results = {}
+
+    async def on_tile(k, content):
+        results[k] = content
+
+    dl = TileDownloader(concurrency=2, max_retries=3, backoff=0.001)
+    dl.run(tiles, on_tile)
+
+    # Retries temporary errors with backoff and reports tiles that keep failing
+    assert sorted(results) == ["a", "b"]
+    assert dl.num_retries == 2 + 1 + 3
+    assert dl.failures == [DownloadFailure("c", f"{server}/tile/500/9", 500, "Internal Server Error", 4)]
+
+
+def test_download_failures(server):
+    dl = TileDownloader(max_retries=3, backoff=0.001, timeout=1)
+    dl.run([("a", f"{server}/tile/404/1"), ("b", "http://127.0.0.1:1/tile")], lambda k, content: None)
+
+    # Does not retry client errors, but retries connection errors
+    failures = {f.key: f for f in dl.failures}
+    assert failures["a"].status == 404 and failures["a"].attempts == 1
+    assert failures["b"].status is None and failures["b"].attempts == 4
+    assert failures["b"].error.startswith("ConnectError")
+
+
+def test_download_rate_limit(server):
+    tiles = [(i, f"{server}/tile/200/0?i={i}") for i in range(5)]
+    dl = TileDownloader(concurrency=5, rate=10, burst=1)
+    start = time.monotonic()
+    dl.run(tiles, lambda k, content: None)
+
+    # Spaces out requests beyond the burst size
+    assert dl.num_downloaded == 5
+    assert time.monotonic() - start >= 0.35
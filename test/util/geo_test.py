@@ -1,5 +1,7 @@
+import math
 import pytest
 import random
+import numpy as np
 from src.util.geo import *
 
 
@@ -131,3 +133,225 @@ def test_pixels_in_circle():
     assert Pixel(100, 81) not in p4
     assert Pixel(105, 81) in p4
     assert Pixel(106, 81) not in p4
+
+
+def test_lat_lon_to_mercator_batch():
+    # Raises errors for invalid coordinates
+    with pytest.raises(AssertionError):
+        lat_lon_to_mercator_batch([0, -90], [0, -180], 0)
+    with pytest.raises(AssertionError):
+        lat_lon_to_mercator_batch([0, -85], [0, -190], 0)
+    with pytest.raises(AssertionError):
+        lat_lon_to_mercator_batch([0], [0], 20)
+    with pytest.raises(AssertionError):
+        lat_lon_to_mercator_batch([0], [0], 17, 0)
+
+    # Returns continuous coordinates
+    assert np.shape(lat_lon_to_mercator_batch([0, 45, 22.5], [0, 90, -45], 2)) == (3, 2)
+    assert list(lat_lon_to_mercator_batch([0], [0], 1, 1)[0]) == [1.0, 1.0]
+    assert list(lat_lon_to_mercator_batch([0], [-90], 2, 256)[0]) == [256.0, 512.0]
+
+
+def test_batch_conversion_matches_scalar_conversion():
+    rng = np.random.default_rng(0)
+    lat = rng.uniform(-LAT_MAX, LAT_MAX, 1000)
+    lon = rng.uniform(-180, 180, 1000)
+    for z in [0, 4, 11, 17]:
+        tiles = lat_lon_to_tile_coords_batch(lat, lon, z)
+        assert [tuple(t) for t in tiles] == [lat_lon_to_tile_coords(a, o, z) for a, o in zip(lat, lon)]
+        pixels = lat_lon_to_pixel_coords_batch(lat, lon, z)
+        assert [tuple(p) for p in pixels] == [lat_lon_to_pixel_coords(a, o, z) for a, o in zip(lat, lon)]
+
+        tx, ty = rng.integers(0, 2**z, 1000), rng.integers(0, 2**z, 1000)
+        exp = [tile_coords_to_lat_lon(x, y, z) for x, y in zip(tx, ty)]
+        assert np.allclose(tile_coords_to_lat_lon_batch(tx, ty, z), exp, rtol=0, atol=1e-12)
+        exp = [tile_coords_to_lat_lon(x, y, z, 0, 1) for x, y in zip(tx, ty)]
+        assert np.allclose(tile_coords_to_lat_lon_batch(tx, ty, z, 0, 1), exp, rtol=0, atol=1e-12)
+
+        px, py = rng.integers(0, 256 * 2**z, 1000), rng.integers(0, 256 * 2**z, 1000)
+        exp = [pixel_coords_to_lat_lon(x, y, z) for x, y in zip(px, py)]
+        assert np.allclose(pixel_coords_to_lat_lon_batch(px, py, z), exp, rtol=0, atol=1e-12)
+
+
+def test_batch_conversion_validates_inputs():
+    with pytest.raises(AssertionError):
+        lat_lon_to_tile_coords_batch([0, 86], [0, 0], 3)
+    with pytest.raises(AssertionError):
+        lat_lon_to_pixel_coords_batch([0, 0], [0, 181], 3)
+    with pytest.raises(AssertionError):
+        tile_coords_to_lat_lon_batch([0, 8], [0, 0], 3)
+    with pytest.raises(AssertionError):
+        tile_coords_to_lat_lon_batch([0], [0], 3, oy=1.5)
+    with pytest.raises(AssertionError):
+        pixel_coords_to_lat_lon_batch([0, 0], [0, 2048], 3)
+
+    # Handles empty inputs
+    assert np.shape(lat_lon_to_pixel_coords_batch([], [], 17)) == (0, 2)
+    assert np.shape(pixel_coords_to_lat_lon_batch([], [], 17)) == (0, 2)
+
+
+def test_resample_polylines():
+    # Raises errors for invalid inputs
+    with pytest.raises(AssertionError):
+        resample_polylines([[0, 0], [10, 0]], [3], 16)
+    with pytest.raises(AssertionError):
+        resample_polylines([[0, 0], [10, 0]], [2], 0)
+
+    # Samples every polyline at most `spacing` pixels apart and ends exactly at its nodes
+    pixels = [[0, 0], [32, 0], [32, 10], [5, 5], [5, 5], [100, 100], [100, 100]]
+    lines, samples = resample_polylines(pixels, [3, 2, 1, 1], 16)
+    assert lines.tolist() == [0, 0, 0, 0, 1, 2, 3]
+    assert samples.tolist() == [[0, 0], [16, 0], [32, 0], [32, 10], [5, 5], [100, 100], [100, 100]]
+
+    # Keeps all samples of a line within the spacing of each other
+    rng = np.random.default_rng(0)
+    pixels = rng.integers(0, 10000, (50, 2))
+    lines, samples = resample_polylines(pixels, [10] * 5, 16)
+    for i in range(5):
+        steps = np.diff(samples[lines == i], axis=0)
+        assert np.all(np.abs(steps) <= 16)
+
+    # Handles empty inputs
+    lines, samples = resample_polylines(np.zeros((0, 2)), [], 16)
+    assert len(lines) == 0 and np.shape(samples) == (0, 2)
+
+
+def test_distance_to_segment():
+    assert distance_to_segment(1, 1, 0, 0, 2, 0) == 1
+    assert distance_to_segment(5, 4, 0, 0, 2, 0) == 5
+    assert distance_to_segment(3, 4, 0, 0, 0, 0) == 5
+
+
+def test_supercover_tiles():
+    # Raises errors for invalid buffers
+    with pytest.raises(AssertionError):
+        supercover_tiles(0.5, 0.5, 1.5, 1.5, -1)
+
+    # Returns the tile of a point
+    assert supercover_tiles(3.5, 4.5, 3.5, 4.5) == {TileCoords(3, 4)}
+
+    # Follows edges in all directions
+    assert supercover_tiles(0.5, 0.5, 2.5, 0.5) == {TileCoords(0, 0), TileCoords(1, 0), TileCoords(2, 0)}
+    assert supercover_tiles(2.5, 0.5, 0.5, 0.5) == {TileCoords(0, 0), TileCoords(1, 0), TileCoords(2, 0)}
+    assert supercover_tiles(0.5, 2.5, 0.5, 0.5) == {TileCoords(0, 0), TileCoords(0, 1), TileCoords(0, 2)}
+    assert supercover_tiles(0.2, 0.1, 1.8, 0.9) == {TileCoords(0, 0), TileCoords(1, 0)}
+    assert supercover_tiles(1.8, 0.9, 0.2, 0.1) == {TileCoords(0, 0), TileCoords(1, 0)}
+
+    # Includes both tiles next to a corner that the segment passes through
+    tiles = supercover_tiles(0.5, 0.5, 1.5, 1.5)
+    assert tiles == {TileCoords(0, 0), TileCoords(1, 0), TileCoords(0, 1), TileCoords(1, 1)}
+
+    # Contains every tile touched by a densely sampled segment and nothing else
+    rng = np.random.default_rng(0)
+    for x0, y0, x1, y1 in rng.random((100, 4)) * 20:
+        tiles = supercover_tiles(x0, y0, x1, y1)
+        t = np.linspace(0, 1, 10000)[:, np.newaxis]
+        samples = np.floor([x0, y0] + t * [x1 - x0, y1 - y0]).astype(int)
+        assert set(TileCoords(x, y) for x, y in samples.tolist()) <= tiles
+        for x, y in tiles:
+            corners = [distance_to_segment(cx, cy, x0, y0, x1, y1) for cx in [x, x + 1] for cy in [y, y + 1]]
+            assert min(corners) <= math.sqrt(2) / 2 + 1e-9
+
+    # Dilates the tiles by a buffer
+    tiles = supercover_tiles(1.5, 1.5, 1.5, 1.5, 0.25)
+    assert tiles == {TileCoords(1, 1)}
+    tiles = supercover_tiles(1.1, 1.5, 1.5, 1.5, 0.25)
+    assert tiles == {TileCoords(0, 1), TileCoords(1, 1)}
+    tiles = supercover_tiles(1.1, 1.1, 1.1, 1.1, 0.25)
+    assert tiles == {TileCoords(0, 0), TileCoords(1, 0), TileCoords(0, 1), TileCoords(1, 1)}
+    tiles = supercover_tiles(1.2, 1.2, 1.2, 1.2, 0.25)
+    assert tiles == {TileCoords(0, 1), TileCoords(1, 0), TileCoords(1, 1)}
+    assert len(supercover_tiles(5.5, 5.5, 5.5, 5.5, 1)) == 9
+
+
+def test_polyline_tile_coords():
+    # Handles empty polylines and single nodes
+    assert polyline_tile_coords([], [], 17) == set()
+    assert polyline_tile_coords([35.1], [-90.0], 17) == {lat_lon_to_tile_coords(35.1, -90.0, 17)}
+
+    # Covers all tiles along the polyline, including edges with negative deltas
+    lat, lon = [35.1, 35.09, 35.095], [-90.0, -90.01, -90.02]
+    tiles = polyline_tile_coords(lat, lon, 17)
+    for (la0, lo0), (la1, lo1) in zip(zip(lat[:-1], lon[:-1]), zip(lat[1:], lon[1:])):
+        for t in np.linspace(0, 1, 1000):
+            assert lat_lon_to_tile_coords(la0 + t * (la1 - la0), lo0 + t * (lo1 - lo0), 17) in tiles
+
+    # Includes more tiles with a buffer
+    assert tiles < polyline_tile_coords(lat, lon, 17, buffer_px=64)
+
+
+def test_parent_tile_coords():
+    coords = [TileCoords(0, 0), TileCoords(1, 1), TileCoords(2, 1), TileCoords(3, 0), TileCoords(5, 8)]
+    assert parent_tile_coords(coords) == {TileCoords(0, 0), TileCoords(1, 0), TileCoords(2, 4)}
+    assert parent_tile_coords([]) == set()
+
+
+def test_tile_keys():
+    with pytest.raises(AssertionError):
+        tile_keys(30, 0, 0)
+
+    assert tile_keys(0, 0, 0) == 0
+    assert tile_keys(17, 1, 2) == (17 << 58) | (1 << 29) | 2
+    keys = tile_keys([17, 17, 16, 29], [1, 2, 1, 2**29 - 1], [2, 1, 2, 2**29 - 1])
+    assert keys.dtype == np.uint64 and len(set(keys.tolist())) == 4
+
+
+def test_tile_keys_to_coords():
+    z, x, y = [17, 17, 16, 29, 0], [1, 2, 1, 2**29 - 1, 0], [2, 1, 2, 2**29 - 1, 0]
+    assert [v.tolist() for v in tile_keys_to_coords(tile_keys(z, x, y))] == [z, x, y]
+    assert [v.tolist() for v in tile_keys_to_coords([])] == [[], [], []]
+
+
+def test_hilbert_index():
+    with pytest.raises(AssertionError):
+        hilbert_index(30, 0, 0)
+
+    assert hilbert_index(0, 0, 0) == 0
+    assert hilbert_index(1, [0, 0, 1, 1], [0, 1, 1, 0]).tolist() == [0, 1, 2, 3]
+    assert hilbert_index(2, [0, 1, 1, 0, 0, 0, 1, 1], [0, 0, 1, 1, 2, 3, 3, 2]).tolist() == list(range(8))
+
+    # Visits every tile of a zoom level once, moving to an adjacent tile in each step
+    for z in range(1, 7):
+        y, x = np.divmod(np.arange(4**z), 2**z)
+        d = hilbert_index(z, x, y)
+        assert sorted(d.tolist()) == list(range(4**z))
+        order = np.argsort(d)
+        assert np.all(np.abs(np.diff(x[order])) + np.abs(np.diff(y[order])) == 1)
+
+    # Handles the highest zoom level
+    assert hilbert_index(29, 2**29 - 1, 0) == 4**29 - 1
+
+
+def test_clip_polyline():
+    assert clip_polyline([], 0, 0, 10, 10) == []
+    assert clip_polyline([[5, 5]], 0, 0, 10, 10) == []
+    assert clip_polyline([[20, 20], [30, 20]], 0, 0, 10, 10) == []
+
+    # Keeps polylines inside the rectangle and clips the ones crossing it
+    parts = clip_polyline([[1, 1], [5, 5], [9, 1]], 0, 0, 10, 10)
+    assert len(parts) == 1 and parts[0].tolist() == [[1, 1], [5, 5], [9, 1]]
+    parts = clip_polyline([[-5, 5], [15, 5]], 0, 0, 10, 10)
+    assert len(parts) == 1 and parts[0].tolist() == [[0, 5], [10, 5]]
+
+    # Splits polylines that leave and re-enter the rectangle
+    parts = clip_polyline([[2, 2], [2, 20], [8, 20], [8, 2]], 0, 0, 10, 10)
+    assert [p.tolist() for p in parts] == [[[2, 2], [2, 10]], [[8, 10], [8, 2]]]
+
+
+def test_simplify_polyline():
+    with pytest.raises(AssertionError):
+        simplify_polyline([[0, 0], [1, 1]], -1)
+
+    assert simplify_polyline([], 1).tolist() == []
+    assert simplify_polyline([[1, 1]], 1).tolist() == [0]
+    assert simplify_polyline([[0, 0], [1, 1]], 1).tolist() == [0, 1]
+
+    # Drops nodes within the tolerance and keeps the ones further away
+    line = [[0, 0], [1, 0.1], [2, -0.1], [3, 5], [4, 6], [5, 7.05], [6, 8]]
+    assert simplify_polyline(line, 0.5).tolist() == [0, 2, 3, 6]
+    assert simplify_polyline(line, 0).tolist() == list(range(7))
+    assert simplify_polyline(line, 100).tolist() == [0, 6]
+
+    # Keeps closed polylines
+    assert simplify_polyline([[0, 0], [4, 0], [4, 4], [0, 0]], 1).tolist() == [0, 1, 2, 3]
+    assert simplify_polyline([[0, 0], [4, 0], [4, 0.5], [0, 0]], 1).tolist() == [0, 2, 3]
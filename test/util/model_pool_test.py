@@ -0,0 +1,94 @@
+import numpy as np
+import os
+import pytest
+import signal
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from src.util.model_pool import *
+
+
+def load_model():
+    # Every worker loads the model once, so the pid identifies the model instance
+    return {"pid": os.getpid(), "scale": 2}
+
+
+def predict(model, x):
+    if x < 0:
+        raise ValueError("negative input")
+    return np.full((4, 4), x * model["scale"], dtype=np.int32)
+
+
+def predict_pid(model, x):
+    return np.array([model["pid"]])
+
+
+def load_broken_model():
+    raise OSError("model not found")
+
+
+def load_model_once(path):
+    # Fails to load the model again after the first worker started
+    if os.path.exists(path):
+        raise OSError("model not found")
+    open(path, "w").close()
+    return load_model()
+
+
+def test_model_pool():
+    with ModelPool(load_model, predict, workers=2, buffer_bytes=3 * 64) as pool:
+        # Returns predictions in order
+        preds = pool.predict([1, 2, 3])
+        assert [p[0, 0] for p in preds] == [2, 4, 6]
+        assert preds[0].shape == (4, 4) and preds[0].dtype == np.int32
+
+        # Handles empty batches and batches that do not fit into shared memory
+        assert pool.predict([]) == []
+        assert [p[0, 0] for p in pool.predict(list(range(5)))] == [0, 2, 4, 6, 8]
+
+        # Can be called from several threads at once
+        with ThreadPoolExecutor(4) as executor:
+            batches = list(executor.map(pool.predict, [[i, i + 1] for i in range(20)]))
+        assert [[p[0, 0] for p in b] for b in batches] == [[2 * i, 2 * i + 2] for i in range(20)]
+
+        # Raises errors for failed predictions and keeps working afterwards
+        with pytest.raises(RuntimeError):
+            pool.predict([1, -1])
+        assert pool.predict([1])[0][0, 0] == 2
+
+
+def test_model_pool_loads_model_once():
+    with ModelPool(load_model, predict_pid, workers=2) as pool:
+        with ThreadPoolExecutor(2) as executor:
+            pids = [p[0] for b in executor.map(pool.predict, [[i] * 3 for i in range(20)]) for p in b]
+        assert len(set(pids)) <= 2
+        assert os.getpid() not in pids
+
+
+def test_model_pool_restarts_dead_workers():
+    with ModelPool(load_model, predict_pid, workers=1) as pool:
+        pid = int(pool.predict([0])[0][0])
+        os.kill(pid, signal.SIGKILL)
+
+        # Fails the batch of the dead worker and restarts it for the next ones
+        with pytest.raises(RuntimeError, match="exited"):
+            pool.predict([0])
+        assert int(pool.predict([0])[0][0]) not in (pid, os.getpid())
+        assert pool.num_live == 1
+
+
+def test_model_pool_drops_workers(tmp_path):
+    with ModelPool(partial(load_model_once, str(tmp_path / "loaded")), predict_pid, workers=1) as pool:
+        os.kill(int(pool.predict([0])[0][0]), signal.SIGKILL)
+
+        # Drops workers that cannot be restarted and raises once none are left
+        with pytest.raises(RuntimeError, match="exited"):
+            pool.predict([0])
+        assert pool.num_live == 0
+        for _ in range(2):
+            with pytest.raises(RuntimeError, match="No workers left"):
+                pool.predict([0])
+
+
+def test_model_pool_load_errors():
+    with pytest.raises(RuntimeError, match="model not found"):
+        ModelPool(load_broken_model, predict, workers=1)
@@ -0,0 +1,48 @@
+import numpy as np
+import pytest
+from src.util.mvt import *
+
+
+def test_varint():
+    assert varint(0) == b"\x00"
+    assert varint(1) == b"\x01"
+    assert varint(300) == b"\xac\x02"
+    assert field(1, 150) == b"\x08\x96\x01"
+    assert field(2, b"testing") == b"\x12\x07testing"
+
+
+def test_encode_geometry():
+    # Examples from the vector tile specification
+    assert encode_geometry([np.array([[25, 17]])]).tolist() == [9, 50, 34]
+    assert encode_geometry([np.array([[5, 7]]), np.array([[3, 2]])]).tolist() == [9, 10, 14, 9, 3, 9]
+    line = encode_geometry([np.array([[2, 2], [2, 10], [10, 10]])])
+    assert line.tolist() == [9, 4, 4, 18, 0, 16, 16, 0]
+    lines = encode_geometry([np.array([[2, 2], [2, 10], [10, 10]]), np.array([[1, 1], [3, 5]])])
+    assert lines.tolist() == [9, 4, 4, 18, 0, 16, 16, 0, 9, 17, 17, 10, 4, 8]
+
+    # Drops repeated positions and degenerate linestrings
+    assert encode_geometry([np.array([[2, 2], [2, 2], [2, 10], [2, 10]])]).tolist() == [9, 4, 4, 10, 0, 16]
+    assert encode_geometry([np.array([[2, 2], [2, 2]])]).tolist() == []
+    assert encode_geometry([]).tolist() == []
+
+
+def test_layer():
+    with pytest.raises(AssertionError):
+        Layer("test", 0)
+
+    layer = Layer("points", extent=256)
+    layer.add(POINT, [np.array([[25, 17]])], {"risk": 3, "desc": "a", "plsId": None}, id=1)
+    layer.add(POINT, [np.array([[5, 7]])], {"risk": 3, "desc": "b"})
+    layer.add(LINESTRING, [np.array([[2, 2], [2, 2]])], {"risk": 1})
+    assert len(layer) == 2
+    assert layer.keys == {"risk": 0, "desc": 1}
+    assert layer.values == {(int, 3): 0, (str, "a"): 1, (str, "b"): 2}
+
+    data = layer.encode()
+    assert data.startswith(field(15, 2) + field(1, b"points"))
+    assert data.endswith(field(4, field(1, b"b")) + field(5, 256))
+    assert field(2, field(1, 1) + packed(2, [0, 0, 1, 1]) + field(3, POINT) + packed(4, [9, 50, 34])) in data
+
+    # Skips empty layers
+    assert encode_tile([layer, Layer("empty")]) == field(3, data)
+    assert encode_value(-1) == field(6, 1) and encode_value(True) == field(7, 1)
@@ -0,0 +1,95 @@
+import pytest
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from src.util.pipeline import *
+
+
+def test_pipeline():
+    out = []
+    pipeline = (
+        Pipeline(maxsize=2)
+        .stage("double", lambda x: 2 * x, workers=3)
+        .stage("filter", lambda x: x if x % 3 else None, workers=2)
+        .stage("collect", lambda xs: out.extend(xs) or xs, batch_size=4)
+    )
+    stats = pipeline.run(range(100))
+
+    # Runs all items through all stages
+    assert sorted(out) == [2 * x for x in range(100) if (2 * x) % 3]
+
+    # Counts items per stage
+    assert [s.name for s in stats] == ["double", "filter", "collect"]
+    assert [s.num_in for s in stats] == [100, 100, 66]
+    assert [s.num_out for s in stats] == [100, 66, 66]
+    assert all(s.num_errors == 0 and s.elapsed > 0 for s in stats)
+
+
+def test_pipeline_batches():
+    batches = []
+    Pipeline().stage("collect", lambda xs: batches.append(list(xs)), batch_size=4).run(range(10))
+
+    # Flushes the last partial batch once the input is done
+    assert sorted(len(b) for b in batches) == [2, 4, 4]
+    assert sorted(x for b in batches for x in b) == list(range(10))
+
+
+def test_pipeline_errors():
+    def fail(x):
+        if x == 3:
+            raise ValueError("boom")
+        return x
+
+    stats = Pipeline().stage("fail", fail).stage("pass", lambda x: x).run(range(5))
+
+    # Counts errors and drops the failed items
+    assert stats[0].num_errors == 1 and isinstance(stats[0].last_error, ValueError)
+    assert stats[0].failed == [(3, stats[0].last_error)]
+    assert stats[1].num_in == 4
+    assert "last error: ValueError('boom')" in repr(stats[0]) and "last error" not in repr(stats[1])
+
+    # Keeps the keys of all items in failed batches
+    def fail_batch(xs):
+        if 4 in xs:
+            raise ValueError("boom")
+        return xs
+
+    stats = Pipeline().stage("fail", fail_batch, batch_size=3, key=lambda x: f"item {x}").run(range(6))
+    assert stats[0].num_errors == 1 and [k for k, _ in stats[0].failed] == ["item 3", "item 4", "item 5"]
+
+
+def test_pipeline_executor():
+    thread_ids = set()
+
+    def work(x):
+        thread_ids.add(threading.get_ident())
+        return x
+
+    with ThreadPoolExecutor(2, thread_name_prefix="pool") as pool:
+        stats = Pipeline().stage("work", work, workers=2, executor=pool).run(range(10))
+
+    # Hands the work to the executor
+    assert stats[0].num_out == 10
+    assert threading.get_ident() not in thread_ids
+
+
+def test_pipeline_overlaps_stages():
+    # Two slow stages take about as long as one of them since items flow through them concurrently
+    start = time.monotonic()
+    stats = (
+        Pipeline()
+        .stage("a", lambda x: time.sleep(0.02) or x)
+        .stage("b", lambda x: time.sleep(0.02) or x)
+        .run(range(10))
+    )
+    assert time.monotonic() - start < 0.35
+    assert stats[0].utilization > 0.5
+
+
+def test_pipeline_validates_inputs():
+    with pytest.raises(AssertionError):
+        Pipeline(0)
+    with pytest.raises(AssertionError):
+        Pipeline().stage("a", lambda x: x, workers=0)
+    with pytest.raises(AssertionError):
+        Pipeline().run([])
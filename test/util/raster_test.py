@@ -0,0 +1,218 @@
+import pytest
+import numpy as np
+from io import BytesIO
+from PIL import Image
+from src.util.geo import TileCoords, pixels_in_circle
+from src.util.raster import *
+
+
+def loop_opaque_fraction(alpha, x0, y0, r):
+    h, w = np.shape(alpha)
+    if x0 < r or x0 > w - r or y0 < r or y0 > h - r:
+        return 0
+    pxls = pixels_in_circle(r, x0, y0)
+    return sum([1 for x, y in pxls if alpha[y][x] > 0]) / len(pxls)
+
+
+def test_disk_mask():
+    # Raises errors for invalid radii
+    with pytest.raises(AssertionError):
+        disk_mask(0)
+
+    # Contains the same pixels as pixels_in_circle
+    for r in range(1, 10):
+        mask = disk_mask(r)
+        assert np.shape(mask) == (2 * r + 1, 2 * r + 1)
+        exp = set(pixels_in_circle(r, r, r))
+        assert set([(x, y) for y, x in zip(*np.nonzero(mask))]) == exp
+
+    # Is cached and read-only
+    assert disk_mask(8) is disk_mask(8)
+    with pytest.raises(ValueError):
+        disk_mask(8)[0, 0] = True
+
+
+def test_disk_offsets():
+    dy, dx = disk_offsets(5)
+    assert len(dx) == len(dy) == 69
+    assert set(zip(dx, dy)) == set(pixels_in_circle(5))
+
+
+def test_opaque_fractions():
+    # Raises errors for incorrect inputs
+    with pytest.raises(AssertionError):
+        opaque_fractions(np.zeros((4, 4, 4), dtype=np.uint8), [1], [1], 1)
+
+    # Returns 0 for spots whose circle does not fit into the tile
+    alpha = np.full((256, 256), 127, dtype=np.uint8)
+    assert list(opaque_fractions(alpha, [7, 8, 248, 249, 100], [100, 100, 100, 100, 255], 8)) == [0, 1, 1, 0, 0]
+
+    # Handles empty inputs
+    assert len(opaque_fractions(alpha, [], [], 8)) == 0
+
+    # Matches the per-pixel loop exactly
+    rng = np.random.default_rng(0)
+    alpha = (rng.random((256, 256)) > 0.6).astype(np.uint8) * 127
+    px = rng.integers(0, 256, 500)
+    py = rng.integers(0, 256, 500)
+    for r in [1, 3, 8]:
+        fractions = opaque_fractions(alpha, px, py, r)
+        assert list(fractions) == [loop_opaque_fraction(alpha, x, y, r) for x, y in zip(px, py)]
+
+
+def loop_grayscale_to_rgba(arr, rgba):
+    data = np.zeros((*np.shape(arr), 4), dtype=np.uint8)
+    for r in range(0, np.size(arr, 0)):
+        for c in range(0, np.size(arr, 1)):
+            data[r, c] = [arr[r, c] * v for v in rgba]
+    return data
+
+
+def test_colorize():
+    # Raises errors for incorrect inputs
+    with pytest.raises(AssertionError):
+        colorize(np.zeros((2, 2, 2), dtype=np.uint8), [0.1, 0.2, 0.3, 0.4])
+    with pytest.raises(AssertionError):
+        colorize(np.zeros((2, 2), dtype=np.uint8), [0.1, 0.2, 1.3, 0.4])
+    with pytest.raises(AssertionError):
+        colorize(np.zeros((2, 2), dtype=np.uint8), [0.1, 0.2, 0.3, 0.4], np.zeros((2, 2, 3), dtype=np.uint8))
+
+    # Matches the per-pixel loop exactly, for all gray values and for non-uint8 input
+    rng = np.random.default_rng(0)
+    gray = np.arange(256, dtype=np.uint8).reshape(16, 16)
+    for rgba in [[1, 0, 1, 0.5], [0.25, 0.5, 0.75, 1.0], list(rng.random(4))]:
+        assert np.array_equal(colorize(gray, rgba), loop_grayscale_to_rgba(gray, rgba))
+        fgray = rng.random((16, 16)) * 255
+        assert np.array_equal(colorize(fgray, rgba), loop_grayscale_to_rgba(fgray, rgba))
+
+    # Writes into a preallocated output array
+    out = np.zeros((16, 16, 4), dtype=np.uint8)
+    assert colorize(gray, [1, 0, 1, 0.5], out) is out
+    assert np.array_equal(out, loop_grayscale_to_rgba(gray, [1, 0, 1, 0.5]))
+
+
+def test_decode_alpha():
+    rng = np.random.default_rng(0)
+    rgba = rng.integers(0, 256, (32, 16, 4), dtype=np.uint8)
+    blob = BytesIO()
+    Image.fromarray(rgba).save(blob, format="PNG")
+    assert np.array_equal(decode_alpha(blob.getvalue()), rgba[:, :, 3])
+
+    # Treats images without alpha channel as opaque
+    blob = BytesIO()
+    Image.fromarray(rgba[:, :, :3]).save(blob, format="PNG")
+    assert np.array_equal(decode_alpha(blob.getvalue()), np.full((32, 16), 255))
+
+
+def test_threshold_mask():
+    arr = np.array([[0, 1], [127, 255]], dtype=np.uint8)
+    assert threshold_mask(arr).tolist() == [[False, True], [True, True]]
+    out = np.zeros((2, 2), dtype=bool)
+    assert threshold_mask(arr, 127, out) is out
+    assert out.tolist() == [[False, False], [False, True]]
+
+
+def test_pack_mask():
+    rng = np.random.default_rng(0)
+    for w in [1, 8, 13, 256]:
+        mask = rng.random((7, w)) > 0.5
+        packed = pack_mask(mask)
+        assert packed.shape == (7, (w + 7) // 8) and packed.dtype == np.uint8
+        assert np.array_equal(unpack_mask(packed, w), mask)
+        assert unpack_mask(packed, w).dtype == bool
+
+
+def test_downsample_alpha():
+    # Raises errors for incorrect inputs
+    with pytest.raises(AssertionError):
+        downsample_alpha(np.zeros((3, 4), dtype=np.uint8))
+    with pytest.raises(AssertionError):
+        downsample_alpha(np.zeros((4, 4), dtype=np.uint8), "min")
+
+    alpha = np.array([[0, 0, 127, 0], [0, 0, 0, 0], [255, 255, 1, 2], [255, 254, 3, 4]], dtype=np.uint8)
+    assert downsample_alpha(alpha).tolist() == [[0, 127], [255, 4]]
+    assert downsample_alpha(alpha, "mean").tolist() == [[0, 31], [254, 2]]
+    assert downsample_alpha(alpha).dtype == np.uint8
+
+    # Matches a direct computation on a full tile
+    rng = np.random.default_rng(0)
+    alpha = rng.integers(0, 256, (512, 512), dtype=np.uint8)
+    blocks = [alpha[0::2, 0::2], alpha[0::2, 1::2], alpha[1::2, 0::2], alpha[1::2, 1::2]]
+    assert np.array_equal(downsample_alpha(alpha), np.max(blocks, axis=0))
+    assert np.array_equal(downsample_alpha(alpha, "mean"), np.sum(blocks, axis=0) // 4)
+
+
+def test_downsample_tiles():
+    # Raises errors for masks of the wrong size
+    with pytest.raises(AssertionError):
+        downsample_tiles({TileCoords(0, 0): np.zeros((4, 4), dtype=np.uint8)}, ts=2)
+
+    rng = np.random.default_rng(0)
+    masks = {tc: rng.integers(0, 256, (4, 4), dtype=np.uint8) for tc in [(2, 4), (3, 4), (2, 5), (3, 5), (5, 2)]}
+    masks = {TileCoords(*tc): m for tc, m in masks.items()}
+    overviews = downsample_tiles(masks, ts=4)
+    assert list(overviews) == [TileCoords(1, 2), TileCoords(2, 1)]
+
+    # Matches downsampling the children pasted next to each other
+    plane = np.block([[masks[(2, 4)], masks[(3, 4)]], [masks[(2, 5)], masks[(3, 5)]]])
+    assert np.array_equal(overviews[(1, 2)], downsample_alpha(plane))
+    assert np.array_equal(downsample_tiles(masks, "mean", 4)[(1, 2)], downsample_alpha(plane, "mean"))
+
+    # Treats missing children as empty
+    plane = np.zeros((8, 8), dtype=np.uint8)
+    plane[:4, 4:] = masks[(5, 2)]
+    assert np.array_equal(overviews[(2, 1)], downsample_alpha(plane))
+
+    assert downsample_tiles({}) == {}
+
+
+def test_mask_encoding():
+    # Raises errors for incorrect inputs
+    with pytest.raises(AssertionError):
+        encode_mask(np.zeros((4, 4, 4), dtype=np.uint8))
+
+    # Stores binary masks with 1 bit per pixel and other masks with 8
+    rng = np.random.default_rng(0)
+    binary = ((rng.random((256, 256)) > 0.5) * 255).astype(np.uint8)
+    gray = rng.integers(0, 256, (7, 13), dtype=np.uint8)
+    for mask, bits in [(binary, 1), (gray, 8), (binary[:7, :13], 1), (np.zeros((256, 256), dtype=np.uint8), 1)]:
+        blob = encode_mask(mask)
+        assert blob[0] == bits
+        decoded = decode_mask(blob)
+        assert decoded.dtype == np.uint8 and np.array_equal(decoded, mask)
+    assert len(encode_mask(binary)) < 256 * 256 / 8 + 100
+    assert len(encode_mask(np.zeros((256, 256), dtype=np.uint8))) < 100
+
+    # Rejects unknown bit depths
+    with pytest.raises(AssertionError):
+        decode_mask(b"\x04" + encode_mask(binary)[1:])
+
+
+def test_render_mask():
+    rng = np.random.default_rng(0)
+    binary = ((rng.random((256, 256)) > 0.5) * 255).astype(np.uint8)
+    gray = np.array([[0, 255], [128, 255]], dtype=np.uint8)
+    for mask in [binary, gray, np.zeros((4, 4), dtype=np.uint8)]:
+        rgba = colorize(mask, [1, 0, 1, 0.5])
+
+        # PNGs have a palette entry per gray value, with the alpha values in the tRNS chunk
+        png = render_mask(mask, [1, 0, 1, 0.5])
+        im = Image.open(BytesIO(png))
+        assert im.format == "PNG" and im.mode == "P"
+        assert len(im.getpalette()) == 3 * len(np.unique(mask)) and "transparency" in im.info
+        assert np.array_equal(np.array(im.convert("RGBA")), rgba)
+        assert np.array_equal(decode_alpha(png), rgba[:, :, 3])
+
+        # WebPs are lossless, whether rendered or transcoded
+        for webp in [render_mask(mask, [1, 0, 1, 0.5], "WEBP", 0), transcode_image(png, "WEBP", 9)]:
+            im = Image.open(BytesIO(webp))
+            assert im.format == "WEBP"
+            assert np.array_equal(np.array(im.convert("RGBA")), rgba)
+
+    # Binary masks are stored as 1-bit PNGs
+    assert len(render_mask(binary, [1, 0, 1, 0.5])) < 256 * 256 / 8 + 1000
+
+    with pytest.raises(AssertionError):
+        render_mask(gray, [1, 0, 1, 0.5], "JPEG")
+    with pytest.raises(AssertionError):
+        render_mask(gray, [1, 0, 1, 0.5], level=10)
@@ -0,0 +1,37 @@
+import orjson
+from pydantic import TypeAdapter
+from src.model.power_line_segment import PowerLineSegmentSchema
+from src.model.region import RegionSchema
+from src.model.vegetation_alert import VegetationAlertSchema
+from src.util.serialize import *
+
+
+def test_schema_keys():
+    assert schema_keys(VegetationAlertSchema) == ["lat", "lon", "desc", "risk", "plsId"]
+    assert schema_keys(RegionSchema)[:2] == ["name", "bbMinLat"]
+
+
+def test_dump_rows():
+    rows = {
+        RegionSchema: [
+            ("Mesa", 33.3132423, -111.9348257, 33.5121448, -111.7181466, "https://example.com/mesa.jpg", 41),
+            ("São Paulo", -23.5, -46.6, 1e-05, 1e16, None, None),
+        ],
+        PowerLineSegmentSchema: [
+            (704226268, 35.0581349, -106.5568071, 35.0595676, -106.5489647, 2, "[[35.0595581, -106.5568071]]"),
+        ],
+        VegetationAlertSchema: [
+            (40.7398274408644, -74.0427875518799, 'Power line "overlap"\n', 2, 203432097),
+            (-0.0, 0.1, "", 10, None),
+        ],
+    }
+
+    # Matches the validated and serialized schema objects
+    for schema, values in rows.items():
+        objects = [schema.model_validate(dict(zip(schema.model_fields, row))) for row in values]
+        expected = TypeAdapter(list[schema]).dump_json(objects, by_alias=True)
+        assert dump_rows(values, schema) == expected
+        assert dump_rows(iter(values[:1]), schema) == TypeAdapter(list[schema]).dump_json(objects[:1], by_alias=True)
+
+    assert dump_rows([], RegionSchema) == b"[]"
+    assert orjson.loads(dump_rows(rows[VegetationAlertSchema], VegetationAlertSchema))[1]["plsId"] is None
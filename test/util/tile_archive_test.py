@@ -0,0 +1,97 @@
+import hashlib
+import os
+import pytest
+import numpy as np
+from src.util.tile_archive import *
+
+
+def make_tiles(n: int, seed=0):
+    rng = np.random.default_rng(seed)
+    z = rng.integers(10, 18, n)
+    x, y = rng.integers(0, 2**z), rng.integers(0, 2**z)
+    keys = np.unique(np.stack([z, x, y], axis=-1), axis=0)
+    blobs = [os.urandom(int(rng.integers(0, 100))) for _ in keys]
+    return keys, blobs
+
+
+def write_tiles(path: str, keys, blobs):
+    hashes = [hashlib.md5(d).hexdigest() for d in blobs]
+    data = {tuple(k): d for k, d in zip(keys.tolist(), blobs)}
+    with TileArchiveWriter(path, *keys.T, [len(d) for d in blobs], hashes, 1234.5) as writer:
+        for key in writer.keys:
+            writer.write(data[key])
+    return writer
+
+
+def test_hilbert_order():
+    z, x, y = [17, 16, 17, 17, 17], [1, 0, 0, 0, 1], [0, 0, 0, 1, 1]
+    assert hilbert_order(z, x, y).tolist() == [1, 2, 3, 4, 0]
+
+
+def test_writer(tmp_path):
+    path = str(tmp_path / "tiles.bin")
+
+    # Raises errors for incorrect inputs
+    with pytest.raises(AssertionError):
+        TileArchiveWriter(path, [17, 17], [1, 1], [2, 2], [1, 1], ["0" * 32] * 2)
+    with pytest.raises(AssertionError):
+        TileArchiveWriter(path, [17], [2**29], [2], [1], ["0" * 32])
+    with pytest.raises(AssertionError):
+        TileArchiveWriter(path, [17], [1], [2], [1], ["0"])
+
+    # Checks the number and size of the written tiles
+    with pytest.raises(AssertionError):
+        with TileArchiveWriter(path, [17], [1], [2], [3], ["0" * 32]) as writer:
+            writer.write(b"ab")
+    with pytest.raises(AssertionError):
+        with TileArchiveWriter(path, [17, 17], [1, 2], [2, 2], [1, 1], ["0" * 32] * 2) as writer:
+            writer.write(b"a")
+    assert os.listdir(tmp_path) == []
+
+    # Writes the tiles in Hilbert order and replaces the archive at the end
+    keys, blobs = make_tiles(100)
+    writer = write_tiles(path, keys, blobs)
+    assert writer.keys == [tuple(k) for k in keys[hilbert_order(*keys.T)].tolist()]
+    assert os.listdir(tmp_path) == ["tiles.bin"]
+
+
+def test_archive(tmp_path):
+    path = str(tmp_path / "tiles.bin")
+    keys, blobs = make_tiles(1000)
+    write_tiles(path, keys, blobs)
+
+    archive = TileArchive(path)
+    assert len(archive) == len(keys)
+    assert archive.nbytes == os.path.getsize(path)
+    assert archive.created_at == 1234.5
+    for (z, x, y), d in zip(keys.tolist(), blobs):
+        h, data = archive.get(z, x, y)
+        assert h == hashlib.md5(d).hexdigest()
+        assert isinstance(data, memoryview) and data == d
+
+    # Returns None for missing and invalid tiles
+    z, x, y = keys[0].tolist()
+    assert archive.get(z, x, y + 2**z) is None
+    assert archive.get(z, x + 2**29, y) is None
+    assert archive.get(30, 0, 0) is None
+    assert archive.get(-1, 0, 0) is None
+
+    # Tile data is stored in Hilbert order
+    offsets = [int(archive.offsets[archive.keys.searchsorted(tile_keys(*k))]) for k in keys[hilbert_order(*keys.T)]]
+    assert offsets == sorted(offsets)
+
+    # Finds the archived tiles that are missing from a set of keys
+    assert archive.missing_tiles(tile_keys(*keys.T)) == []
+    assert archive.missing_tiles(tile_keys(*keys[3:].T)) == sorted(tuple(k) for k in keys[:3].tolist())
+    assert len(archive.missing_tiles([])) == len(keys)
+
+    # Handles empty archives
+    write_tiles(path, np.zeros((0, 3), np.int64), [])
+    assert len(TileArchive(path)) == 0 and TileArchive(path).get(17, 0, 0) is None
+    assert TileArchive(path).missing_tiles(tile_keys(*keys.T)) == []
+
+    # Rejects other files
+    with open(path, "wb") as f:
+        f.write(b"\x89PNG" + bytes(100))
+    with pytest.raises(AssertionError):
+        TileArchive(path)